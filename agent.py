@@ -1,14 +1,173 @@
 from langchain.agents import AgentType, initialize_agent, Tool
+from langchain.callbacks.base import BaseCallbackHandler
+from langchain_core.language_models.chat_models import generate_from_stream
 from langchain_google_genai import ChatGoogleGenerativeAI
-from config import GOOGLE_API_KEY, COUNTRY_CONFIG
-from currency_utils import get_exchange_rates, format_exchange_rates
+from config import (
+    GOOGLE_API_KEY,
+    COUNTRY_CONFIG,
+    AGENT_TOOL_CACHE_TTL,
+    AGENT_METRICS_HISTORY,
+    RESPONSE_CACHE_ENABLED,
+    RESPONSE_CACHE_MAX_ENTRIES,
+    RESPONSE_CACHE_SIMILARITY,
+    RESPONSE_CACHE_TTL,
+)
+from cache import TTLCache
+from response_cache import ResponseCache
+from currency_utils import get_exchange_rates, format_exchange_rates, get_rates_version
 from stock_utils import get_stock_indices, get_index_names, format_indices_data
-from typing import Any
+from prefetch import get_prefetched_rates, get_prefetched_indices
+from analytics import format_analytics
+from registry import get_registry
+import rate_limiter
+import tracing
+from collections import deque
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+import hashlib
+import queue
+import threading
+import time
 import warnings
 
 # Suppress LangChain deprecation warnings
 warnings.filterwarnings('ignore', message='.*initialize_agent.*deprecated.*')
 
+# ReAct prefix that starts the text shown to the user
+FINAL_ANSWER_MARKER = "Final Answer:"
+
+# Tool results shared across queries and sessions for AGENT_TOOL_CACHE_TTL
+_tool_cache = TTLCache(max_entries=256, default_ttl=AGENT_TOOL_CACHE_TTL, name="agent_tools", shared=True)
+
+# Per-query state: tool results memoized for the current query and its metrics
+_query_memo: ContextVar[Optional[Dict[Any, str]]] = ContextVar("agent_query_memo", default=None)
+_query_metrics: ContextVar[Optional[Dict[str, Any]]] = ContextVar("agent_query_metrics", default=None)
+
+_metrics_history = deque(maxlen=AGENT_METRICS_HISTORY)
+_metrics_lock = threading.Lock()
+
+# Final answers keyed by normalized query and data fingerprint
+_response_cache = ResponseCache(
+    entities=list(dict.fromkeys(list(COUNTRY_CONFIG) + [config["code"] for config in COUNTRY_CONFIG.values()])),
+    max_entries=RESPONSE_CACHE_MAX_ENTRIES,
+    similarity=RESPONSE_CACHE_SIMILARITY,
+    shared=True,
+    shared_ttl=RESPONSE_CACHE_TTL,
+)
+
+def data_fingerprint() -> str:
+    """
+    Fingerprint the data agent answers are based on.
+
+    Combines the cached rates snapshot with prefetched index values; when
+    indices are not prefetched, a RESPONSE_CACHE_TTL time bucket stands in.
+
+    Returns:
+        Hex digest that changes whenever the underlying data changes
+    """
+    parts = [get_rates_version()]
+    for country in COUNTRY_CONFIG:
+        indices = get_prefetched_indices(country)
+        if indices is None:
+            parts.append(f"bucket:{int(time.time() // RESPONSE_CACHE_TTL)}")
+            break
+        parts.append(repr(sorted(
+            (symbol, quote.get("current"), quote.get("change_percent"))
+            for symbol, quote in indices.items() if isinstance(quote, dict)
+        )))
+    return hashlib.sha1("|".join(parts).encode()).hexdigest()
+
+def _normalize_tool_input(text: str) -> str:
+    """
+    Canonicalize a tool input produced by the LLM.
+
+    ReAct outputs vary ("Japan", "'japan'", "Japan."), so known country names
+    and ISO country codes are matched case-insensitively (one registry index
+    lookup) and currency codes are upper-cased.
+    """
+    value = str(text).strip().strip("\"'`").strip().rstrip(".").strip()
+    country = get_registry().match_country(value)
+    if country is not None:
+        return country
+    if len(value) == 3 and value.isalpha():
+        return value.upper()
+    return value
+
+def _memoized_tool(name: str, func: Callable[[str], str]) -> Callable[[str], str]:
+    """
+    Wrap a tool so repeated calls are served from the per-query memo or the
+    cross-query tool cache instead of refetching.
+    """
+    def wrapper(tool_input: str) -> str:
+        with tracing.span("agent.tool", tool=name) as span:
+            return cached_call(tool_input, span)
+
+    def cached_call(tool_input: str, span: Any) -> str:
+        key = (name, _normalize_tool_input(tool_input))
+        memo = _query_memo.get()
+        metrics = _query_metrics.get()
+        if memo is not None and key in memo:
+            if metrics is not None:
+                metrics["tool_cache_hits"] += 1
+            span.set(cache="query_memo")
+            return memo[key]
+
+        loaded = []
+        def load():
+            loaded.append(True)
+            return func(key[1])
+        # Error results expire immediately so transient failures are retried
+        result = _tool_cache.get_or_load(key, load, ttl_for=lambda r: 0 if "Error" in r else AGENT_TOOL_CACHE_TTL)
+
+        span.set(cache="miss" if loaded else "tool_cache")
+        if metrics is not None:
+            metrics["tool_executions" if loaded else "tool_cache_hits"] += 1
+        if memo is not None:
+            memo[key] = result
+        return result
+
+    return wrapper
+
+
+class AgentMetricsHandler(BaseCallbackHandler):
+    """Counts LLM and tool invocations for one agent query."""
+
+    def __init__(self, metrics: Dict[str, Any]):
+        self.metrics = metrics
+
+    def on_llm_start(self, serialized: Dict[str, Any], prompts: Any, **kwargs: Any):
+        self.metrics["llm_calls"] += 1
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: Any, **kwargs: Any):
+        self.metrics["llm_calls"] += 1
+
+    def on_tool_start(self, serialized: Dict[str, Any], input_str: str, **kwargs: Any):
+        self.metrics["tool_calls"] += 1
+
+
+class TracingHandler(BaseCallbackHandler):
+    """Records each LLM call as a span in the current trace."""
+
+    def __init__(self):
+        self._spans: Dict[Any, Any] = {}
+
+    def on_llm_start(self, serialized: Dict[str, Any], prompts: Any, **kwargs: Any):
+        self._spans[kwargs.get("run_id")] = tracing.start_span("agent.llm")
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: Any, **kwargs: Any):
+        self._spans[kwargs.get("run_id")] = tracing.start_span("agent.llm")
+
+    def on_llm_end(self, response: Any, **kwargs: Any):
+        span = self._spans.pop(kwargs.get("run_id"), None)
+        if span is not None:
+            span.end()
+
+    def on_llm_error(self, error: BaseException, **kwargs: Any):
+        span = self._spans.pop(kwargs.get("run_id"), None)
+        if span is not None:
+            span.error = f"{type(error).__name__}: {error}"
+            span.end()
+
 def create_tools():
     """
     Create tools for the LangChain agent.
@@ -48,31 +207,84 @@ def create_tools():
         config = COUNTRY_CONFIG[country]
         return f"Stock Exchange: {config['stock_exchange']}\nMajor Indices: {', '.join(config['major_indices'])}"
     
+    def get_country_snapshot_tool(country: str) -> str:
+        """Get currency, exchange rates, indices and exchange info for a country in one call."""
+        if country not in COUNTRY_CONFIG:
+            return f"Country {country} not found. Available: {', '.join(COUNTRY_CONFIG.keys())}"
+        
+        config = COUNTRY_CONFIG[country]
+        rates = get_prefetched_rates(config["code"]) or get_exchange_rates(config["code"])
+        indices = get_prefetched_indices(country) or get_stock_indices(config["major_indices"])
+        index_names = get_index_names(config["major_indices"])
+        return "\n".join([
+            f"Official currency of {country}: {config['code']}",
+            f"Stock Exchange: {config['stock_exchange']}",
+            format_exchange_rates(rates),
+            format_indices_data(indices, index_names),
+        ])
+    
+    def get_historical_analytics_tool(country: str) -> str:
+        """Get multi-year returns, volatility, drawdowns and correlations for a country's indices and currency."""
+        if country not in COUNTRY_CONFIG:
+            return f"Country {country} not found. Available: {', '.join(COUNTRY_CONFIG.keys())}"
+        try:
+            return format_analytics(country)
+        except Exception as e:
+            return f"Error: {str(e)}"
+    
     tools = [
+        Tool(
+            name="Get Country Snapshot",
+            func=_memoized_tool("Get Country Snapshot", get_country_snapshot_tool),
+            description=(
+                "Preferred first step: get a country's currency, exchange rates, stock indices and "
+                "stock exchange in one call. Input: country name (e.g., 'Japan')"
+            )
+        ),
         Tool(
             name="Get Currency",
-            func=get_currency_tool,
+            func=_memoized_tool("Get Currency", get_currency_tool),
             description="Get the official currency code for a country. Input: country name (e.g., 'Japan')"
         ),
         Tool(
             name="Get Exchange Rate",
-            func=get_exchange_rate_tool,
+            func=_memoized_tool("Get Exchange Rate", get_exchange_rate_tool),
             description="Get exchange rates for a currency against USD, INR, GBP, EUR. Input: currency code (e.g., 'JPY')"
         ),
         Tool(
             name="Get Stock Indices",
-            func=get_stock_indices_tool,
+            func=_memoized_tool("Get Stock Indices", get_stock_indices_tool),
             description="Get current values of major stock indices for a country. Input: country name"
         ),
         Tool(
             name="Get Exchange Info",
-            func=get_exchange_info_tool,
+            func=_memoized_tool("Get Exchange Info", get_exchange_info_tool),
             description="Get information about the stock exchange in a country. Input: country name"
         ),
+        Tool(
+            name="Get Historical Analytics",
+            func=_memoized_tool("Get Historical Analytics", get_historical_analytics_tool),
+            description=(
+                "Get trailing 1M/3M/1Y returns, annualized volatility, drawdowns and correlations "
+                "for a country's stock indices and currency. Input: country name"
+            )
+        ),
     ]
     
     return tools
 
+class StreamingChatGoogleGenerativeAI(ChatGoogleGenerativeAI):
+    """
+    Gemini chat model whose blocking calls use the streaming API, so
+    on_llm_new_token callbacks fire while the agent runs. Every call draws
+    from the Gemini request quota.
+    """
+
+    def _generate(self, messages: List[Any], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any):
+        rate_limiter.acquire(rate_limiter.GEMINI)
+        return generate_from_stream(self._stream(messages, stop=stop, run_manager=run_manager, **kwargs))
+
+@tracing.traced("agent.init")
 def create_llm_agent():
     """
     Create a LangChain agent with Google Generative AI (Gemini).
@@ -80,7 +292,7 @@ def create_llm_agent():
     Returns:
         Agent executor
     """
-    llm = ChatGoogleGenerativeAI(
+    llm = StreamingChatGoogleGenerativeAI(
         model="gemini-2.5-pro",
         google_api_key=GOOGLE_API_KEY,
         temperature=0.3
@@ -100,9 +312,62 @@ def create_llm_agent():
     
     return agent
 
+def _run_query(agent: Any, query: str, callbacks: Optional[List[BaseCallbackHandler]] = None) -> Tuple[str, Dict[str, Any]]:
+    """Answer a query (from cache or the agent) and return the output with its metrics."""
+    with tracing.span("agent.query") as span:
+        output, metrics = _answer_query(agent, query, callbacks)
+        span.set(llm_calls=metrics["llm_calls"], tool_calls=metrics["tool_calls"], response_cache_hit=metrics["response_cache_hit"])
+        return output, metrics
+
+def _answer_query(agent: Any, query: str, callbacks: Optional[List[BaseCallbackHandler]]) -> Tuple[str, Dict[str, Any]]:
+    metrics = {
+        "query": query,
+        "llm_calls": 0,
+        "tool_calls": 0,
+        "tool_executions": 0,
+        "tool_cache_hits": 0,
+        "response_cache_hit": False,
+    }
+    fingerprint = data_fingerprint() if RESPONSE_CACHE_ENABLED else None
+    if fingerprint is not None:
+        cached = _response_cache.get(query, fingerprint)
+        if cached is not None:
+            metrics["response_cache_hit"] = True
+            metrics["seconds"] = 0.0
+            with _metrics_lock:
+                _metrics_history.append(metrics)
+            return cached, metrics
+
+    memo_token = _query_memo.set({})
+    metrics_token = _query_metrics.set(metrics)
+    start = time.perf_counter()
+    try:
+        handlers = [AgentMetricsHandler(metrics)] + list(callbacks or [])
+        if tracing.is_enabled():
+            handlers.append(TracingHandler())
+        response = agent.invoke({"input": query}, config={"callbacks": handlers})
+        output = response.get("output", str(response))
+        if fingerprint is not None and not output.startswith("Agent stopped"):
+            _response_cache.put(query, fingerprint, output)
+        return output, metrics
+    except Exception as e:
+        return f"Error: {str(e)}", metrics
+    finally:
+        metrics["seconds"] = round(time.perf_counter() - start, 3)
+        _query_memo.reset(memo_token)
+        _query_metrics.reset(metrics_token)
+        with _metrics_lock:
+            _metrics_history.append(metrics)
+
 def query_agent(agent: Any, query: str) -> str:
     """
     Query the LangChain agent.
+
+    Identical or near-identical questions are answered from the response
+    cache until the underlying data changes. Otherwise tool results are
+    memoized for the duration of the query (and shared across queries via
+    the tool cache); LLM and tool call counts are recorded for
+    get_agent_metrics().
     
     Args:
         agent: The agent executor
@@ -111,8 +376,121 @@ def query_agent(agent: Any, query: str) -> str:
     Returns:
         Agent response
     """
-    try:
-        response = agent.invoke({"input": query})
-        return response.get("output", str(response))
-    except Exception as e:
-        return f"Error: {str(e)}"
+    output, _ = _run_query(agent, query)
+    return output
+
+
+class _StreamingHandler(BaseCallbackHandler):
+    """
+    Forwards agent progress to a queue: tool calls, tool results, and tokens
+    of the final answer (text after "Final Answer:" in the current LLM call).
+    """
+
+    def __init__(self, events: "queue.Queue"):
+        self.events = events
+        self._text = ""
+        self._answer_started = False
+
+    def _reset(self):
+        self._text = ""
+        self._answer_started = False
+
+    def on_llm_start(self, serialized: Dict[str, Any], prompts: Any, **kwargs: Any):
+        self._reset()
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: Any, **kwargs: Any):
+        self._reset()
+
+    def on_llm_new_token(self, token: str, **kwargs: Any):
+        if self._answer_started:
+            self.events.put(("token", token))
+            return
+        self._text += token
+        marker = self._text.find(FINAL_ANSWER_MARKER)
+        if marker != -1:
+            self._answer_started = True
+            remainder = self._text[marker + len(FINAL_ANSWER_MARKER):].lstrip()
+            if remainder:
+                self.events.put(("token", remainder))
+
+    def on_agent_action(self, action: Any, **kwargs: Any):
+        self.events.put(("tool", {"tool": action.tool, "input": action.tool_input}))
+
+    def on_tool_end(self, output: Any, **kwargs: Any):
+        self.events.put(("observation", str(output)))
+
+
+def stream_agent(agent: Any, query: str) -> Iterator[Tuple[str, Any]]:
+    """
+    Query the agent and yield progress events as they happen.
+
+    The agent runs on a worker thread; this generator yields:
+        ("tool", {"tool": name, "input": input}) when a tool is chosen
+        ("observation", text) when a tool returns
+        ("token", text) for final-answer tokens (when the model streams)
+        ("final", {"output": text, "metrics": dict}) once, at the end
+
+    Time to the first answer text is recorded as metrics["time_to_first_token"]
+    (None when no token was streamed, e.g. cached answers or non-streaming models).
+    
+    Args:
+        agent: The agent executor
+        query: User query
+        
+    Yields:
+        (kind, payload) tuples
+    """
+    events: "queue.Queue" = queue.Queue()
+    result: Dict[str, Any] = {}
+    done = object()
+
+    def worker():
+        try:
+            result["output"], result["metrics"] = _run_query(agent, query, callbacks=[_StreamingHandler(events)])
+        finally:
+            events.put((done, None))
+
+    start = time.perf_counter()
+    first_token_at = None
+    threading.Thread(target=tracing.propagate(worker), name="agent-stream", daemon=True).start()
+    while True:
+        kind, payload = events.get()
+        if kind is done:
+            break
+        if kind == "token" and first_token_at is None:
+            first_token_at = time.perf_counter()
+        yield kind, payload
+
+    metrics = result.get("metrics", {})
+    metrics["time_to_first_token"] = round(first_token_at - start, 3) if first_token_at is not None else None
+    yield "final", {"output": result.get("output", ""), "metrics": metrics}
+
+def reset_caches():
+    """Drop cached tool results and answers (e.g. between benchmark iterations)."""
+    _tool_cache.invalidate()
+    _response_cache.clear()
+
+def get_agent_metrics() -> Dict[str, Any]:
+    """
+    Get LLM and tool call statistics for recent agent queries.
+
+    Returns:
+        Dictionary with per-query averages, the most recent query's counts,
+        and tool cache statistics
+    """
+    with _metrics_lock:
+        history = list(_metrics_history)
+    summary: Dict[str, Any] = {
+        "queries": len(history),
+        "tool_cache": _tool_cache.stats(),
+        "response_cache": _response_cache.stats(),
+    }
+    if history:
+        for key in ("llm_calls", "tool_calls", "tool_executions", "tool_cache_hits", "response_cache_hit", "seconds"):
+            summary[f"avg_{key}"] = round(sum(m[key] for m in history) / len(history), 3)
+        summary["last_query"] = history[-1]
+        # Queries that streamed no tokens have no time to first token
+        ttft = [m["time_to_first_token"] for m in history if m.get("time_to_first_token") is not None]
+        if ttft:
+            summary["avg_time_to_first_token"] = round(sum(ttft) / len(ttft), 3)
+    return summary
@@ -0,0 +1,444 @@
+import copy
+import threading
+import time
+from collections import deque
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional
+import numpy as np
+import pandas as pd
+from config import COUNTRY_CONFIG, ANALYTICS_HISTORY_YEARS, ANALYTICS_REFRESH_SECONDS, ANALYTICS_REVISION_DAYS
+from currency_utils import get_rate_history, PIVOT_CURRENCY
+from stock_utils import get_index_history
+import tracing
+
+TRADING_DAYS = 252
+
+# Trailing return horizons in trading days
+RETURN_HORIZONS = {"1M": 21, "3M": 63, "1Y": 252}
+
+
+def log_returns(prices: pd.DataFrame) -> pd.DataFrame:
+    """
+    Daily log returns, each series measured between its own trading days.
+
+    Exchanges keep different calendars, so a return is taken from the
+    series' previous valid close and is NaN on days it did not trade.
+
+    Args:
+        prices: Date-indexed prices, one column per series (NaN where no bar)
+
+    Returns:
+        DataFrame of log returns aligned with prices
+    """
+    log_prices = np.log(prices.to_numpy(dtype=np.float64))
+    filled = pd.DataFrame(log_prices).ffill().to_numpy()
+    returns = np.full_like(filled, np.nan)
+    returns[1:] = filled[1:] - filled[:-1]
+    returns[np.isnan(log_prices)] = np.nan
+    return pd.DataFrame(returns, index=prices.index, columns=prices.columns)
+
+
+def trailing_returns(prices: pd.DataFrame, horizons: Dict[str, int] = RETURN_HORIZONS) -> pd.DataFrame:
+    """
+    Simple returns over trailing horizons ending at each series' latest close.
+
+    Returns:
+        DataFrame indexed by series with one column per horizon
+    """
+    filled = prices.ffill().to_numpy(dtype=np.float64)
+    last = filled[-1] if len(filled) else np.full(prices.shape[1], np.nan)
+    result = {}
+    for label, rows in horizons.items():
+        base = filled[-1 - rows] if len(filled) > rows else np.full(prices.shape[1], np.nan)
+        result[label] = last / base - 1
+    return pd.DataFrame(result, index=prices.columns)
+
+
+def drawdowns(prices: pd.DataFrame) -> pd.DataFrame:
+    """Drawdown from the running peak at every date (0 at a new high)."""
+    filled = prices.ffill()
+    return filled / filled.cummax() - 1
+
+
+def rolling_volatility(prices: pd.DataFrame, window: int = 63) -> pd.DataFrame:
+    """Annualized volatility of daily log returns over a rolling window of trading days."""
+    returns = log_returns(prices)
+    return returns.rolling(window, min_periods=max(2, window // 2)).std() * np.sqrt(TRADING_DAYS)
+
+
+class RollingStats:
+    """
+    Return statistics across many series, updated one bar at a time.
+
+    Keeps pairwise sufficient statistics (counts, sums, sums of squares and
+    cross-products over dates where both series have a return), so the
+    correlation matrix, annualized volatility and mean return are O(k^2)
+    to update per bar instead of a pass over the whole history. With a
+    window, bars older than the last `window` returns are subtracted back
+    out. Running peaks track drawdowns over everything pushed.
+    """
+
+    def __init__(self, columns: List[str], window: Optional[int] = None):
+        self.columns = list(columns)
+        self.window = window
+        k = len(self.columns)
+        self.count = np.zeros((k, k))
+        self.sum_x = np.zeros((k, k))
+        self.sum_xx = np.zeros((k, k))
+        self.sum_xy = np.zeros((k, k))
+        self.last_log_price = np.full(k, np.nan)
+        self.peak = np.full(k, np.nan)
+        self.drawdown = np.zeros(k)
+        self.max_drawdown = np.zeros(k)
+        self.last_date: Optional[pd.Timestamp] = None
+        self._window_rows: deque = deque()
+
+    def _accumulate(self, returns: np.ndarray, sign: float):
+        """Add (sign=1) or remove (sign=-1) a block of return rows."""
+        valid = ~np.isnan(returns)
+        x = np.where(valid, returns, 0.0)
+        m = valid.astype(np.float64)
+        self.count += sign * (m.T @ m)
+        self.sum_x += sign * (x.T @ m)
+        self.sum_xx += sign * ((x * x).T @ m)
+        self.sum_xy += sign * (x.T @ x)
+
+    def extend(self, prices: pd.DataFrame):
+        """
+        Add new bars (dates after last_date) in one vectorized step.
+
+        Args:
+            prices: Date-indexed prices with the same columns
+        """
+        prices = prices.reindex(columns=self.columns)
+        if self.last_date is not None:
+            prices = prices[prices.index > self.last_date]
+        if prices.empty:
+            return
+
+        values = prices.to_numpy(dtype=np.float64)
+        log_prices = np.log(values)
+        filled = pd.DataFrame(np.vstack([self.last_log_price, log_prices])).ffill().to_numpy()
+        returns = filled[1:] - filled[:-1]
+        returns[np.isnan(log_prices)] = np.nan
+
+        self._accumulate(returns, 1.0)
+        if self.window:
+            self._window_rows.extend(returns)
+            excess = len(self._window_rows) - self.window
+            if excess > 0:
+                expired = np.array([self._window_rows.popleft() for _ in range(excess)])
+                self._accumulate(expired, -1.0)
+
+        # Running peaks over the whole block at once; drawdown is measured from the latest close
+        running_peak = np.fmax.accumulate(np.vstack([self.peak, values]), axis=0)[1:]
+        self.peak = running_peak[-1]
+        block_drawdown = values / running_peak - 1
+        self.max_drawdown = np.fmin(self.max_drawdown, np.fmin.reduce(block_drawdown, axis=0))
+        last_valid = pd.DataFrame(values).ffill().to_numpy()[-1]
+        has_bar = ~np.isnan(last_valid)
+        self.drawdown[has_bar] = last_valid[has_bar] / self.peak[has_bar] - 1
+
+        self.last_log_price = filled[-1]
+        self.last_date = prices.index[-1]
+
+    def push(self, bar_date: Any, bar: Dict[str, float]):
+        """Add a single new bar (series missing from bar did not trade that day)."""
+        row = pd.DataFrame([bar], index=pd.DatetimeIndex([pd.Timestamp(bar_date)]))
+        self.extend(row)
+
+    def correlation(self) -> pd.DataFrame:
+        """Pairwise correlation of daily returns over overlapping dates."""
+        with np.errstate(invalid="ignore", divide="ignore"):
+            n = self.count
+            cov = self.sum_xy - self.sum_x * self.sum_x.T / n
+            var_i = self.sum_xx - self.sum_x ** 2 / n
+            var_j = var_i.T
+            corr = cov / np.sqrt(var_i * var_j)
+        corr[n < 3] = np.nan
+        return pd.DataFrame(np.clip(corr, -1, 1), index=self.columns, columns=self.columns)
+
+    def volatility(self) -> pd.Series:
+        """Annualized volatility of daily log returns."""
+        n = np.diag(self.count)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            var = (np.diag(self.sum_xx) - np.diag(self.sum_x) ** 2 / n) / (n - 1)
+        return pd.Series(np.sqrt(np.maximum(var, 0) * TRADING_DAYS), index=self.columns)
+
+    def annualized_return(self) -> pd.Series:
+        """Mean daily log return scaled to a year."""
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.diag(self.sum_x) / np.diag(self.count)
+        return pd.Series(mean * TRADING_DAYS, index=self.columns)
+
+    def drawdowns(self) -> pd.DataFrame:
+        """Current and maximum drawdown per series."""
+        return pd.DataFrame({"drawdown": self.drawdown, "max_drawdown": self.max_drawdown}, index=self.columns)
+
+
+def universe() -> Dict[str, List[str]]:
+    """Index symbols and (non-pivot) currency codes covered by the engine."""
+    return {
+        "indices": [symbol for config in COUNTRY_CONFIG.values() for symbol in config["major_indices"]],
+        # Countries can share a currency (the euro area), so each code is listed once
+        "currencies": list(dict.fromkeys(
+            config["code"] for config in COUNTRY_CONFIG.values() if config["code"] != PIVOT_CURRENCY
+        )),
+    }
+
+
+def load_prices(start: date, end: Optional[date] = None, revise_from: Optional[date] = None) -> pd.DataFrame:
+    """
+    Read index closes and currency values from the history store.
+
+    Currencies are expressed as the USD value of one unit, so a rising
+    series means the currency strengthened against the dollar.
+
+    Args:
+        start: First date
+        end: Last date (defaults to today)
+        revise_from: Stored bars from this date on are downloaded again
+
+    Returns:
+        Date-indexed frame with one column per index symbol and currency code
+    """
+    members = universe()
+    indices = get_index_history(members["indices"], start, end, revise_from)
+    fx = get_rate_history(members["currencies"], start, end, revise_from)
+    prices = pd.concat([indices, 1.0 / fx], axis=1).sort_index()
+    return prices.reindex(columns=members["indices"] + members["currencies"])
+
+
+def index_currencies(symbols: List[str]) -> Dict[str, str]:
+    """Local currency of each index symbol (the pivot for unknown symbols)."""
+    owners = {symbol: config["code"] for config in COUNTRY_CONFIG.values() for symbol in config["major_indices"]}
+    return {symbol: owners.get(symbol, PIVOT_CURRENCY) for symbol in symbols}
+
+
+def align_fx(fx: pd.DataFrame, dates: pd.Index) -> pd.DataFrame:
+    """
+    As-of join of FX fixes onto another calendar.
+
+    Each date takes the latest fix on or before it, so an exchange trading
+    on an FX holiday (or the other way round) still gets a rate. Done as one
+    binary search over the whole history rather than a lookup per date.
+
+    Args:
+        fx: Date-indexed rates, one column per currency (NaN where no fix)
+        dates: Dates to align to
+
+    Returns:
+        DataFrame indexed by dates (NaN before a currency's first fix)
+    """
+    if fx.empty:
+        return pd.DataFrame(index=dates, columns=fx.columns, dtype=np.float64)
+    fx = fx.sort_index()
+    filled = fx.ffill().to_numpy(dtype=np.float64)
+    positions = fx.index.searchsorted(dates, side="right") - 1
+    aligned = filled[np.maximum(positions, 0)]
+    aligned[positions < 0] = np.nan
+    return pd.DataFrame(aligned, index=dates, columns=fx.columns)
+
+
+def convert_index_history(symbols: List[str], quote: str, start: date, end: Optional[date] = None) -> pd.DataFrame:
+    """
+    Daily index closes expressed in one quote currency.
+
+    Every close is multiplied by the units of quote per unit of the index's
+    local currency on that date, computed for all indices and dates at once
+    from the units-per-USD history.
+
+    Args:
+        symbols: Index symbols
+        quote: Currency code to express the indices in
+        start: First date
+        end: Last date (defaults to today)
+
+    Returns:
+        DataFrame indexed by date with one column per symbol (NaN on days
+        the exchange did not trade or before FX history is available)
+    """
+    currencies = index_currencies(symbols)
+    prices = get_index_history(symbols, start, end)
+    if prices.empty:
+        return prices
+    codes = sorted({*currencies.values(), quote} - {PIVOT_CURRENCY})
+    fx = align_fx(get_rate_history(codes, start, end) if codes else pd.DataFrame(), prices.index)
+    fx[PIVOT_CURRENCY] = 1.0
+    per_usd = fx.to_numpy(dtype=np.float64)
+    local = fx.columns.get_indexer([currencies[symbol] for symbol in prices.columns])
+    factor = per_usd[:, [fx.columns.get_loc(quote)]] / per_usd[:, local]
+    return pd.DataFrame(prices.to_numpy(dtype=np.float64) * factor, index=prices.index, columns=prices.columns)
+
+
+def rebased(prices: pd.DataFrame, base: float = 100.0) -> pd.DataFrame:
+    """Scale each series to base at its first valid value."""
+    return prices / prices.bfill().iloc[0] * base
+
+
+def currency_adjusted_returns(symbols: List[str], quote: str, start: date, end: Optional[date] = None) -> pd.DataFrame:
+    """
+    Split each index's return over a period into market and currency parts.
+
+    Args:
+        symbols: Index symbols
+        quote: Currency code to measure returns in
+        start: First date
+        end: Last date (defaults to today)
+
+    Returns:
+        DataFrame indexed by symbol with currency, local_return,
+        fx_return and quote_return, where
+        (1 + quote_return) = (1 + local_return) * (1 + fx_return)
+    """
+    local = get_index_history(symbols, start, end)
+    converted = convert_index_history(symbols, quote, start, end)
+    if local.empty:
+        return pd.DataFrame(columns=["currency", "local_return", "fx_return", "quote_return"])
+    local_return = local.ffill().iloc[-1] / local.bfill().iloc[0] - 1
+    quote_return = converted.ffill().iloc[-1] / converted.bfill().iloc[0] - 1
+    return pd.DataFrame({
+        "currency": pd.Series(index_currencies(symbols)),
+        "local_return": local_return,
+        "fx_return": (1 + quote_return) / (1 + local_return) - 1,
+        "quote_return": quote_return,
+    }).reindex(symbols)
+
+
+class AnalyticsEngine:
+    """
+    Process-wide analytics over cached history.
+
+    The first call loads ANALYTICS_HISTORY_YEARS of prices and builds the
+    statistics in one pass; later refreshes (at most every
+    ANALYTICS_REFRESH_SECONDS) read only recent bars and add them
+    incrementally. Bars from the last ANALYTICS_REVISION_DAYS may still
+    change (late bars, partial intraday bars), so the statistics are
+    checkpointed before them and every refresh re-reads that tail and
+    rebuilds it from the checkpoint.
+    """
+
+    def __init__(self, years: int = ANALYTICS_HISTORY_YEARS, revision_days: int = ANALYTICS_REVISION_DAYS):
+        self.years = years
+        self.revision_days = revision_days
+        self.prices: Optional[pd.DataFrame] = None
+        self.stats: Optional[RollingStats] = None
+        # Statistics over settled bars only (before the revision window)
+        self._settled: Optional[RollingStats] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _apply(self, stats: RollingStats, prices: pd.DataFrame, revise_from: date):
+        """Extend stats with prices, checkpointing after the settled bars."""
+        cutoff = pd.Timestamp(revise_from)
+        stats.extend(prices[prices.index < cutoff])
+        self._settled = copy.deepcopy(stats)
+        stats.extend(prices[prices.index >= cutoff])
+        self.stats = stats
+
+    @tracing.traced("analytics.refresh")
+    def refresh(self, force: bool = False):
+        with self._lock:
+            if not force and self.stats is not None and time.time() - self._checked_at < ANALYTICS_REFRESH_SECONDS:
+                return
+            self._checked_at = time.time()
+            revise_from = date.today() - timedelta(days=self.revision_days)
+            if self.stats is None:
+                prices = load_prices(date.today() - timedelta(days=365 * self.years), revise_from=revise_from)
+                self._apply(RollingStats(list(prices.columns)), prices, revise_from)
+                self.prices = prices
+                return
+            # Re-read everything after the checkpoint and replace those rows
+            settled = self._settled.last_date
+            if settled is not None:
+                start = (settled + timedelta(days=1)).date()
+            else:
+                start = date.today() - timedelta(days=365 * self.years)
+            recent = load_prices(start, revise_from=revise_from)
+            self._apply(copy.deepcopy(self._settled), recent, revise_from)
+            self.prices = pd.concat([self.prices[self.prices.index < pd.Timestamp(start)], recent])
+
+    def summary(self, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        Per-series statistics.
+
+        Args:
+            columns: Series to include (default: all)
+
+        Returns:
+            DataFrame indexed by series with last value, trailing returns,
+            annualized return and volatility, and current/max drawdown
+        """
+        self.refresh()
+        columns = columns or self.stats.columns
+        tail = self.prices.iloc[-(max(RETURN_HORIZONS.values()) + 1):]
+        frame = pd.concat([
+            tail.ffill().iloc[-1].rename("last") if len(tail) else pd.Series(dtype=float, name="last"),
+            trailing_returns(tail),
+            self.stats.annualized_return().rename("annual_return"),
+            self.stats.volatility().rename("volatility"),
+            self.stats.drawdowns(),
+        ], axis=1)
+        return frame.reindex(columns)
+
+    def correlation(self, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """Correlation matrix of daily returns (optionally restricted to columns)."""
+        self.refresh()
+        corr = self.stats.correlation()
+        return corr.loc[columns, columns] if columns else corr
+
+
+_engine: Optional[AnalyticsEngine] = None
+_engine_lock = threading.Lock()
+
+def get_analytics_engine() -> AnalyticsEngine:
+    """Return the process-wide analytics engine."""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = AnalyticsEngine()
+        return _engine
+
+def country_series(country: str) -> List[str]:
+    """Series the engine reports for a country: its indices and (non-USD) currency."""
+    config = COUNTRY_CONFIG[country]
+    series = list(config["major_indices"])
+    if config["code"] != PIVOT_CURRENCY:
+        series.append(config["code"])
+    return series
+
+def format_analytics(country: str) -> str:
+    """
+    Describe a country's historical performance for the agent.
+
+    Args:
+        country: Country name from COUNTRY_CONFIG
+
+    Returns:
+        Formatted string with returns, volatility, drawdowns and the series
+        most and least correlated with the country's main index
+    """
+    from stock_utils import get_index_names
+
+    engine = get_analytics_engine()
+    series = country_series(country)
+    summary = engine.summary(series)
+    names = get_index_names(universe()["indices"])
+    pct = lambda v: "N/A" if pd.isna(v) else f"{v * 100:.1f}%"
+
+    lines = [f"**Historical analytics for {country} ({engine.years}y of daily data)**"]
+    for symbol, row in summary.iterrows():
+        label = names.get(symbol, f"{symbol} (value in USD)")
+        lines.append(
+            f"- {label}: 1M {pct(row['1M'])}, 3M {pct(row['3M'])}, 1Y {pct(row['1Y'])}, "
+            f"volatility {pct(row['volatility'])}, drawdown {pct(row['drawdown'])} (max {pct(row['max_drawdown'])})"
+        )
+
+    main = series[0]
+    corr = engine.correlation()[main].drop(main).dropna().sort_values()
+    if not corr.empty:
+        lines.append(
+            f"- Most correlated with {names.get(main, main)}: {names.get(corr.index[-1], corr.index[-1])} ({corr.iloc[-1]:.2f}); "
+            f"least: {names.get(corr.index[0], corr.index[0])} ({corr.iloc[0]:.2f})"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,223 @@
+"""
+Headless HTTP/JSON API serving the dashboard's data.
+
+Run alongside the Streamlit UI:
+
+    python api_server.py --port 8080
+
+Endpoints:
+    GET /api/health
+    GET /api/rates/{base}                         e.g. /api/rates/JPY
+    GET /api/cross-rates?bases=JPY,INR&quotes=USD,EUR
+    GET /api/indices?symbols=^N225,^GSPC          or ?country=Japan
+    GET /api/countries/{country}                  currency, rates, indices, exchange (name or ISO code, any case)
+    POST /api/portfolio/value?target=EUR          JSON {"positions": [{"amount", "currency"}]} or text/csv body
+    GET /api/stats                                cache, shared cache, HTTP client, quota, FX provider and breaker counters
+
+Every data response carries an ETag; clients that send it back in
+If-None-Match get an empty 304 when nothing changed.
+"""
+import argparse
+import asyncio
+import hashlib
+import io
+import json
+from functools import partial
+from typing import Any, Callable, Dict, List
+import pandas as pd
+from aiohttp import web
+from config import COUNTRY_CONFIG, API_HOST, API_PORT, API_INDICES_CACHE_TTL, PREFETCH_ENABLED
+from cache import TTLCache
+from cache_backend import get_backend_stats
+from registry import get_registry
+from currency_utils import get_exchange_rates, get_comparison_rates, get_rate_cache_stats, DISPLAY_QUOTES
+from stock_utils import get_stock_indices, get_index_names, get_breaker_stats
+from prefetch import start_prefetcher, get_prefetched_rates, get_prefetched_indices
+from snapshots import to_jsonable
+from portfolio import value_portfolio, AMOUNT_COLUMN, CURRENCY_COLUMN
+import http_client
+import rate_limiter
+import fx_providers
+
+routes = web.RouteTableDef()
+
+# Index quotes for ad-hoc symbol lists; country indices come from prefetch snapshots
+_indices_cache = TTLCache(max_entries=256, default_ttl=API_INDICES_CACHE_TTL, name="api_indices", shared=True)
+
+
+def _etag(body: bytes) -> str:
+    return '"' + hashlib.sha1(body).hexdigest()[:20] + '"'
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    if not header:
+        return False
+    candidates = [tag.strip() for tag in header.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+
+def json_response(request: web.Request, payload: Dict[str, Any], status: int = 200) -> web.Response:
+    """
+    Serialize payload with an ETag, answering 304 if the client already has it.
+
+    Args:
+        request: Incoming request (checked for If-None-Match)
+        payload: JSON-serializable body
+        status: Status code for a full response
+
+    Returns:
+        aiohttp Response
+    """
+    body = json.dumps(payload, sort_keys=True, default=to_jsonable).encode()
+    etag = _etag(body)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if status == 200 and _etag_matches(request.headers.get("If-None-Match", ""), etag):
+        return web.Response(status=304, headers=headers)
+    return web.Response(body=body, status=status, content_type="application/json", headers=headers)
+
+
+async def _run(func: Callable, *args: Any) -> Any:
+    """Run a blocking data call on the default executor."""
+    return await asyncio.get_running_loop().run_in_executor(None, partial(func, *args))
+
+
+def _split(value: str) -> List[str]:
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+def _cached_indices(symbols: List[str]) -> Dict[str, Any]:
+    return _indices_cache.get_or_load(
+        tuple(symbols),
+        lambda: get_stock_indices(symbols),
+        ttl_for=lambda result: 0 if "error" in result else API_INDICES_CACHE_TTL,
+    )
+
+
+def _country_indices(country: str) -> Dict[str, Any]:
+    return get_prefetched_indices(country) or _cached_indices(COUNTRY_CONFIG[country]["major_indices"])
+
+
+@routes.get("/api/health")
+async def health(request: web.Request) -> web.Response:
+    return web.json_response({"status": "ok"})
+
+
+@routes.get("/api/rates/{base}")
+async def rates(request: web.Request) -> web.Response:
+    base = request.match_info["base"].upper()
+    payload = get_prefetched_rates(base) or await _run(get_exchange_rates, base)
+    return json_response(request, payload, 502 if "error" in payload else 200)
+
+
+@routes.get("/api/cross-rates")
+async def cross_rates(request: web.Request) -> web.Response:
+    bases = _split(request.query.get("bases", "").upper())
+    quotes = _split(request.query.get("quotes", "").upper()) or DISPLAY_QUOTES
+    if not bases:
+        return web.json_response({"error": "bases query parameter is required"}, status=400)
+    payload = await _run(get_comparison_rates, bases, quotes)
+    return json_response(request, payload, 502 if "error" in payload else 200)
+
+
+@routes.get("/api/indices")
+async def indices(request: web.Request) -> web.Response:
+    country = request.query.get("country")
+    if country:
+        country = get_registry().match_country(country) or country
+        if country not in COUNTRY_CONFIG:
+            return web.json_response({"error": f"Country {country} not found"}, status=404)
+        payload = await _run(_country_indices, country)
+    else:
+        symbols = _split(request.query.get("symbols", ""))
+        if not symbols:
+            return web.json_response({"error": "symbols or country query parameter is required"}, status=400)
+        payload = await _run(_cached_indices, symbols)
+    return json_response(request, payload, 502 if "error" in payload else 200)
+
+
+@routes.get("/api/countries/{country}")
+async def country_snapshot(request: web.Request) -> web.Response:
+    country = get_registry().match_country(request.match_info["country"]) or request.match_info["country"]
+    if country not in COUNTRY_CONFIG:
+        return web.json_response({"error": f"Country {country} not found"}, status=404)
+
+    config = COUNTRY_CONFIG[country]
+    rates_result, indices_result = await asyncio.gather(
+        _run(lambda: get_prefetched_rates(config["code"]) or get_exchange_rates(config["code"])),
+        _run(_country_indices, country),
+    )
+    payload = {
+        "country": country,
+        "currency": config["code"],
+        "stock_exchange": config["stock_exchange"],
+        "exchange_location": {"lat": config["exchange_lat"], "lng": config["exchange_lng"]},
+        "index_names": get_index_names(config["major_indices"]),
+        "rates": rates_result,
+        "indices": indices_result,
+    }
+    return json_response(request, payload)
+
+
+@routes.post("/api/portfolio/value")
+async def portfolio_value(request: web.Request) -> web.Response:
+    target = request.query.get("target", "USD").upper()
+    try:
+        if request.content_type == "text/csv":
+            frame = pd.read_csv(io.BytesIO(await request.read()), dtype={CURRENCY_COLUMN: "category"})
+        else:
+            body = await request.json()
+            target = str(body.get("target", target)).upper()
+            frame = pd.DataFrame(body.get("positions", []), columns=[AMOUNT_COLUMN, CURRENCY_COLUMN])
+    except Exception as e:
+        return web.json_response({"error": f"Invalid positions: {e}"}, status=400)
+    if AMOUNT_COLUMN not in frame or CURRENCY_COLUMN not in frame:
+        return web.json_response({"error": f"Positions need {AMOUNT_COLUMN} and {CURRENCY_COLUMN} columns"}, status=400)
+    try:
+        frame[AMOUNT_COLUMN] = pd.to_numeric(frame[AMOUNT_COLUMN])
+    except (TypeError, ValueError) as e:
+        return web.json_response({"error": f"Invalid amounts: {e}"}, status=400)
+    if get_registry().currency(target) is None:
+        return web.json_response({"error": f"Unknown target currency {target}"}, status=400)
+    payload = await _run(value_portfolio, frame, target)
+    # Positions and target were checked above, so an error here is the rate provider failing
+    return web.json_response(payload, status=502 if "error" in payload else 200)
+
+
+@routes.get("/api/stats")
+async def stats(request: web.Request) -> web.Response:
+    return web.json_response({
+        "rate_cache": get_rate_cache_stats(),
+        "indices_cache": _indices_cache.stats(),
+        "http_client": http_client.get_client().stats(),
+        "rate_limits": rate_limiter.get_limiter_stats(),
+        "fx_providers": fx_providers.get_provider_stats(),
+        "yahoo_breaker": get_breaker_stats(),
+        "shared_cache": get_backend_stats(),
+    })
+
+
+def create_app(prefetch: bool = PREFETCH_ENABLED) -> web.Application:
+    """
+    Build the API application.
+
+    Args:
+        prefetch: Start the background prefetcher so country data is served from snapshots
+
+    Returns:
+        aiohttp Application
+    """
+    app = web.Application()
+    app.add_routes(routes)
+    if prefetch:
+        async def start_background(app: web.Application):
+            start_prefetcher()
+        app.on_startup.append(start_background)
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Headless currency and stock market data API")
+    parser.add_argument("--host", default=API_HOST)
+    parser.add_argument("--port", type=int, default=API_PORT)
+    args = parser.parse_args()
+    web.run_app(create_app(), host=args.host, port=args.port)
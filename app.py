@@ -1,11 +1,16 @@
 import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 import os
+import time
 from dotenv import load_dotenv
-from config import COUNTRY_CONFIG
+from config import COUNTRY_CONFIG, COUNTRY_NAMES, PREFETCH_ENABLED, TRACING_SIDEBAR_PANEL, LIVE_INDICES_INTERVAL
 from currency_utils import get_exchange_rates, format_exchange_rates
 from stock_utils import get_stock_indices, get_index_names, format_indices_data
-from maps_utils import get_exchange_location, display_map, format_location
-from agent import create_llm_agent, query_agent
+from maps_utils import get_exchange_location, display_map, display_world_map, format_location
+from fanout import gather_country_data
+from prefetch import start_prefetcher, get_prefetcher, get_prefetched_rates, get_prefetched_indices, get_live_indices
+import rate_limiter
+import tracing
 
 # Load environment variables
 load_dotenv()
@@ -56,7 +61,7 @@ st.markdown("*Real-time currency exchange rates and stock market indices powered
 st.sidebar.markdown("### 🔧 Configuration")
 selected_country = st.sidebar.selectbox(
     "Select a Country",
-    options=list(COUNTRY_CONFIG.keys()),
+    options=COUNTRY_NAMES,
     help="Choose a country to view its currency and stock market information"
 )
 
@@ -66,14 +71,83 @@ view_mode = st.sidebar.radio(
     help="Choose how you want to view the data"
 )
 
-# Initialize session state
-if 'agent' not in st.session_state:
-    with st.spinner("🤖 Initializing AI Agent..."):
-        try:
-            st.session_state.agent = create_llm_agent()
-        except Exception as e:
-            st.error(f"Failed to initialize AI Agent: {str(e)}")
-            st.session_state.agent = None
+# Live mode refreshes index values from the prefetcher's shared snapshots
+live_indices = view_mode == "Dashboard" and PREFETCH_ENABLED and st.sidebar.toggle(
+    "🔴 Live index updates",
+    help=f"Refresh index values every {LIVE_INDICES_INTERVAL:g}s without reloading the page"
+)
+
+with st.sidebar.expander("🎫 API Quota"):
+    for provider, budget in rate_limiter.get_limiter_stats().items():
+        st.markdown(f"**{provider}**: {budget['remaining_in_window']}/{budget['quota']} left, {budget['tokens']:.0f} burst tokens")
+
+# The admin timing panel needs spans recorded for every rerun
+if TRACING_SIDEBAR_PANEL:
+    tracing.set_enabled(True)
+
+# Time this rerun's stages (no-op unless tracing is enabled); tagged with the
+# session so the timing panel only shows this browser's reruns
+_script_ctx = get_script_run_ctx()
+session_id = _script_ctx.session_id if _script_ctx is not None else ""
+rerun_trace = tracing.start_trace("streamlit.rerun", view=view_mode, country=selected_country, session=session_id)
+
+# Keep rates and indices warm in the background (one scheduler per process)
+if PREFETCH_ENABLED:
+    start_prefetcher()
+    with st.sidebar.expander("🛰️ Data Freshness"):
+        for job in get_prefetcher().status():
+            age = "pending" if job["age_seconds"] is None else f"{job['age_seconds']:.0f}s old"
+            line = f"**{job['key']}**: {age}"
+            if job["failures"]:
+                line += f" ⚠️ {job['failures']} failed, retry in {job['next_run_in']:.0f}s"
+            st.markdown(line)
+
+@st.cache_resource(show_spinner=False)
+def get_shared_agent():
+    """Build the AI agent once per process; it keeps no per-user state, so sessions share it."""
+    # Deferred: langchain and the Gemini client are only loaded when the AI Agent view is used
+    from agent import create_llm_agent
+    return create_llm_agent()
+
+def render_indices(country, live=False):
+    """Stock index values for a country; runs as a fragment so it can refresh on its own."""
+    config = COUNTRY_CONFIG[country]
+    
+    with st.spinner("Fetching stock indices..."), tracing.span("dashboard.indices"):
+        stale_age = None
+        if live:
+            # Timer reruns never fetch per session: last snapshot, or one shared fetch
+            indices, stale_age = get_live_indices(country)
+        else:
+            indices = get_prefetched_indices(country) or get_stock_indices(config["major_indices"])
+        index_names = get_index_names(config["major_indices"])
+        
+        if "error" not in indices:
+            for symbol, data in indices.items():
+                name = index_names.get(symbol, symbol)
+                if "error" not in data:
+                    current = data.get("current", "N/A")
+                    change = data.get("change_percent", 0)
+                    change_emoji = "📈" if change >= 0 else "📉"
+                    
+                    col1, col2 = st.columns([3, 1])
+                    with col1:
+                        st.markdown(f"**{name}**")
+                    with col2:
+                        st.markdown(f"{change_emoji} {change}%")
+                    
+                    st.metric("Value", f"{current}", delta=f"{change}%")
+                    if "data_source" in data:
+                        st.caption(f"⚠️ {data['data_source']} · as of {data.get('last_update') or 'unknown'}")
+                else:
+                    st.warning(f"Could not fetch data for {name}: {data['error']}")
+        else:
+            st.error(f"Could not fetch indices: {indices.get('error')}")
+    
+    if live and stale_age is not None:
+        st.caption(f"⚠️ Live · showing the last snapshot ({stale_age / 60:.0f} min old) · retrying every {LIVE_INDICES_INTERVAL:g}s")
+    elif live:
+        st.caption(f"🔴 Live · refreshed {time.strftime('%H:%M:%S')} · every {LIVE_INDICES_INTERVAL:g}s")
 
 # Main content
 if view_mode == "Dashboard":
@@ -98,8 +172,8 @@ if view_mode == "Dashboard":
     st.markdown("---")
     st.markdown("### 💹 Exchange Rates")
     
-    with st.spinner(f"Fetching exchange rates for {config['code']}..."):
-        rates = get_exchange_rates(config["code"])
+    with st.spinner(f"Fetching exchange rates for {config['code']}..."), tracing.span("dashboard.rates"):
+        rates = get_prefetched_rates(config["code"]) or get_exchange_rates(config["code"])
         
         if "error" not in rates:
             rate_col1, rate_col2, rate_col3, rate_col4 = st.columns(4)
@@ -115,6 +189,9 @@ if view_mode == "Dashboard":
             
             with rate_col4:
                 st.metric(f"1 {config['code']} to EUR", f"{rates.get('EUR', 'N/A')}")
+            
+            if rates.get("stale"):
+                st.caption(f"⚠️ Rate provider unavailable; showing last known rates ({rates['stale_seconds'] // 60} min old)")
         else:
             st.error(f"Could not fetch exchange rates: {rates.get('error')}")
     
@@ -122,31 +199,52 @@ if view_mode == "Dashboard":
     st.markdown("---")
     st.markdown("### 📊 Stock Market Indices (Real-time)")
     
-    with st.spinner("Fetching stock indices..."):
-        indices = get_stock_indices(config["major_indices"])
-        index_names = get_index_names(config["major_indices"])
+    # In live mode only this section reruns, on a timer, from the prefetched snapshot
+    st.fragment(run_every=LIVE_INDICES_INTERVAL if live_indices else None)(render_indices)(selected_country, live_indices)
+    
+    # Row 4: Historical analytics (opt-in; the first use loads years of history)
+    st.markdown("---")
+    st.markdown("### 📈 Historical Performance")
+    
+    if st.toggle("Show returns, volatility and correlations", help="Computed from cached daily history of all indices and currencies"):
+        import altair as alt
+        from analytics import get_analytics_engine, country_series
         
-        if "error" not in indices:
-            for symbol, data in indices.items():
-                name = index_names.get(symbol, symbol)
-                if "error" not in data:
-                    current = data.get("current", "N/A")
-                    change = data.get("change_percent", 0)
-                    change_emoji = "📈" if change >= 0 else "📉"
-                    
-                    col1, col2 = st.columns([3, 1])
-                    with col1:
-                        st.markdown(f"**{name}**")
-                    with col2:
-                        st.markdown(f"{change_emoji} {change}%")
-                    
-                    st.metric("Value", f"{current}", delta=f"{change}%")
-                else:
-                    st.warning(f"Could not fetch data for {name}: {data['error']}")
-        else:
-            st.error(f"Could not fetch indices: {indices.get('error')}")
+        try:
+            with st.spinner("Computing historical analytics..."), tracing.span("dashboard.analytics"):
+                engine = get_analytics_engine()
+                series = country_series(selected_country)
+                summary = engine.summary(series)
+                corr = engine.correlation()
+            
+            names = get_index_names(list(corr.columns))
+            percent_columns = [column for column in summary.columns if column != "last"]
+            table = summary.rename(index=names)
+            table[percent_columns] = table[percent_columns] * 100
+            st.dataframe(
+                table,
+                use_container_width=True,
+                column_config={
+                    "last": st.column_config.NumberColumn("Last", format="%.4g"),
+                    **{column: st.column_config.NumberColumn(column.replace("_", " ").title(), format="%.1f%%") for column in percent_columns},
+                },
+            )
+            
+            heatmap = corr.rename(index=names, columns=names).rename_axis(index="a", columns="b").stack().rename("correlation").reset_index()
+            st.altair_chart(
+                alt.Chart(heatmap).mark_rect().encode(
+                    x=alt.X("b:N", title=None, sort=None),
+                    y=alt.Y("a:N", title=None, sort=None),
+                    color=alt.Color("correlation:Q", scale=alt.Scale(scheme="redblue", domain=[-1, 1])),
+                    tooltip=["a", "b", alt.Tooltip("correlation:Q", format=".2f")],
+                ),
+                use_container_width=True,
+            )
+            st.caption("Correlation of daily log returns across all tracked indices and currencies (vs USD)")
+        except Exception as e:
+            st.error(f"Could not compute historical analytics: {str(e)}")
     
-    # Row 4: Map
+    # Row 5: Map
     st.markdown("---")
     st.markdown("### 📍 Stock Exchange Location")
     
@@ -160,6 +258,17 @@ if view_mode == "Dashboard":
 
 elif view_mode == "AI Agent":
     st.markdown("---")
+    from agent import stream_agent
+    
+    # Initialize session state
+    if 'agent' not in st.session_state:
+        with st.spinner("🤖 Initializing AI Agent..."), tracing.span("agent.get_shared"):
+            try:
+                st.session_state.agent = get_shared_agent()
+            except Exception as e:
+                st.error(f"Failed to initialize AI Agent: {str(e)}")
+                st.session_state.agent = None
+    
     st.markdown("### 🤖 AI Agent Assistant")
     st.info(
         "Ask the AI agent about currency and stock market information for any country. "
@@ -194,22 +303,48 @@ elif view_mode == "AI Agent":
     # Process query
     if submit_button and user_query:
         if st.session_state.agent:
-            with st.spinner("🤔 Agent is thinking..."):
-                try:
-                    response = query_agent(st.session_state.agent, user_query)
-                    
-                    st.markdown("### 📋 Agent Response:")
-                    st.markdown(response)
-                    
-                    # Store in history
-                    if 'query_history' not in st.session_state:
-                        st.session_state.query_history = []
-                    st.session_state.query_history.append({
-                        "query": user_query,
-                        "response": response
-                    })
-                except Exception as e:
-                    st.error(f"Agent error: {str(e)}")
+            try:
+                # Stream tool steps and answer tokens as the agent produces them
+                status = st.status("🤔 Agent is thinking...", expanded=True)
+                st.markdown("### 📋 Agent Response:")
+                answer_placeholder = st.empty()
+                answer = ""
+                response, last = "", {}
+                
+                for kind, payload in stream_agent(st.session_state.agent, user_query):
+                    if kind == "tool":
+                        status.write(f"🔧 **{payload['tool']}**: {payload['input']}")
+                    elif kind == "observation":
+                        status.text(payload[:500])
+                    elif kind == "token":
+                        answer += payload
+                        answer_placeholder.markdown(answer + "▌")
+                    elif kind == "final":
+                        response, last = payload["output"], payload["metrics"]
+                        answer_placeholder.markdown(response)
+                
+                status.update(label="✅ Done", state="complete", expanded=False)
+                
+                if last.get("response_cache_hit"):
+                    st.caption("⚡ Answered from cache (data unchanged since this question was last asked)")
+                else:
+                    ttft = last.get("time_to_first_token")
+                    first_text = f" (first answer text after {ttft}s)" if ttft is not None else ""
+                    st.caption(
+                        f"⏱️ {last.get('seconds', 0)}s{first_text} · "
+                        f"LLM calls: {last.get('llm_calls', 0)} · "
+                        f"tool calls: {last.get('tool_calls', 0)} ({last.get('tool_cache_hits', 0)} served from cache)"
+                    )
+                
+                # Store in history
+                if 'query_history' not in st.session_state:
+                    st.session_state.query_history = []
+                st.session_state.query_history.append({
+                    "query": user_query,
+                    "response": response
+                })
+            except Exception as e:
+                st.error(f"Agent error: {str(e)}")
         else:
             st.error("AI Agent is not initialized. Please check your API key.")
     
@@ -228,51 +363,122 @@ elif view_mode == "Compare Countries":
     # Select countries to compare
     countries_to_compare = st.multiselect(
         "Select countries to compare",
-        options=list(COUNTRY_CONFIG.keys()),
+        options=COUNTRY_NAMES,
         default=[selected_country]
     )
     
     if countries_to_compare:
         # Comparison table
-        comparison_data = []
+        import pandas as pd
         
-        for country in countries_to_compare:
+        all_rates = {}
+        all_indices = {}
+        
+        def build_comparison_row(country):
             config = COUNTRY_CONFIG[country]
+            rates = all_rates.get(config["code"], all_rates) if all_rates else {}
+            indices = all_indices.get(country)
+            
+            if indices is None:
+                indices_text = "Loading..."
+            elif "error" in indices:
+                indices_text = "Error"
+            else:
+                index_names = get_index_names(list(indices.keys()))
+                indices_text = ", ".join(
+                    f"{index_names.get(symbol, symbol)}: {data.get('current', 'N/A')} ({data.get('change_percent', 0)}%)"
+                    for symbol, data in indices.items()
+                )
             
-            with st.spinner(f"Fetching data for {country}..."):
-                rates = get_exchange_rates(config["code"])
-                indices = get_stock_indices(config["major_indices"])
+            def rate_cell(quote):
+                if not rates:
+                    return "Loading..."
+                return rates.get(quote, "N/A") if "error" not in rates else "Error"
             
-            comparison_data.append({
+            return {
                 "Country": country,
                 "Currency": config["code"],
                 "Exchange": config["stock_exchange"],
-                "To USD": rates.get("USD", "N/A") if "error" not in rates else "Error",
-                "To INR": rates.get("INR", "N/A") if "error" not in rates else "Error",
-                "To GBP": rates.get("GBP", "N/A") if "error" not in rates else "Error",
-                "To EUR": rates.get("EUR", "N/A") if "error" not in rates else "Error",
-            })
+                "To USD": rate_cell("USD"),
+                "To INR": rate_cell("INR"),
+                "To GBP": rate_cell("GBP"),
+                "To EUR": rate_cell("EUR"),
+                "Indices": indices_text,
+            }
         
-        # Display comparison table
-        import pandas as pd
-        df = pd.DataFrame(comparison_data)
-        st.dataframe(df, use_container_width=True)
+        # Fetch every country's rates and indices concurrently and refresh
+        # the table as each result arrives
+        table_placeholder = st.empty()
+        with st.spinner(f"Fetching data for {len(countries_to_compare)} countries..."), tracing.span("compare.table"):
+            for kind, country, result in gather_country_data(countries_to_compare):
+                if kind == "rates":
+                    all_rates = result
+                else:
+                    all_indices[country] = result
+                df = pd.DataFrame([build_comparison_row(c) for c in countries_to_compare])
+                table_placeholder.dataframe(df, use_container_width=True)
+        
+        # Index performance in one currency
+        st.markdown("---")
+        st.markdown("### 💵 Index Performance in a Common Currency")
+        
+        from datetime import date, timedelta
+        from analytics import convert_index_history, currency_adjusted_returns, rebased
+        
+        quote_options = list(dict.fromkeys([c["code"] for c in COUNTRY_CONFIG.values()] + ["USD", "EUR", "GBP"]))
+        perf_col1, perf_col2 = st.columns(2)
+        with perf_col1:
+            quote_currency = st.selectbox("Quote currency", quote_options, index=quote_options.index("USD"))
+        with perf_col2:
+            period = st.radio("Period", ["1M", "3M", "1Y", "5Y"], index=2, horizontal=True)
+        
+        symbols = [symbol for country in countries_to_compare for symbol in COUNTRY_CONFIG[country]["major_indices"]]
+        start = date.today() - timedelta(days={"1M": 31, "3M": 92, "1Y": 365, "5Y": 1826}[period])
+        
+        try:
+            with st.spinner(f"Converting indices to {quote_currency}..."), tracing.span("compare.converted", quote=quote_currency):
+                converted = convert_index_history(symbols, quote_currency, start)
+                returns = currency_adjusted_returns(symbols, quote_currency, start)
+            
+            if converted.empty:
+                st.info("No index history available for this period")
+            else:
+                names = get_index_names(symbols)
+                # Carry each index over its exchange's holidays so the lines stay continuous
+                st.line_chart(rebased(converted).ffill().rename(columns=names))
+                st.caption(f"Index levels in {quote_currency}, rebased to 100 at the start of the period")
+                
+                table = returns.rename(index=names)
+                percent_columns = ["local_return", "fx_return", "quote_return"]
+                table[percent_columns] = table[percent_columns] * 100
+                st.dataframe(
+                    table,
+                    use_container_width=True,
+                    column_config={
+                        "currency": "Local Currency",
+                        "local_return": st.column_config.NumberColumn("Local Return", format="%.1f%%"),
+                        "fx_return": st.column_config.NumberColumn(f"FX vs {quote_currency}", format="%.1f%%"),
+                        "quote_return": st.column_config.NumberColumn(f"Return in {quote_currency}", format="%.1f%%"),
+                    },
+                )
+        except Exception as e:
+            st.error(f"Could not compute currency-adjusted performance: {str(e)}")
         
         # Map comparison
         st.markdown("---")
         st.markdown("### 📍 Stock Exchange Locations")
         
+        try:
+            display_world_map(countries_to_compare)
+        except Exception as e:
+            st.error(f"Map loading error: {str(e)}")
+        
         for country in countries_to_compare:
             with st.expander(f"📌 {country}"):
                 lat, lng = get_exchange_location(country)
                 config = COUNTRY_CONFIG[country]
                 st.write(f"**Stock Exchange:** {config['stock_exchange']}")
                 st.write(f"**Coordinates:** ({lat}, {lng})")
-                
-                try:
-                    display_map(country, lat, lng)
-                except Exception as e:
-                    st.error(f"Map loading error: {str(e)}")
 
 # Footer
 st.markdown("---")
@@ -287,3 +493,43 @@ st.markdown(
     """,
     unsafe_allow_html=True
 )
+
+tracing.end_trace(rerun_trace)
+
+# Admin panel: waterfall of this session's last rerun
+session_traces = tracing.recent_traces("streamlit.rerun", session=session_id) if TRACING_SIDEBAR_PANEL else []
+if session_traces:
+    import altair as alt
+    import json
+    import pandas as pd
+    
+    last_trace = session_traces[-1]
+    rows = tracing.waterfall(last_trace)
+    with st.sidebar.expander("⏱️ Rerun Timing"):
+        st.caption(f"{last_trace.attributes.get('view')} rerun: {rows[0]['duration_ms']:.0f} ms, {len(rows)} spans")
+        chart_data = pd.DataFrame([
+            {
+                "span": f"{i:02d} {'· ' * row['depth']}{row['name']}",
+                "start": row["start_ms"],
+                "end": row["start_ms"] + row["duration_ms"],
+                "duration_ms": row["duration_ms"],
+                "failed": bool(row["error"]),
+            }
+            for i, row in enumerate(rows)
+        ])
+        st.altair_chart(
+            alt.Chart(chart_data).mark_bar().encode(
+                x=alt.X("start:Q", title="ms"),
+                x2="end:Q",
+                y=alt.Y("span:N", sort=None, title=None),
+                color=alt.Color("failed:N", legend=None),
+                tooltip=["span", "duration_ms"],
+            ),
+            use_container_width=True,
+        )
+        st.download_button(
+            "Download trace (OTLP JSON)",
+            json.dumps(tracing.to_otlp([last_trace])),
+            file_name=f"trace-{last_trace.trace_id}.json",
+            mime="application/json",
+        )
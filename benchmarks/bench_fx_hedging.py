@@ -0,0 +1,96 @@
+"""
+Rate fetch latency with a slow primary provider, with and without hedging.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_fx_hedging --requests 100 --slow-rate 0.03 --slow-delay 2
+
+ExchangeRate-API and CurrencyAPI are served by two stub servers. The
+ExchangeRate-API stub answers in --latency seconds but stalls for
+--slow-delay seconds on a --slow-rate fraction of requests; the CurrencyAPI
+stub is steady at --fallback-latency. Each fetch bypasses the rate cache:
+  - single: ExchangeRate-API only (the old code path)
+  - hedged: fx_providers.fetch_matrix, which asks CurrencyAPI once the
+    primary exceeds its p95
+and the report gives latency percentiles and upstream requests for each.
+"""
+import argparse
+import json
+import os
+import random
+import threading
+import time
+from typing import Any, Dict, List
+
+from benchmarks.stub_server import StubServer
+from benchmarks.upstreams import responder
+
+
+def _percentiles(samples: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+    return {"p50_ms": round(pick(0.50), 1), "p95_ms": round(pick(0.95), 1), "p99_ms": round(pick(0.99), 1), "max_ms": round(ordered[-1] * 1000, 1)}
+
+
+def _stalling(slow_rate: float, slow_delay: float, seed: int):
+    """Responder that stalls on a fraction of requests."""
+    rng = random.Random(seed)
+    lock = threading.Lock()
+
+    def respond(path: str):
+        with lock:
+            slow = rng.random() < slow_rate
+        if slow:
+            time.sleep(slow_delay)
+        return responder(path)
+    return respond
+
+
+def run(requests: int, primary: StubServer, fallback: StubServer) -> Dict[str, Any]:
+    import fx_providers
+
+    single_provider = fx_providers.ranked_providers()[0]
+    result = {}
+    for mode, fetch in (("single", lambda: single_provider.fetch("USD")), ("hedged", lambda: fx_providers.fetch_matrix("USD"))):
+        primary.reset_counts()
+        fallback.reset_counts()
+        latencies, failures = [], 0
+        for _ in range(requests):
+            started = time.perf_counter()
+            try:
+                fetch()
+            except Exception:
+                failures += 1
+            latencies.append(time.perf_counter() - started)
+        result[mode] = {
+            **_percentiles(latencies),
+            "failures": failures,
+            "primary_requests": primary.snapshot()["requests"],
+            "fallback_requests": fallback.snapshot()["requests"],
+        }
+    result["providers"] = fx_providers.get_provider_stats()
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.03, help="Primary provider's normal latency in seconds")
+    parser.add_argument("--slow-rate", type=float, default=0.03, help="Fraction of primary requests that stall")
+    parser.add_argument("--slow-delay", type=float, default=2.0, help="Seconds a stalled primary request takes")
+    parser.add_argument("--fallback-latency", type=float, default=0.06, help="Fallback provider's latency in seconds")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    primary = StubServer(_stalling(args.slow_rate, args.slow_delay, args.seed), latency=args.latency)
+    fallback = StubServer(responder, latency=args.fallback_latency)
+    with primary, fallback:
+        os.environ.update(
+            EXCHANGE_RATE_API_URL=primary.url,
+            CURRENCY_API_URL=fallback.url,
+            EXCHANGE_RATE_API_QUOTA="100000",
+            EXCHANGE_RATE_API_BURST="100000",
+            CURRENCY_API_QUOTA="100000",
+            CURRENCY_API_BURST="100000",
+        )
+        print(json.dumps(run(args.requests, primary, fallback), indent=2))
@@ -0,0 +1,46 @@
+"""
+Compare bare requests.get against the pooled shared client.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_http_client --requests 500
+
+Reports wall time and the number of TCP connections the stub server
+accepted; each avoided connection is an avoided TCP (and, against real
+HTTPS providers, TLS) handshake.
+"""
+import argparse
+import json
+import time
+import requests
+from benchmarks.stub_server import StubServer
+from http_client import HTTPClient
+
+
+def run(n: int) -> dict:
+    results = {}
+    with StubServer() as stub:
+        url = f"{stub.url}/v6/key/latest/USD"
+
+        stub.reset_counts()
+        start = time.perf_counter()
+        for _ in range(n):
+            requests.get(url, timeout=5).json()
+        results["bare_requests"] = {"seconds": round(time.perf_counter() - start, 4), **stub.snapshot()}
+
+        client = HTTPClient()
+        stub.reset_counts()
+        start = time.perf_counter()
+        for _ in range(n):
+            client.get(url).json()
+        results["pooled_client"] = {"seconds": round(time.perf_counter() - start, 4), **stub.snapshot()}
+
+    results["handshakes_saved"] = results["bare_requests"]["connections"] - results["pooled_client"]["connections"]
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+    print(json.dumps(run(args.requests), indent=2))
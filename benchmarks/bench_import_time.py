@@ -0,0 +1,109 @@
+"""
+Import-time report for the app's startup path and its lazily loaded modules.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_import_time --record
+
+Each target is imported in a fresh interpreter with `python -X importtime`.
+The "app_startup" target is every module app.py imports at top level (read
+from its AST, so it follows app.py as it changes); the other targets are the
+heavy modules app.py now defers to first use. With --record, the report is
+appended to benchmarks/results/import_time.jsonl together with the current
+git commit so startup cost can be tracked over time.
+"""
+import argparse
+import ast
+import json
+import os
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_PATH = os.path.join(ROOT, "benchmarks", "results", "import_time.jsonl")
+
+# Modules app.py loads only when a view needs them
+DEFERRED_TARGETS = ["agent", "folium", "yfinance"]
+
+
+def app_startup_modules() -> List[str]:
+    """Top-level modules imported by app.py at module scope."""
+    with open(os.path.join(ROOT, "app.py")) as f:
+        tree = ast.parse(f.read())
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            modules.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module:
+            modules.append(node.module)
+    return list(dict.fromkeys(modules))
+
+
+def measure(modules: List[str]) -> Dict[str, float]:
+    """
+    Import modules in a fresh interpreter and parse -X importtime output.
+
+    Returns:
+        Dictionary with wall-clock and summed cumulative import microseconds,
+        plus the five slowest top-level imports
+    """
+    code = "; ".join(f"import {module}" for module in modules)
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        env={**os.environ, "PREFETCH_ENABLED": "false"},
+    )
+    wall = time.perf_counter() - start
+    if proc.returncode != 0:
+        return {"error": proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "import failed"}
+
+    top_level = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split(":", 1)[1].split("|")
+        # Nested imports are indented by two extra spaces per level
+        if cumulative.strip().isdigit() and not name.startswith("   "):
+            top_level.append((name.strip(), int(cumulative)))
+
+    return {
+        "wall_ms": round(wall * 1000, 1),
+        "import_ms": round(sum(us for _, us in top_level) / 1000, 1),
+        "slowest": [{"module": name, "ms": round(us / 1000, 1)} for name, us in sorted(top_level, key=lambda x: -x[1])[:5]],
+    }
+
+
+def git_commit() -> str:
+    proc = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True)
+    return proc.stdout.strip()
+
+
+def run() -> Dict:
+    startup = app_startup_modules()
+    report = {
+        "commit": git_commit(),
+        "timestamp": int(time.time()),
+        "python": sys.version.split()[0],
+        "app_startup": {"modules": startup, **measure(startup)},
+    }
+    for module in DEFERRED_TARGETS:
+        report[module] = measure([module])
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--record", action="store_true", help="Append the report to benchmarks/results/import_time.jsonl")
+    args = parser.parse_args()
+
+    report = run()
+    print(json.dumps(report, indent=2))
+    if args.record:
+        os.makedirs(os.path.dirname(RESULTS_PATH), exist_ok=True)
+        with open(RESULTS_PATH, "a") as f:
+            f.write(json.dumps(report) + "\n")
@@ -0,0 +1,107 @@
+"""
+Reruns and bytes sent per minute per Dashboard client, with and without live mode.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_live_updates --interval 15
+
+The Dashboard is run once with streamlit.testing against stub upstreams and
+every ForwardMsg the script emits is recorded. Messages whose delta belongs
+to the indices fragment are what a live-mode refresh sends; everything is
+what a full rerun sends. For a client wanting index values every
+--interval seconds:
+  - full_reruns: the user reloads, rerunning the whole script (old behaviour)
+  - live_fragment: one initial full run, then fragment reruns only
+and the report gives reruns and bytes per minute for each.
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from typing import Any, Dict, List
+
+from benchmarks.stub_server import StubServer
+from benchmarks.upstreams import responder, install_yahoo_stub
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _record_messages(run) -> List[Any]:
+    """Run fn while capturing every ForwardMsg enqueued by the script runner."""
+    from streamlit.runtime.forward_msg_queue import ForwardMsgQueue
+
+    messages = []
+    original = ForwardMsgQueue.enqueue
+
+    def enqueue(self, msg):
+        messages.append(msg)
+        return original(self, msg)
+
+    ForwardMsgQueue.enqueue = enqueue
+    try:
+        run()
+    finally:
+        ForwardMsgQueue.enqueue = original
+    return messages
+
+
+def run(interval: float) -> Dict[str, Any]:
+    from streamlit.testing.v1 import AppTest
+    from prefetch import start_prefetcher, get_prefetched_indices
+    from config import COUNTRY_CONFIG
+
+    # Wait for the first snapshots so neither mode fetches inline
+    start_prefetcher()
+    deadline = time.time() + 30
+    while time.time() < deadline and get_prefetched_indices(next(iter(COUNTRY_CONFIG))) is None:
+        time.sleep(0.1)
+
+    app = AppTest.from_file(os.path.join(ROOT, "app.py"), default_timeout=60)
+    app.run()
+    app.sidebar.toggle[0].set_value(True)
+    messages = _record_messages(app.run)
+    if app.exception:
+        raise RuntimeError(app.exception[0].message)
+
+    full_bytes = sum(msg.ByteSize() for msg in messages)
+    fragment_ids = {msg.delta.fragment_id for msg in messages if msg.HasField("delta") and msg.delta.fragment_id}
+    fragment_bytes = sum(
+        msg.ByteSize() for msg in messages
+        if not msg.HasField("delta") or msg.delta.fragment_id in fragment_ids
+    ) - sum(msg.ByteSize() for msg in messages if msg.HasField("new_session"))
+    per_minute = 60 / interval
+
+    return {
+        "interval_seconds": interval,
+        "full_rerun_bytes": full_bytes,
+        "fragment_rerun_bytes": fragment_bytes,
+        "auto_rerun_registered": any(msg.HasField("auto_rerun") for msg in messages),
+        "full_reruns": {
+            "reruns_per_minute": per_minute,
+            "bytes_per_minute": round(full_bytes * per_minute),
+        },
+        "live_fragment": {
+            "full_reruns_per_minute": 0,
+            "fragment_reruns_per_minute": per_minute,
+            "bytes_per_minute": round(fragment_bytes * per_minute),
+        },
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--interval", type=float, default=15.0, help="Seconds between index refreshes")
+    args = parser.parse_args()
+
+    with StubServer(responder) as stub:
+        os.environ.update(
+            EXCHANGE_RATE_API_URL=stub.url,
+            CURRENCY_API_URL=stub.url,
+            PREFETCH_ENABLED="true",
+            LIVE_INDICES_INTERVAL=str(args.interval),
+        )
+        os.environ.setdefault("CACHE_DIR", tempfile.mkdtemp(prefix="bench-"))
+        os.environ.setdefault("GOOGLE_API_KEY", "offline-benchmark")
+        install_yahoo_stub(stub.url)
+        print(json.dumps(run(args.interval), indent=2))
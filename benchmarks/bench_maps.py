@@ -0,0 +1,59 @@
+"""
+Measure map rendering for the Compare Countries view.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_maps --repeat 5
+
+Compares, for every COUNTRY_CONFIG country selected at once:
+  - per_country_maps: one folium map per country, rendered each rerun (old behaviour)
+  - world_map_uncached: one combined multi-marker map, rendered each rerun
+  - world_map_cached: the combined map served from the HTML cache
+and reports median milliseconds per rerun and HTML bytes sent to the browser.
+"""
+import argparse
+import json
+import statistics
+import time
+from config import COUNTRY_CONFIG
+from maps_utils import create_map, get_exchange_location, render_world_map_html
+
+
+def _time(fn, repeat: int):
+    samples, size = [], 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        size = fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return {"median_ms": round(statistics.median(samples), 2), "html_bytes": size}
+
+
+def run(repeat: int) -> dict:
+    countries = tuple(sorted(COUNTRY_CONFIG))
+
+    def per_country():
+        total = 0
+        for country in countries:
+            lat, lng = get_exchange_location(country)
+            total += len(create_map(country, COUNTRY_CONFIG[country]["stock_exchange"], lat, lng).get_root().render())
+        return total
+
+    def world_uncached():
+        render_world_map_html.cache_clear()
+        return len(render_world_map_html(countries))
+
+    render_world_map_html(countries)
+
+    return {
+        "countries": len(countries),
+        "per_country_maps": _time(per_country, repeat),
+        "world_map_uncached": _time(world_uncached, repeat),
+        "world_map_cached": _time(lambda: len(render_world_map_html(countries)), repeat),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    print(json.dumps(run(args.repeat), indent=2))
@@ -0,0 +1,90 @@
+"""
+Portfolio conversion throughput in rows per second on one core.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_portfolio --rows 5000000
+
+Rates come from the recorded ExchangeRate-API fixture served by the stub
+(one upstream request in total). Positions are random amounts in
+--currencies currencies. Measured:
+  - array_str: convert_amounts on a NumPy array of currency strings
+  - array_categorical: convert_amounts on a pandas Categorical
+  - value_frame: value_portfolio on an in-memory DataFrame
+  - csv_stream / parquet_stream: value_portfolio streaming a file in chunks
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from typing import Any, Callable, Dict
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.stub_server import StubServer
+from benchmarks.upstreams import responder
+
+
+def _rate(rows: int, func: Callable[[], Any], repeat: int = 3) -> Dict[str, float]:
+    best = min(_timed(func) for _ in range(repeat))
+    return {"seconds": round(best, 4), "rows_per_second": round(rows / best)}
+
+
+def _timed(func: Callable[[], Any]) -> float:
+    started = time.perf_counter()
+    func()
+    return time.perf_counter() - started
+
+
+def run(rows: int, currencies: int, chunk_rows: int, seed: int) -> Dict[str, Any]:
+    import portfolio
+    from currency_utils import get_cross_rate_matrix
+
+    matrix = get_cross_rate_matrix()
+    rng = np.random.default_rng(seed)
+    codes = np.array(matrix.codes[:currencies], dtype=object)
+    currency = codes[rng.integers(0, len(codes), rows)]
+    amounts = rng.uniform(1, 1_000_000, rows).round(2)
+    frame = pd.DataFrame({"amount": amounts, "currency": currency})
+    categorical = pd.Categorical(currency)
+
+    result = {
+        "rows": rows,
+        "currencies": len(codes),
+        "array_str": _rate(rows, lambda: portfolio.convert_amounts(amounts, currency, "EUR", matrix)),
+        "array_categorical": _rate(rows, lambda: portfolio.convert_amounts(amounts, categorical, "EUR", matrix)),
+        "value_frame": _rate(rows, lambda: portfolio.value_portfolio(frame, "EUR")),
+    }
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "positions.csv")
+        frame.to_csv(csv_path, index=False)
+        result["csv_stream"] = _rate(rows, lambda: portfolio.value_portfolio(csv_path, "EUR", chunk_rows=chunk_rows), repeat=1)
+        try:
+            parquet_path = os.path.join(tmp, "positions.parquet")
+            frame.to_parquet(parquet_path, index=False)
+            result["parquet_stream"] = _rate(rows, lambda: portfolio.value_portfolio(parquet_path, "EUR", chunk_rows=chunk_rows), repeat=1)
+        except ImportError:
+            result["parquet_stream"] = "skipped (pyarrow not installed)"
+
+    # Reference: one dictionary lookup per row
+    rates = {code: matrix.rate(code, "EUR") for code in codes}
+    sample = min(rows, 1_000_000)
+    result["per_row_loop"] = _rate(sample, lambda: [a * rates[c] for a, c in zip(amounts[:sample], currency[:sample])], repeat=1)
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=5_000_000)
+    parser.add_argument("--currencies", type=int, default=40)
+    parser.add_argument("--chunk-rows", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    with StubServer(responder) as stub:
+        os.environ.update(EXCHANGE_RATE_API_URL=stub.url, CURRENCY_API_URL=stub.url)
+        os.environ.setdefault("CACHE_DIR", tempfile.mkdtemp(prefix="bench-"))
+        print(json.dumps(run(args.rows, args.currencies, args.chunk_rows, args.seed), indent=2))
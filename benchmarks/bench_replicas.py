@@ -0,0 +1,135 @@
+"""
+Upstream request counts as API replicas are added, per cache backend.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_replicas --replicas 1,2,4,8 --seconds 10
+
+For each backend (memory = per-process caches, sqlite = one shared WAL
+database) and replica count, starts that many api_server processes with
+prefetching on and short refresh intervals, all pointed at one stub
+ExchangeRate-API/Yahoo server. Clients poll the replicas round-robin, like
+a load balancer would, for --seconds. Reports how many requests reached
+the stub upstreams: with per-process caches they grow with the replica
+count, with the shared backend they should stay flat.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+from typing import Any, Dict, List
+
+from benchmarks.stub_server import StubServer
+from benchmarks.upstreams import responder
+
+PATHS = [
+    "/api/rates/JPY",
+    "/api/cross-rates?bases=JPY,INR,KRW&quotes=USD,EUR",
+    "/api/indices?symbols=^N225,^GSPC",
+    "/api/countries/Japan",
+    "/api/countries/United%20Kingdom",
+]
+
+# Countries with recorded Yahoo fixtures
+COUNTRIES = "Japan,India,United States,South Korea,China,United Kingdom"
+
+
+def _replica(env: Dict[str, str], stub_url: str, ports: "multiprocessing.Queue"):
+    os.environ.update(env)
+    from aiohttp import web
+    import api_server
+    from benchmarks.upstreams import install_yahoo_stub
+
+    install_yahoo_stub(stub_url)
+
+    async def serve():
+        runner = web.AppRunner(api_server.create_app(prefetch=True))
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        ports.put(site._server.sockets[0].getsockname()[1])
+        await asyncio.Event().wait()
+
+    asyncio.run(serve())
+
+
+async def _poll(bases: List[str], clients: int, seconds: float) -> int:
+    import aiohttp
+
+    deadline = time.monotonic() + seconds
+    done = 0
+
+    async def client(offset: int):
+        nonlocal done
+        i = offset
+        async with aiohttp.ClientSession() as session:
+            while time.monotonic() < deadline:
+                path = PATHS[i % len(PATHS)]
+                async with session.get(bases[i % len(bases)] + path) as response:
+                    await response.read()
+                done += 1
+                i += 1
+
+    await asyncio.gather(*(client(i) for i in range(clients)))
+    return done
+
+
+def run(backend: str, replicas: int, clients: int, seconds: float, interval: float, stub: StubServer) -> Dict[str, Any]:
+    shared_dir = tempfile.mkdtemp(prefix="bench-replicas-")
+    base_env = {
+        "EXCHANGE_RATE_API_URL": stub.url,
+        "CURRENCY_API_URL": stub.url,
+        "DASHBOARD_COUNTRIES": COUNTRIES,
+        "CACHE_BACKEND": backend,
+        "CACHE_BACKEND_PATH": os.path.join(shared_dir, "shared_cache.sqlite"),
+        "PREFETCH_ENABLED": "true",
+        "PREFETCH_RATES_INTERVAL": str(interval),
+        "PREFETCH_INDICES_INTERVAL": str(interval),
+        "PREFETCH_CLOSED_MARKET_INTERVAL": str(interval),
+        "RATE_CACHE_TTL_SECONDS": str(int(interval)),
+        "RATE_CACHE_MIN_TTL": str(int(interval)),
+        "API_INDICES_CACHE_TTL": str(interval),
+    }
+    context = multiprocessing.get_context("spawn")
+    ports = context.Queue()
+    processes = []
+    stub.reset_counts()
+    try:
+        for i in range(replicas):
+            # Each replica keeps its own history and last-quote files
+            env = {**base_env, "CACHE_DIR": os.path.join(shared_dir, f"replica-{i}")}
+            process = context.Process(target=_replica, args=(env, stub.url, ports), daemon=True)
+            process.start()
+            processes.append(process)
+        bases = [f"http://127.0.0.1:{ports.get(timeout=60)}" for _ in range(replicas)]
+        requests = asyncio.run(_poll(bases, clients, seconds))
+    finally:
+        for process in processes:
+            process.terminate()
+            process.join()
+    return {
+        "backend": backend,
+        "replicas": replicas,
+        "client_requests": requests,
+        "upstream_requests": stub.snapshot()["requests"],
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--replicas", default="1,2,4,8", help="comma-separated replica counts")
+    parser.add_argument("--backends", default="memory,sqlite")
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--interval", type=float, default=2.0, help="prefetch and cache refresh interval in seconds")
+    args = parser.parse_args()
+
+    results = []
+    with StubServer(responder) as stub:
+        for backend in args.backends.split(","):
+            for replicas in (int(n) for n in args.replicas.split(",")):
+                results.append(run(backend, replicas, args.clients, args.seconds, args.interval, stub))
+                print(json.dumps(results[-1]), flush=True)
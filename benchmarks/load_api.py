@@ -0,0 +1,100 @@
+"""
+Local load test for the headless data API against stub upstreams.
+
+Run from the repository root:
+
+    python -m benchmarks.load_api --clients 50 --polls 20
+
+Starts a stub ExchangeRate-API/Yahoo server and the API in-process, then
+has each client poll every endpoint, replaying the last ETag in
+If-None-Match like a well-behaved poller. Reports throughput, latency
+percentiles, 200 vs 304 counts, and how many requests reached the stub
+upstreams.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+
+from benchmarks.stub_server import StubServer
+from benchmarks.upstreams import responder, install_yahoo_stub
+
+stub = StubServer(responder).start()
+os.environ["EXCHANGE_RATE_API_URL"] = stub.url
+os.environ.setdefault("CACHE_DIR", tempfile.mkdtemp(prefix="load-api-"))
+
+import aiohttp  # noqa: E402
+from aiohttp import web  # noqa: E402
+import api_server  # noqa: E402
+
+install_yahoo_stub(stub.url)
+
+PATHS = [
+    "/api/rates/JPY",
+    "/api/cross-rates?bases=JPY,INR,KRW&quotes=USD,EUR",
+    "/api/indices?symbols=^N225,^GSPC",
+    "/api/countries/Japan",
+]
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def client(session: aiohttp.ClientSession, base: str, polls: int, latencies: list, statuses: dict):
+    etags = {}
+    for _ in range(polls):
+        for path in PATHS:
+            headers = {"If-None-Match": etags[path]} if path in etags else {}
+            start = time.perf_counter()
+            async with session.get(base + path, headers=headers) as response:
+                await response.read()
+                latencies.append((time.perf_counter() - start) * 1000)
+                statuses[response.status] = statuses.get(response.status, 0) + 1
+                if "ETag" in response.headers:
+                    etags[path] = response.headers["ETag"]
+
+
+async def run(clients: int, polls: int) -> dict:
+    runner = web.AppRunner(api_server.create_app(prefetch=False))
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    base = f"http://127.0.0.1:{port}"
+
+    latencies, statuses = [], {}
+    stub.reset_counts()
+    start = time.perf_counter()
+    async with aiohttp.ClientSession() as session:
+        await asyncio.gather(*(client(session, base, polls, latencies, statuses) for _ in range(clients)))
+    elapsed = time.perf_counter() - start
+    await runner.cleanup()
+
+    return {
+        "clients": clients,
+        "requests": len(latencies),
+        "requests_per_second": round(len(latencies) / elapsed, 1),
+        "latency_ms": {
+            "p50": round(statistics.median(latencies), 2),
+            "p95": round(percentile(latencies, 95), 2),
+            "p99": round(percentile(latencies, 99), 2),
+        },
+        "statuses": {str(code): count for code, count in sorted(statuses.items())},
+        "upstream_requests": stub.snapshot()["requests"],
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument("--polls", type=int, default=10)
+    args = parser.parse_args()
+    try:
+        print(json.dumps(asyncio.run(run(args.clients, args.polls)), indent=2))
+    finally:
+        stub.stop()
@@ -0,0 +1,70 @@
+"""
+Record fresh upstream fixtures from the live providers.
+
+Run from the repository root with API keys in .env:
+
+    python -m benchmarks.record_fixtures
+
+Overwrites the ExchangeRate-API, CurrencyAPI and Yahoo fixtures in
+benchmarks/fixtures. The Gemini ReAct transcript is recorded only with
+--gemini, since it spends LLM quota.
+"""
+import argparse
+import json
+import os
+from typing import Any, Dict, List
+
+from benchmarks.upstreams import FIXTURES_DIR, load_fixture
+
+
+def _write(name: str, payload: Dict[str, Any]):
+    with open(os.path.join(FIXTURES_DIR, name), "w") as f:
+        json.dump(payload, f, indent=1)
+    print(f"wrote {name}")
+
+
+def record_providers():
+    import http_client
+    from config import COUNTRY_CONFIG, EXCHANGE_RATE_API_URL, EXCHANGE_RATE_API_KEY, CURRENCY_API_URL, CURRENCY_API_KEY
+    from stock_utils import download_closes
+
+    response = http_client.get(f"{EXCHANGE_RATE_API_URL}/{EXCHANGE_RATE_API_KEY}/latest/USD")
+    response.raise_for_status()
+    _write("exchangerate_latest_USD.json", response.json())
+
+    response = http_client.get(f"{CURRENCY_API_URL}/latest", params={"apikey": CURRENCY_API_KEY, "base_currency": "USD"})
+    response.raise_for_status()
+    _write("currencyapi_latest_USD.json", response.json())
+
+    symbols = [s for config in COUNTRY_CONFIG.values() for s in config["major_indices"]]
+    closes = download_closes(symbols)
+    _write("yahoo_closes_5d.json", {
+        "index": [day.strftime("%Y-%m-%d") for day in closes.index],
+        "closes": {s: [None if v != v else round(float(v), 2) for v in closes[s]] for s in symbols},
+    })
+
+
+def record_gemini():
+    from langchain.callbacks.base import BaseCallbackHandler
+    from agent import create_llm_agent
+
+    responses: List[str] = []
+
+    class Recorder(BaseCallbackHandler):
+        def on_llm_end(self, response, **kwargs):
+            responses.extend(gen.text for gens in response.generations for gen in gens)
+
+    agent = create_llm_agent()
+    queries = load_fixture("gemini_react.json")["queries"]
+    for query in queries:
+        agent.invoke({"input": query}, config={"callbacks": [Recorder()]})
+    _write("gemini_react.json", {"queries": queries, "responses": responses})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--gemini", action="store_true", help="Also record the agent's Gemini transcript")
+    args = parser.parse_args()
+    record_providers()
+    if args.gemini:
+        record_gemini()
@@ -0,0 +1,228 @@
+"""
+Offline benchmark suite replaying recorded upstream fixtures.
+
+Run from the repository root:
+
+    python -m benchmarks.run_benchmarks --iterations 50 --latency 0.05 --jitter 0.02 \
+        --output bench.json [--compare previous.json]
+
+A local stub server replays the ExchangeRate-API, CurrencyAPI and Yahoo
+fixtures with configurable latency, jitter and error rate; the agent runs
+against a replay LLM that returns the recorded Gemini ReAct transcript.
+For each code path the report gives p50/p95/p99/mean latency, upstream
+requests per iteration and peak traced memory, as JSON. --compare flags
+paths whose p50 or upstream calls regressed against an earlier report.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional
+
+from benchmarks.stub_server import StubServer
+from benchmarks.upstreams import responder, install_yahoo_stub, load_fixture
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _configure_environment(stub_url: str):
+    """Point the app's configuration at the stub before project modules are imported."""
+    os.environ["EXCHANGE_RATE_API_URL"] = stub_url
+    os.environ["CURRENCY_API_URL"] = stub_url
+    os.environ["PREFETCH_ENABLED"] = "false"
+    os.environ.setdefault("CACHE_DIR", tempfile.mkdtemp(prefix="bench-"))
+    os.environ.setdefault("GOOGLE_API_KEY", "offline-benchmark")
+    os.environ.setdefault("EXCHANGE_RATE_API_KEY", "offline-benchmark")
+
+
+def _percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round((len(ordered) - 1) * pct / 100)))]
+
+
+def measure(fn: Callable[[int], Any], iterations: int, stub: StubServer) -> Dict[str, Any]:
+    """
+    Time fn over iterations, then trace one extra call for peak memory.
+
+    Args:
+        fn: Callable taking the iteration number
+        iterations: Number of timed calls
+        stub: Stub server whose request count is attributed to fn
+
+    Returns:
+        Latency percentiles (ms), upstream requests per iteration, error count
+        and peak traced memory (KB)
+    """
+    samples, failures = [], 0
+    before = stub.snapshot()
+    for i in range(iterations):
+        start = time.perf_counter()
+        try:
+            fn(i)
+        except Exception:
+            failures += 1
+        samples.append((time.perf_counter() - start) * 1000)
+    after = stub.snapshot()
+
+    tracemalloc.start()
+    try:
+        fn(iterations)
+    except Exception:
+        pass
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "p50_ms": round(_percentile(samples, 50), 3),
+        "p95_ms": round(_percentile(samples, 95), 3),
+        "p99_ms": round(_percentile(samples, 99), 3),
+        "mean_ms": round(statistics.fmean(samples), 3),
+        "upstream_calls_per_iter": round((after["requests"] - before["requests"]) / iterations, 3),
+        "upstream_errors": after["errors"] - before["errors"],
+        "exceptions": failures,
+        "peak_memory_kb": round(peak / 1024, 1),
+    }
+
+
+def _replay_agent(llm_latency: float):
+    """Build the real agent tools around an LLM replaying the recorded transcript."""
+    from langchain.agents import AgentType, initialize_agent
+    from langchain_community.llms.fake import FakeListLLM
+    import agent
+
+    class ReplayLLM(FakeListLLM):
+        latency: float = 0.0
+
+        def _call(self, *args: Any, **kwargs: Any) -> str:
+            time.sleep(self.latency)
+            return super()._call(*args, **kwargs)
+
+    llm = ReplayLLM(responses=load_fixture("gemini_react.json")["responses"], latency=llm_latency)
+    return initialize_agent(
+        tools=agent.create_tools(),
+        llm=llm,
+        agent=AgentType.ZERO_SHOT_REACT_DESCRIPTION,
+        handle_parsing_errors=True,
+        max_iterations=10,
+    )
+
+
+def run(args: argparse.Namespace, stub: StubServer) -> Dict[str, Any]:
+    import currency_utils
+    import stock_utils
+    import agent
+    from config import COUNTRY_CONFIG
+
+    install_yahoo_stub(stub.url)
+    all_symbols = [s for config in COUNTRY_CONFIG.values() for s in config["major_indices"]]
+    queries = load_fixture("gemini_react.json")["queries"]
+    executor = _replay_agent(args.llm_latency)
+
+    def rates_cold(i):
+        currency_utils._rate_cache.invalidate()
+        return currency_utils.get_exchange_rates("JPY")
+
+    def agent_query(i):
+        agent.reset_caches()
+        return agent.query_agent(executor, queries[i % len(queries)])
+
+    def app_render(i):
+        from streamlit.testing.v1 import AppTest
+        app = AppTest.from_file(os.path.join(ROOT, "app.py"), default_timeout=60)
+        app.run()
+        if app.exception:
+            raise RuntimeError(app.exception[0].message)
+
+    paths = {
+        "get_exchange_rates_cold": rates_cold,
+        "get_exchange_rates_warm": lambda i: currency_utils.get_exchange_rates("JPY"),
+        "get_stock_indices": lambda i: stock_utils.get_stock_indices(all_symbols),
+        "query_agent": agent_query,
+        "app_render_dashboard": app_render,
+    }
+    selected = args.paths or list(paths)
+
+    results = {}
+    for name in selected:
+        iterations = max(1, args.iterations // 10) if name == "app_render_dashboard" else args.iterations
+        results[name] = measure(paths[name], iterations, stub)
+    return results
+
+
+def git_commit() -> str:
+    proc = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True)
+    return proc.stdout.strip()
+
+
+def compare(report: Dict[str, Any], baseline_path: str, threshold: float) -> List[str]:
+    """List paths whose p50 grew by more than threshold or that make more upstream calls."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)["paths"]
+    regressions = []
+    for name, current in report["paths"].items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        if previous["p50_ms"] and current["p50_ms"] > previous["p50_ms"] * (1 + threshold):
+            regressions.append(f"{name}: p50 {previous['p50_ms']}ms -> {current['p50_ms']}ms")
+        if current["upstream_calls_per_iter"] > previous["upstream_calls_per_iter"]:
+            regressions.append(
+                f"{name}: upstream calls/iter {previous['upstream_calls_per_iter']} -> {current['upstream_calls_per_iter']}"
+            )
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=30)
+    parser.add_argument("--latency", type=float, default=0.0, help="Stub upstream latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Extra random stub latency in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of stub requests failing with 503")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Seconds per replayed LLM call")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--paths", nargs="*", help="Subset of code paths to run")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    parser.add_argument("--compare", help="Earlier JSON report to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.1, help="Allowed p50 growth for --compare")
+    args = parser.parse_args(argv)
+
+    stub = StubServer(responder, latency=args.latency, jitter=args.jitter, error_rate=args.error_rate, seed=args.seed)
+    stub.start()
+    _configure_environment(stub.url)
+    try:
+        report = {
+            "commit": git_commit(),
+            "timestamp": int(time.time()),
+            "python": sys.version.split()[0],
+            "config": {
+                "iterations": args.iterations,
+                "latency": args.latency,
+                "jitter": args.jitter,
+                "error_rate": args.error_rate,
+                "llm_latency": args.llm_latency,
+            },
+            "paths": run(args, stub),
+        }
+    finally:
+        stub.stop()
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    if args.compare:
+        regressions = compare(report, args.compare, args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
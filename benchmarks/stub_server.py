@@ -0,0 +1,117 @@
+"""
+Local stub HTTP server for benchmarks.
+
+Serves canned JSON over HTTP/1.1 keep-alive and counts both requests and
+TCP connections, so benchmarks can measure upstream calls and handshakes
+without touching real providers. Latency, jitter and an error rate can be
+injected to model slow or flaky upstreams.
+"""
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Optional
+
+
+class StubServer:
+    """
+    Threaded stub server running in the background.
+
+    Args:
+        responder: Callable mapping a request path to (status, JSON-serializable body)
+        latency: Seconds added before every response
+        jitter: Extra uniformly random delay in [0, jitter] seconds
+        error_rate: Fraction of requests answered with HTTP 503
+        seed: Seed for the jitter/error random generator
+    """
+
+    def __init__(
+        self,
+        responder: Optional[Callable[[str], Any]] = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        seed: Optional[int] = None,
+    ):
+        self.responder = responder or (lambda path: (200, {"result": "success", "path": path}))
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self.counts = {"connections": 0, "requests": 0, "errors": 0}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _count(self, key: str):
+        with self._lock:
+            self.counts[key] += 1
+
+    def reset_counts(self):
+        with self._lock:
+            self.counts = {key: 0 for key in self.counts}
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Send headers and body in one segment; avoids delayed-ACK stalls on keep-alive
+            wbufsize = -1
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                super().setup()
+                stub._count("connections")
+
+            def do_GET(self):
+                stub._count("requests")
+                with stub._lock:
+                    delay = stub.latency + stub._random.uniform(0, stub.jitter)
+                    fail = stub._random.random() < stub.error_rate
+                if delay:
+                    time.sleep(delay)
+                if fail:
+                    stub._count("errors")
+                    status, body = 503, {"result": "error", "error-type": "injected"}
+                else:
+                    status, body = stub.responder(self.path)
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> "StubServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "StubServer":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.counts)
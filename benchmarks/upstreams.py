@@ -0,0 +1,79 @@
+"""
+Stub upstream providers replaying recorded fixtures.
+
+ExchangeRate-API and CurrencyAPI are stubbed at the HTTP level
+(config.EXCHANGE_RATE_API_URL / CURRENCY_API_URL are pointed at the stub).
+yfinance cannot be redirected, so install_yahoo_stub swaps
+stock_utils.download_closes for a function that fetches the recorded closes
+from the stub over HTTP instead, keeping one upstream request per download.
+
+Fixtures live in benchmarks/fixtures and can be refreshed from the live
+providers with `python -m benchmarks.record_fixtures`.
+"""
+import json
+import os
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+import pandas as pd
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+@lru_cache(maxsize=None)
+def load_fixture(name: str) -> Dict[str, Any]:
+    with open(os.path.join(FIXTURES_DIR, name)) as f:
+        return json.load(f)
+
+
+def exchange_rate_payload(base: str) -> Dict[str, Any]:
+    """The recorded ExchangeRate-API USD response, rebased to base."""
+    recorded = load_fixture("exchangerate_latest_USD.json")
+    rates = recorded["conversion_rates"]
+    pivot = rates.get(base)
+    if pivot is None:
+        return {"result": "error", "error-type": "unsupported-code"}
+    return {**recorded, "base_code": base, "conversion_rates": {code: rate / pivot for code, rate in rates.items()}}
+
+
+def yahoo_closes_payload(symbols: List[str]) -> Dict[str, Any]:
+    """Recorded daily closes for symbols (unknown symbols have no data)."""
+    recorded = load_fixture("yahoo_closes_5d.json")
+    return {
+        "index": recorded["index"],
+        "closes": {s: recorded["closes"].get(s, [None] * len(recorded["index"])) for s in symbols},
+    }
+
+
+def responder(path: str) -> Tuple[int, Dict[str, Any]]:
+    """
+    Route stub requests:
+        /<key>/latest/<BASE>       ExchangeRate-API
+        /latest?...                CurrencyAPI
+        /yahoo/closes?symbols=...  Yahoo closes
+    """
+    parts = urlsplit(path)
+    query = parse_qs(parts.query)
+    if parts.path.startswith("/yahoo/closes"):
+        return 200, yahoo_closes_payload(query.get("symbols", [""])[0].split(","))
+    if "/latest/" in parts.path:
+        payload = exchange_rate_payload(parts.path.rsplit("/", 1)[-1].upper())
+        return (200 if payload["result"] == "success" else 404), payload
+    if parts.path.rstrip("/").endswith("/latest") or parts.path == "/latest":
+        return 200, load_fixture("currencyapi_latest_USD.json")
+    return 404, {"result": "error", "error-type": "unknown-path"}
+
+
+def install_yahoo_stub(base_url: str):
+    """Route stock_utils downloads to the stub server at base_url."""
+    import http_client
+    import stock_utils
+
+    def download_closes(symbols: List[str], period: str = "5d", start: Optional[Any] = None, end: Optional[Any] = None) -> pd.DataFrame:
+        response = http_client.get(f"{base_url}/yahoo/closes", params={"symbols": ",".join(symbols)}, timeout=5)
+        response.raise_for_status()
+        data = response.json()
+        frame = pd.DataFrame(data["closes"], index=pd.to_datetime(data["index"]), dtype=float)
+        return frame.reindex(columns=symbols)
+
+    stock_utils.download_closes = download_closes
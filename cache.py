@@ -0,0 +1,244 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+from config import CACHE_LEASE_SECONDS, CACHE_LEASE_POLL
+from cache_backend import CacheBackend, get_backend
+
+
+class _Entry:
+    """A cached value together with its freshness window."""
+
+    __slots__ = ("value", "stored_at", "expires_at")
+
+    def __init__(self, value: Any, stored_at: float, expires_at: float):
+        self.value = value
+        self.stored_at = stored_at
+        self.expires_at = expires_at
+
+
+class _Flight:
+    """An in-progress load that concurrent callers wait on."""
+
+    __slots__ = ("done", "value", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class TTLCache:
+    """
+    Thread-safe, process-wide cache with per-entry TTL, LRU eviction and
+    single-flight loading.
+
+    Concurrent callers asking for the same missing or expired key share one
+    loader call; everyone else waits for its result. Expired entries are kept
+    (until evicted) so callers can still inspect the last value.
+
+    With shared=True and a CACHE_BACKEND configured, misses also go through
+    the backend shared by all worker processes: a value another process
+    loaded is adopted as is, and otherwise the process that wins the key's
+    lease loads it while the others wait for its result, so single-flight
+    holds across the whole fleet.
+    """
+
+    def __init__(self, max_entries: int = 128, default_ttl: float = 300.0, name: str = "cache", shared: bool = False):
+        self.name = name
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.shared = shared
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._inflight: Dict[Hashable, _Flight] = {}
+        self._lock = threading.Lock()
+        self._stats = {
+            "hits": 0, "misses": 0, "stale": 0, "coalesced": 0, "loads": 0, "load_errors": 0, "evictions": 0,
+            "shared_hits": 0, "shared_waits": 0,
+        }
+
+    def get_or_load(
+        self,
+        key: Hashable,
+        loader: Callable[[], Any],
+        ttl_for: Optional[Callable[[Any], float]] = None,
+    ) -> Any:
+        """
+        Return the fresh cached value for key, loading it at most once if needed.
+
+        Args:
+            key: Cache key
+            loader: Zero-argument callable producing the value; exceptions are
+                re-raised to every waiting caller and nothing is cached
+            ttl_for: Optional callable deriving the TTL (seconds) from the value
+
+        Returns:
+            The cached or freshly loaded value
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            now = time.time()
+            if entry is not None and entry.expires_at > now:
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                return entry.value
+
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                self._stats["stale" if entry is not None else "misses"] += 1
+                flight = _Flight()
+                self._inflight[key] = flight
+            else:
+                self._stats["coalesced"] += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            value = self._load(key, loader, ttl_for)
+            flight.value = value
+            return value
+        except BaseException as e:
+            flight.error = e
+            with self._lock:
+                self._stats["load_errors"] += 1
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight.done.set()
+
+    def _backend(self) -> Optional[CacheBackend]:
+        return get_backend() if self.shared else None
+
+    def _shared_key(self, key: Hashable) -> str:
+        return f"{self.name}:{key!r}"
+
+    def _load(self, key: Hashable, loader: Callable[[], Any], ttl_for: Optional[Callable[[Any], float]]) -> Any:
+        """Run the loader (or adopt another process's result) and store the value."""
+        backend = self._backend()
+        leased = False
+        if backend is not None:
+            shared_key = self._shared_key(key)
+            give_up = time.time() + CACHE_LEASE_SECONDS
+            while True:
+                shared = backend.get(shared_key)
+                if shared is not None and shared[2] > time.time():
+                    value, stored_at, expires_at = shared
+                    self._put(key, _Entry(value, stored_at, expires_at))
+                    with self._lock:
+                        self._stats["shared_hits"] += 1
+                    return value
+                leased = backend.acquire(shared_key)
+                # Past the lease period the holder is presumed dead: load without the lease
+                if leased or time.time() >= give_up:
+                    break
+                with self._lock:
+                    self._stats["shared_waits"] += 1
+                time.sleep(CACHE_LEASE_POLL)
+
+        try:
+            value = loader()
+            ttl = ttl_for(value) if ttl_for else self.default_ttl
+            self.set(key, value, ttl)
+            with self._lock:
+                self._stats["loads"] += 1
+            if backend is not None and ttl > 0:
+                now = time.time()
+                backend.set(shared_key, value, now, now + ttl)
+            return value
+        finally:
+            if leased:
+                backend.release(shared_key)
+
+    def get_or_stale(
+        self,
+        key: Hashable,
+        loader: Callable[[], Any],
+        ttl_for: Optional[Callable[[Any], float]] = None,
+    ) -> Tuple[Any, Optional[float]]:
+        """
+        Like get_or_load, but fall back to the last stored value if loading fails.
+
+        Returns:
+            Tuple of (value, age) where age is None for a fresh value and the
+            seconds since the stale value was stored otherwise (re-raises the
+            loader's exception when nothing was ever stored)
+        """
+        try:
+            return self.get_or_load(key, loader, ttl_for), None
+        except Exception:
+            entry = self.peek(key) or self._shared_peek(key)
+            if entry is None:
+                raise
+            return entry.value, time.time() - entry.stored_at
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the fresh value for key, or None without loading."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.expires_at <= time.time():
+                return None
+            self._entries.move_to_end(key)
+            return entry.value
+
+    def peek(self, key: Hashable) -> Optional[_Entry]:
+        """Return the raw entry for key (fresh or expired) without touching stats or LRU order."""
+        with self._lock:
+            return self._entries.get(key)
+
+    def _shared_peek(self, key: Hashable) -> Optional[_Entry]:
+        """Return the entry another process stored for key (fresh or expired), if any."""
+        backend = self._backend()
+        shared = backend.get(self._shared_key(key)) if backend is not None else None
+        return _Entry(*shared) if shared is not None else None
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """Store value under key for ttl seconds (default_ttl if omitted) in this process."""
+        now = time.time()
+        ttl = self.default_ttl if ttl is None else ttl
+        self._put(key, _Entry(value, now, now + ttl))
+
+    def _put(self, key: Hashable, entry: _Entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def invalidate(self, key: Optional[Hashable] = None):
+        """Drop one key, or every entry when key is None (in the shared backend too)."""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+        backend = self._backend()
+        if backend is not None:
+            if key is None:
+                backend.delete(f"{self.name}:", prefix=True)
+            else:
+                backend.delete(self._shared_key(key))
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get cache counters.
+
+        Returns:
+            Dictionary with hit/miss/stale/coalesced/load/eviction counts and current size.
+            Coalesced lookups waited on another caller's load instead of loading;
+            shared hits took a value another process loaded.
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._entries)
+        lookups = stats["hits"] + stats["misses"] + stats["stale"] + stats["coalesced"]
+        saved = stats["hits"] + stats["coalesced"] + stats["shared_hits"]
+        stats["hit_ratio"] = round(saved / lookups, 4) if lookups else 0.0
+        stats["name"] = self.name
+        return stats
@@ -0,0 +1,356 @@
+import logging
+import os
+from abc import ABC, abstractmethod
+import pickle
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Optional, Tuple
+from config import (
+    CACHE_BACKEND,
+    CACHE_BACKEND_PATH,
+    REDIS_URL,
+    CACHE_LEASE_SECONDS,
+    CACHE_BACKEND_RETENTION,
+)
+
+logger = logging.getLogger(__name__)
+
+# (value, stored_at, expires_at)
+SharedEntry = Tuple[Any, float, float]
+
+
+class CacheBackend(ABC):
+    """
+    Cache storage shared by every worker process of a deployment.
+
+    Values are pickled under string keys together with their freshness
+    window. Leases give one process at a time the right to load a key, so
+    N replicas that miss together make one upstream request instead of N.
+    Entries outlive their TTL by CACHE_BACKEND_RETENTION seconds so they
+    can still be served as stale fallbacks. Small state values (such as
+    provider quota counters) can be updated atomically with update().
+    """
+
+    name = ""
+
+    def __init__(self):
+        # Identifies this process as a lease holder
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._lock = threading.Lock()
+        self._stats = {"gets": 0, "hits": 0, "sets": 0, "leases": 0, "lease_conflicts": 0, "errors": 0}
+
+    @abstractmethod
+    def _get(self, key: str) -> Optional[SharedEntry]:
+        """Read an entry, None if absent."""
+
+    @abstractmethod
+    def _set(self, key: str, entry: SharedEntry):
+        """Write an entry."""
+
+    @abstractmethod
+    def _acquire(self, key: str, seconds: float) -> bool:
+        """Take the load lease for key unless another owner holds an unexpired one."""
+
+    @abstractmethod
+    def _release(self, key: str):
+        """Drop the lease for key if this owner holds it."""
+
+    @abstractmethod
+    def _delete(self, key: str, prefix: bool):
+        """Remove an entry, or every entry whose key starts with key."""
+
+    @abstractmethod
+    def _get_state(self, key: str) -> Optional[Any]:
+        """Read a state value, None if unset."""
+
+    @abstractmethod
+    def _update(self, key: str, func: Callable[[Optional[Any]], Tuple[Any, Any]]) -> Any:
+        """Atomically apply func to a state value."""
+
+    def get(self, key: str) -> Optional[SharedEntry]:
+        """Return the stored (value, stored_at, expires_at), or None (also on backend errors)."""
+        try:
+            entry = self._get(key)
+        except Exception as e:
+            self._error("get", e)
+            return None
+        self._count("gets", "hits" if entry is not None else None)
+        return entry
+
+    def set(self, key: str, value: Any, stored_at: float, expires_at: float):
+        """Store value for every process; failures are logged, never raised."""
+        try:
+            self._set(key, (value, stored_at, expires_at))
+        except Exception as e:
+            self._error("set", e)
+            return
+        self._count("sets")
+
+    def acquire(self, key: str, seconds: float = CACHE_LEASE_SECONDS) -> bool:
+        """
+        Try to become the only process loading key.
+
+        Returns:
+            True if this process now holds the lease (or the backend is
+            unreachable, so callers load rather than wait); False while
+            another process holds an unexpired lease
+        """
+        try:
+            acquired = self._acquire(key, seconds)
+        except Exception as e:
+            self._error("acquire", e)
+            return True
+        self._count("leases" if acquired else "lease_conflicts")
+        return acquired
+
+    def release(self, key: str):
+        """Give up a lease held by this process."""
+        try:
+            self._release(key)
+        except Exception as e:
+            self._error("release", e)
+
+    def delete(self, key: str, prefix: bool = False):
+        """Remove key (or every key starting with it when prefix is True) for all processes."""
+        try:
+            self._delete(key, prefix)
+        except Exception as e:
+            self._error("delete", e)
+
+    def get_state(self, key: str) -> Optional[Any]:
+        """
+        Read a state value written by update(), without locking or writing.
+
+        Returns:
+            The stored value, or None if unset
+
+        Raises:
+            Exception: backend errors are logged and re-raised, as in update()
+        """
+        try:
+            return self._get_state(key)
+        except Exception as e:
+            self._error("get_state", e)
+            raise
+
+    def update(self, key: str, func: Callable[[Optional[Any]], Tuple[Any, Any]]) -> Any:
+        """
+        Atomically read and replace a state value shared by every process.
+
+        Args:
+            key: State key (kept apart from cache entries, never expires)
+            func: Called with the current value (None if unset), returns
+                (new value, result); it may run more than once when processes
+                race, so it must only compute from its argument
+
+        Returns:
+            The result returned by func
+
+        Raises:
+            Exception: backend errors are logged and re-raised, so callers can
+                fall back to per-process state
+        """
+        try:
+            return self._update(key, func)
+        except Exception as e:
+            self._error("update", e)
+            raise
+
+    def _count(self, *keys: Optional[str]):
+        with self._lock:
+            for key in keys:
+                if key:
+                    self._stats[key] += 1
+
+    def _error(self, operation: str, error: Exception):
+        self._count("errors")
+        logger.warning("Shared cache %s %s failed: %s", self.name, operation, error)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"backend": self.name, "owner": self.owner, **self._stats}
+
+
+class SQLiteBackend(CacheBackend):
+    """
+    Shared cache in one SQLite database file in WAL mode.
+
+    For several processes or containers on one host sharing a directory:
+    readers never block the writer, and leases are single-row upserts that
+    only succeed when the previous lease has expired.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: str = CACHE_BACKEND_PATH):
+        super().__init__()
+        self.path = path
+        self._local = threading.local()
+        self._sets = 0
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, value BLOB, stored_at REAL, expires_at REAL)"
+        )
+        conn.execute("CREATE TABLE IF NOT EXISTS leases (key TEXT PRIMARY KEY, owner TEXT, expires_at REAL)")
+        conn.execute("CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value BLOB)")
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections must not be shared between threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _get(self, key: str) -> Optional[SharedEntry]:
+        row = self._connection().execute(
+            "SELECT value, stored_at, expires_at FROM entries WHERE key = ?", (key,)
+        ).fetchone()
+        return None if row is None else (pickle.loads(row[0]), row[1], row[2])
+
+    def _set(self, key: str, entry: SharedEntry):
+        value, stored_at, expires_at = entry
+        conn = self._connection()
+        conn.execute(
+            "INSERT OR REPLACE INTO entries (key, value, stored_at, expires_at) VALUES (?, ?, ?, ?)",
+            (key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), stored_at, expires_at),
+        )
+        self._sets += 1
+        if self._sets % 100 == 0:
+            conn.execute("DELETE FROM entries WHERE expires_at < ?", (time.time() - CACHE_BACKEND_RETENTION,))
+
+    def _acquire(self, key: str, seconds: float) -> bool:
+        now = time.time()
+        cursor = self._connection().execute(
+            "INSERT INTO leases (key, owner, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at "
+            "WHERE leases.expires_at < ? OR leases.owner = excluded.owner",
+            (key, self.owner, now + seconds, now),
+        )
+        return cursor.rowcount == 1
+
+    def _release(self, key: str):
+        self._connection().execute("DELETE FROM leases WHERE key = ? AND owner = ?", (key, self.owner))
+
+    def _delete(self, key: str, prefix: bool):
+        if prefix:
+            self._connection().execute("DELETE FROM entries WHERE substr(key, 1, ?) = ?", (len(key), key))
+        else:
+            self._connection().execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def _get_state(self, key: str) -> Optional[Any]:
+        row = self._connection().execute("SELECT value FROM state WHERE key = ?", (key,)).fetchone()
+        return None if row is None else pickle.loads(row[0])
+
+    def _update(self, key: str, func: Callable[[Optional[Any]], Tuple[Any, Any]]) -> Any:
+        conn = self._connection()
+        # Takes the write lock up front, so concurrent updates run one at a time
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT value FROM state WHERE key = ?", (key,)).fetchone()
+            value, result = func(None if row is None else pickle.loads(row[0]))
+            conn.execute(
+                "INSERT OR REPLACE INTO state (key, value) VALUES (?, ?)",
+                (key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)),
+            )
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return result
+
+
+class RedisBackend(CacheBackend):
+    """
+    Shared cache in Redis (or any Redis-compatible server) for multi-host deployments.
+
+    Leases are SET NX PX keys, released only by their owner. State updates
+    are optimistic WATCH/MULTI transactions, retried when another process
+    wrote the key in between.
+    """
+
+    name = "redis"
+
+    # Delete the lease only if this process still holds it
+    _RELEASE_SCRIPT = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) end return 0"
+
+    def __init__(self, url: str = REDIS_URL):
+        super().__init__()
+        try:
+            import redis
+        except ImportError:
+            raise ImportError("CACHE_BACKEND=redis requires the redis package (pip install redis)")
+        self.url = url
+        self._client = redis.Redis.from_url(url, socket_timeout=2.0, socket_connect_timeout=2.0)
+        self._release_script = self._client.register_script(self._RELEASE_SCRIPT)
+        self._watch_error = redis.WatchError
+
+    def _get(self, key: str) -> Optional[SharedEntry]:
+        data = self._client.get(f"cache:{key}")
+        return None if data is None else pickle.loads(data)
+
+    def _set(self, key: str, entry: SharedEntry):
+        keep_ms = int(max(0.0, entry[2] - time.time() + CACHE_BACKEND_RETENTION) * 1000)
+        self._client.set(f"cache:{key}", pickle.dumps(entry, protocol=pickle.HIGHEST_PROTOCOL), px=max(keep_ms, 1))
+
+    def _acquire(self, key: str, seconds: float) -> bool:
+        return bool(self._client.set(f"lease:{key}", self.owner, nx=True, px=int(seconds * 1000)))
+
+    def _release(self, key: str):
+        self._release_script(keys=[f"lease:{key}"], args=[self.owner])
+
+    def _delete(self, key: str, prefix: bool):
+        if not prefix:
+            self._client.delete(f"cache:{key}")
+            return
+        # Glob characters in the prefix are escaped so only literal matches go
+        pattern = "".join("\\" + c if c in "*?[]\\" else c for c in key)
+        for name in self._client.scan_iter(match=f"cache:{pattern}*", count=500):
+            self._client.delete(name)
+
+    def _get_state(self, key: str) -> Optional[Any]:
+        data = self._client.get(f"state:{key}")
+        return None if data is None else pickle.loads(data)
+
+    def _update(self, key: str, func: Callable[[Optional[Any]], Tuple[Any, Any]]) -> Any:
+        with self._client.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(f"state:{key}")
+                    data = pipe.get(f"state:{key}")
+                    value, result = func(None if data is None else pickle.loads(data))
+                    pipe.multi()
+                    pipe.set(f"state:{key}", pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+                    pipe.execute()
+                    return result
+                except self._watch_error:
+                    continue
+
+
+_backend: Optional[CacheBackend] = None
+_backend_lock = threading.Lock()
+
+def get_backend() -> Optional[CacheBackend]:
+    """
+    Return the process-wide shared backend selected by CACHE_BACKEND.
+
+    Returns:
+        SQLiteBackend or RedisBackend, or None when caching is per process
+    """
+    global _backend
+    if _backend is None and CACHE_BACKEND in ("sqlite", "redis"):
+        with _backend_lock:
+            if _backend is None:
+                _backend = SQLiteBackend() if CACHE_BACKEND == "sqlite" else RedisBackend()
+    return _backend
+
+def get_backend_stats() -> Optional[Dict[str, Any]]:
+    """Counters of the shared backend, None when caching is per process."""
+    backend = get_backend()
+    return backend.stats() if backend is not None else None
@@ -0,0 +1,106 @@
+import threading
+import time
+from typing import Any, Dict, Hashable
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class _Circuit:
+    __slots__ = ("state", "failures", "opened_at", "reset_timeout")
+
+    def __init__(self, reset_timeout: float):
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.reset_timeout = reset_timeout
+
+
+class CircuitBreaker:
+    """
+    Independent circuit per key (e.g. one per ticker symbol).
+
+    A circuit opens after failure_threshold consecutive failures, and while
+    open, allow() refuses calls so callers serve cached data instead of
+    waiting on a failing upstream. Once reset_timeout has passed, one call
+    is let through as a half-open probe: success closes the circuit, failure
+    reopens it with the timeout doubled (up to max_reset_timeout).
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 3, reset_timeout: float = 30.0, max_reset_timeout: float = 600.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self._circuits: Dict[Hashable, _Circuit] = {}
+        self._lock = threading.Lock()
+        self._stats = {"allowed": 0, "rejected": 0, "probes": 0, "opened": 0}
+
+    def _circuit(self, key: Hashable) -> _Circuit:
+        circuit = self._circuits.get(key)
+        if circuit is None:
+            circuit = self._circuits[key] = _Circuit(self.reset_timeout)
+        return circuit
+
+    def allow(self, key: Hashable) -> bool:
+        """
+        Check whether a call for key may go to the upstream.
+
+        Returns:
+            True if the circuit is closed, or open long enough that this
+            call becomes the half-open probe; False otherwise
+        """
+        with self._lock:
+            circuit = self._circuit(key)
+            if circuit.state == OPEN and time.monotonic() - circuit.opened_at >= circuit.reset_timeout:
+                circuit.state = HALF_OPEN
+                self._stats["probes"] += 1
+                self._stats["allowed"] += 1
+                return True
+            if circuit.state == CLOSED:
+                self._stats["allowed"] += 1
+                return True
+            self._stats["rejected"] += 1
+            return False
+
+    def record_success(self, key: Hashable):
+        with self._lock:
+            circuit = self._circuit(key)
+            circuit.state = CLOSED
+            circuit.failures = 0
+            circuit.reset_timeout = self.reset_timeout
+
+    def record_failure(self, key: Hashable):
+        with self._lock:
+            circuit = self._circuit(key)
+            circuit.failures += 1
+            if circuit.state == HALF_OPEN:
+                circuit.reset_timeout = min(circuit.reset_timeout * 2, self.max_reset_timeout)
+            elif circuit.state == OPEN or circuit.failures < self.failure_threshold:
+                return
+            circuit.state = OPEN
+            circuit.opened_at = time.monotonic()
+            self._stats["opened"] += 1
+
+    def state(self, key: Hashable) -> str:
+        with self._lock:
+            circuit = self._circuits.get(key)
+            return circuit.state if circuit is not None else CLOSED
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get counters and the keys whose circuits are not closed.
+
+        Returns:
+            Dictionary with allowed/rejected/probe/opened counts and a
+            mapping of open or half-open keys to seconds until their next probe
+        """
+        with self._lock:
+            now = time.monotonic()
+            tripped = {
+                str(key): round(max(0.0, circuit.opened_at + circuit.reset_timeout - now), 1)
+                for key, circuit in self._circuits.items()
+                if circuit.state != CLOSED
+            }
+            return {"name": self.name, **self._stats, "open": tripped}
@@ -9,51 +9,146 @@ EXCHANGE_RATE_API_KEY = os.getenv("EXCHANGE_RATE_API_KEY", "")
 CURRENCY_API_KEY = os.getenv("CURRENCY_API_KEY", "")
 
 # API Endpoints
-EXCHANGE_RATE_API_URL = "https://v6.exchangerate-api.com/v6"
-CURRENCY_API_URL = "https://api.currencyapi.com/v3"
+# Overridable so benchmarks and load tests can point at local stub servers
+EXCHANGE_RATE_API_URL = os.getenv("EXCHANGE_RATE_API_URL", "https://v6.exchangerate-api.com/v6")
+CURRENCY_API_URL = os.getenv("CURRENCY_API_URL", "https://api.currencyapi.com/v3")
 
-# Country Configuration
+# Local data directory for persistent stores
+CACHE_DIR = os.getenv("CACHE_DIR", ".cache")
+HISTORY_DIR = os.getenv("HISTORY_DIR", os.path.join(CACHE_DIR, "history"))
+
+# Shared HTTP client
+HTTP_POOL_CONNECTIONS = int(os.getenv("HTTP_POOL_CONNECTIONS", "10"))
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "20"))
+HTTP_PER_HOST_CONCURRENCY = int(os.getenv("HTTP_PER_HOST_CONCURRENCY", "8"))
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "2"))
+HTTP_BACKOFF_BASE = float(os.getenv("HTTP_BACKOFF_BASE", "0.25"))
+HTTP_BACKOFF_MAX = float(os.getenv("HTTP_BACKOFF_MAX", "4"))
+HTTP_RETRY_BUDGET_RATIO = float(os.getenv("HTTP_RETRY_BUDGET_RATIO", "0.2"))
+HTTP_RETRY_BUDGET_MIN = float(os.getenv("HTTP_RETRY_BUDGET_MIN", "10"))
+
+# Exchange rate cache
+# TTL is taken from the provider's next-update time when available, clamped to
+# [RATE_CACHE_MIN_TTL, RATE_CACHE_TTL_SECONDS].
+RATE_CACHE_TTL_SECONDS = int(os.getenv("RATE_CACHE_TTL_SECONDS", "3600"))
+RATE_CACHE_MIN_TTL = int(os.getenv("RATE_CACHE_MIN_TTL", "60"))
+RATE_CACHE_MAX_ENTRIES = int(os.getenv("RATE_CACHE_MAX_ENTRIES", "64"))
+
+# Cache shared by worker processes/replicas: "memory" (per process, default),
+# "sqlite" (WAL database file on one host) or "redis" (requires the redis package)
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory").lower()
+CACHE_BACKEND_PATH = os.getenv("CACHE_BACKEND_PATH", os.path.join(CACHE_DIR, "shared_cache.sqlite"))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+# Seconds one process may hold a load lease, and how long others wait on it before loading themselves
+CACHE_LEASE_SECONDS = float(os.getenv("CACHE_LEASE_SECONDS", "30"))
+CACHE_LEASE_POLL = float(os.getenv("CACHE_LEASE_POLL", "0.05"))
+# Expired shared entries are kept this long as stale fallbacks
+CACHE_BACKEND_RETENTION = float(os.getenv("CACHE_BACKEND_RETENTION", "86400"))
+
+# Provider quotas: requests allowed per window (seconds), and how many may be spent in a burst.
+# Counted for the whole fleet with a sqlite/redis CACHE_BACKEND; with "memory" every
+# process gets the full quota, so divide it by the number of processes
+EXCHANGE_RATE_API_QUOTA = int(os.getenv("EXCHANGE_RATE_API_QUOTA", "1500"))
+EXCHANGE_RATE_API_QUOTA_WINDOW = float(os.getenv("EXCHANGE_RATE_API_QUOTA_WINDOW", str(30 * 86400)))
+EXCHANGE_RATE_API_BURST = int(os.getenv("EXCHANGE_RATE_API_BURST", "50"))
+CURRENCY_API_QUOTA = int(os.getenv("CURRENCY_API_QUOTA", "300"))
+CURRENCY_API_QUOTA_WINDOW = float(os.getenv("CURRENCY_API_QUOTA_WINDOW", str(30 * 86400)))
+CURRENCY_API_BURST = int(os.getenv("CURRENCY_API_BURST", "10"))
+GEMINI_QUOTA = int(os.getenv("GEMINI_QUOTA", "100"))
+GEMINI_QUOTA_WINDOW = float(os.getenv("GEMINI_QUOTA_WINDOW", "86400"))
+GEMINI_BURST = int(os.getenv("GEMINI_BURST", "5"))
+# Fraction of each bucket that background refreshes may not use
+RATE_LIMIT_BACKGROUND_RESERVE = float(os.getenv("RATE_LIMIT_BACKGROUND_RESERVE", "0.2"))
+# Longest an interactive request waits for a token before giving up
+RATE_LIMIT_MAX_WAIT = float(os.getenv("RATE_LIMIT_MAX_WAIT", "2"))
+
+# FX rate providers, in order of preference until their latency has been measured
+FX_PROVIDERS = [name.strip() for name in os.getenv("FX_PROVIDERS", "exchangerate-api,currencyapi").split(",") if name.strip()]
+# A second provider is asked once the first has taken longer than its recent p95,
+# clamped to [FX_HEDGE_MIN_DELAY, FX_HEDGE_MAX_DELAY] (the maximum is used until
+# FX_HEDGE_MIN_SAMPLES requests have been timed); no rate fetch waits longer
+# than FX_HEDGE_DEADLINE in total
+FX_HEDGE_MAX_DELAY = float(os.getenv("FX_HEDGE_MAX_DELAY", "1.0"))
+FX_HEDGE_MIN_DELAY = float(os.getenv("FX_HEDGE_MIN_DELAY", "0.1"))
+FX_HEDGE_MIN_SAMPLES = int(os.getenv("FX_HEDGE_MIN_SAMPLES", "5"))
+FX_HEDGE_DEADLINE = float(os.getenv("FX_HEDGE_DEADLINE", "5"))
+# Consecutive failures before a provider is skipped, and for how long
+FX_PROVIDER_FAILURE_THRESHOLD = int(os.getenv("FX_PROVIDER_FAILURE_THRESHOLD", "3"))
+FX_PROVIDER_COOLDOWN = float(os.getenv("FX_PROVIDER_COOLDOWN", "60"))
+
+# Concurrent fetching (Compare Countries view); the deadline covers the whole batch
+FANOUT_MAX_WORKERS = int(os.getenv("FANOUT_MAX_WORKERS", "8"))
+FANOUT_DEADLINE_SECONDS = float(os.getenv("FANOUT_DEADLINE_SECONDS", "12"))
+
+# Background prefetching
+PREFETCH_ENABLED = os.getenv("PREFETCH_ENABLED", "true").lower() in ("1", "true", "yes")
+PREFETCH_RATES_INTERVAL = float(os.getenv("PREFETCH_RATES_INTERVAL", "300"))
+PREFETCH_INDICES_INTERVAL = float(os.getenv("PREFETCH_INDICES_INTERVAL", "60"))
+PREFETCH_CLOSED_MARKET_INTERVAL = float(os.getenv("PREFETCH_CLOSED_MARKET_INTERVAL", "1800"))
+PREFETCH_JITTER = float(os.getenv("PREFETCH_JITTER", "0.1"))  # +/- fraction of the interval
+PREFETCH_MAX_BACKOFF = float(os.getenv("PREFETCH_MAX_BACKOFF", "900"))
+SNAPSHOT_MAX_AGE_SECONDS = float(os.getenv("SNAPSHOT_MAX_AGE_SECONDS", "900"))
+# Snapshots stay usable for their job's interval (plus jitter) and this many seconds,
+# and never less than SNAPSHOT_MAX_AGE_SECONDS
+SNAPSHOT_REFRESH_SLACK = float(os.getenv("SNAPSHOT_REFRESH_SLACK", "120"))
+
+# Yahoo Finance circuit breaker (per symbol): consecutive failures before calls
+# stop, and seconds before a probe is let through (doubling while probes fail)
+YAHOO_BREAKER_FAILURES = int(os.getenv("YAHOO_BREAKER_FAILURES", "3"))
+YAHOO_BREAKER_RESET_SECONDS = float(os.getenv("YAHOO_BREAKER_RESET_SECONDS", "30"))
+YAHOO_BREAKER_MAX_RESET_SECONDS = float(os.getenv("YAHOO_BREAKER_MAX_RESET_SECONDS", "600"))
+# Last real quote per symbol, served while Yahoo is unavailable
+QUOTE_STORE_PATH = os.getenv("QUOTE_STORE_PATH", os.path.join(CACHE_DIR, "last_quotes.json"))
+
+# Portfolio conversion: rows read per chunk when streaming position files
+PORTFOLIO_CHUNK_ROWS = int(os.getenv("PORTFOLIO_CHUNK_ROWS", "1000000"))
+
+# Rendered map HTML cache
+MAP_CACHE_MAX_ENTRIES = int(os.getenv("MAP_CACHE_MAX_ENTRIES", "64"))
+
+# Historical analytics: years of daily history covered, and how often to look for new bars
+ANALYTICS_HISTORY_YEARS = int(os.getenv("ANALYTICS_HISTORY_YEARS", "10"))
+ANALYTICS_REFRESH_SECONDS = float(os.getenv("ANALYTICS_REFRESH_SECONDS", "300"))
+# Bars from the last this-many days are re-read on every refresh, so late bars and
+# partial intraday bars are replaced instead of kept as first seen
+ANALYTICS_REVISION_DAYS = int(os.getenv("ANALYTICS_REVISION_DAYS", "3"))
+
+# Dashboard live mode: seconds between partial reruns of the indices section
+LIVE_INDICES_INTERVAL = float(os.getenv("LIVE_INDICES_INTERVAL", "15"))
+
+# Headless data API
+API_HOST = os.getenv("API_HOST", "0.0.0.0")
+API_PORT = int(os.getenv("API_PORT", "8080"))
+API_INDICES_CACHE_TTL = float(os.getenv("API_INDICES_CACHE_TTL", "60"))
+
+# AI agent
+AGENT_TOOL_CACHE_TTL = float(os.getenv("AGENT_TOOL_CACHE_TTL", "120"))
+AGENT_METRICS_HISTORY = int(os.getenv("AGENT_METRICS_HISTORY", "100"))
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "256"))
+RESPONSE_CACHE_SIMILARITY = float(os.getenv("RESPONSE_CACHE_SIMILARITY", "0.9"))
+# Upper bound on answer reuse when index data is not prefetched
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "900"))
+
+# Tracing (spans around upstream calls and rendering stages)
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "false").lower() in ("1", "true", "yes")
+TRACING_EXPORT_PATH = os.getenv("TRACING_EXPORT_PATH", "")  # append OTLP JSON lines here when set
+TRACING_MAX_TRACES = int(os.getenv("TRACING_MAX_TRACES", "50"))
+TRACING_SIDEBAR_PANEL = os.getenv("TRACING_SIDEBAR_PANEL", "false").lower() in ("1", "true", "yes")
+
+# Country/currency/exchange registry (bundled data file, loaded once per process)
+REGISTRY_PATH = os.getenv("REGISTRY_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "registry.json"))
+# Comma-separated countries shown in the dashboard (empty = every country with a listed exchange)
+DASHBOARD_COUNTRIES = [c.strip() for c in os.getenv("DASHBOARD_COUNTRIES", "").split(",") if c.strip()]
+
+# Country Configuration, derived from each country's primary exchange in the registry
+from registry import get_registry
+
+_registry = get_registry(REGISTRY_PATH)
 COUNTRY_CONFIG = {
-    "Japan": {
-        "code": "JPY",
-        "stock_exchange": "Tokyo Stock Exchange (TSE)",
-        "major_indices": ["^N225", "^TOPIX"],  # Nikkei 225, TOPIX
-        "exchange_lat": 35.6762,
-        "exchange_lng": 139.7674,
-    },
-    "India": {
-        "code": "INR",
-        "stock_exchange": "Bombay Stock Exchange (BSE)",
-        "major_indices": ["^BSESN", "^NSEI"],  # BSE SENSEX, NIFTY 50
-        "exchange_lat": 19.0760,
-        "exchange_lng": 72.5762,
-    },
-    "United States": {
-        "code": "USD",
-        "stock_exchange": "New York Stock Exchange (NYSE)",
-        "major_indices": ["^GSPC", "^DJI", "^IXIC"],  # S&P 500, Dow Jones, Nasdaq
-        "exchange_lat": 40.7074,
-        "exchange_lng": -74.0113,
-    },
-    "South Korea": {
-        "code": "KRW",
-        "stock_exchange": "Korea Exchange (KRX)",
-        "major_indices": ["^KS11"],  # KOSPI
-        "exchange_lat": 37.5665,
-        "exchange_lng": 126.9780,
-    },
-    "China": {
-        "code": "CNY",
-        "stock_exchange": "Shanghai Stock Exchange (SSE)",
-        "major_indices": ["000001.SS"],  # Shanghai Composite
-        "exchange_lat": 31.2304,
-        "exchange_lng": 121.4737,
-    },
-    "United Kingdom": {
-        "code": "GBP",
-        "stock_exchange": "London Stock Exchange (LSE)",
-        "major_indices": ["^FTSE"],  # FTSE 100
-        "exchange_lat": 51.5128,
-        "exchange_lng": -0.0843,
-    },
+    country: _registry.market_config(country)
+    for country in (DASHBOARD_COUNTRIES or _registry.market_countries)
+    if _registry.primary_exchange(country) is not None
 }
+# Selector options, built once
+COUNTRY_NAMES = tuple(COUNTRY_CONFIG)
@@ -1,39 +1,225 @@
-import requests
-from typing import Dict, Any
-from config import EXCHANGE_RATE_API_URL, EXCHANGE_RATE_API_KEY, CURRENCY_API_KEY, CURRENCY_API_URL
+import time
+from datetime import date
+from typing import Dict, Any, List, Optional, Tuple
+from config import (
+    CURRENCY_API_KEY,
+    CURRENCY_API_URL,
+    RATE_CACHE_TTL_SECONDS,
+    RATE_CACHE_MIN_TTL,
+    RATE_CACHE_MAX_ENTRIES,
+)
+from cache import TTLCache
+import http_client
+import rate_limiter
+import fx_providers
+import tracing
+from fx_matrix import CrossRateMatrix
+from snapshots import RateSnapshot
+from history_store import get_history_store, record_frame
+import pandas as pd
 import json
 
-def get_exchange_rates(base_currency: str) -> Dict[str, float]:
+# All cross rates are derived from a single snapshot quoted against this currency.
+PIVOT_CURRENCY = "USD"
+
+# Quote currencies shown for every base in the dashboard and agent output.
+DISPLAY_QUOTES = ["USD", "INR", "GBP", "EUR"]
+
+# Process-wide cache of cross-rate matrices keyed by pivot currency.
+# Shared by every Streamlit session and the agent tools (and by every worker
+# process when a CACHE_BACKEND is configured).
+_rate_cache = TTLCache(
+    max_entries=RATE_CACHE_MAX_ENTRIES,
+    default_ttl=RATE_CACHE_TTL_SECONDS,
+    name="exchange_rates",
+    shared=True,
+)
+
+def _rate_ttl(matrix: CrossRateMatrix) -> float:
+    """
+    Derive a cache TTL from the provider's next scheduled update.
+
+    Args:
+        matrix: Cross-rate matrix built from the provider response
+
+    Returns:
+        TTL in seconds
+    """
+    next_update = matrix.next_update
+    if isinstance(next_update, (int, float)) and next_update > 0:
+        ttl = next_update - time.time()
+        return max(RATE_CACHE_MIN_TTL, min(RATE_CACHE_TTL_SECONDS, ttl))
+    return RATE_CACHE_TTL_SECONDS
+
+def fx_history_symbol(code: str) -> str:
+    """History store key for a currency's units-per-USD series."""
+    return f"FX:{code}"
+
+@tracing.traced("history.record_rates")
+def _record_rates(matrix: CrossRateMatrix, as_of: Any):
+    """Append the snapshot's USD rates to the history store, one bar per currency."""
+    day = pd.to_datetime(as_of, unit="s") if isinstance(as_of, (int, float)) else pd.Timestamp.now(tz="UTC").tz_localize(None)
+    frame = pd.DataFrame(
+        [matrix.matrix[matrix.index[PIVOT_CURRENCY]]],
+        index=pd.DatetimeIndex([day.normalize()]),
+        columns=[fx_history_symbol(code) for code in matrix.codes],
+    )
+    record_frame(frame)
+
+@tracing.traced("fx.load_matrix")
+def _load_matrix(pivot: str) -> CrossRateMatrix:
+    """
+    Fetch one pivot snapshot from the FX providers and build the cross-rate matrix from it.
+
+    Raises on failure so that failures are never cached.
+    """
+    matrix = fx_providers.fetch_matrix(pivot)
+    _record_rates(matrix, matrix.timestamp or None)
+    return matrix
+
+def get_cross_rate_matrix() -> CrossRateMatrix:
     """
-    Get exchange rates for a given currency against USD, INR, GBP, EUR using ExchangeRate-API.
+    Get the cross-rate matrix for all currencies known to the provider.
+
+    One upstream request (per cache TTL) serves every base/quote pair.
+
+    Returns:
+        CrossRateMatrix (raises on fetch failure)
+    """
+    return _rate_cache.get_or_load(
+        PIVOT_CURRENCY,
+        lambda: _load_matrix(PIVOT_CURRENCY),
+        ttl_for=_rate_ttl,
+    )
+
+def _get_matrix_or_stale() -> Tuple[CrossRateMatrix, Dict[str, Any]]:
+    """
+    Get the cross-rate matrix, falling back to the last good one when the
+    quota is spent or the provider fails.
+
+    Returns:
+        Tuple of (matrix, seconds since the matrix was fetched if it is a stale fallback, else -1)
+    """
+    matrix, age = _rate_cache.get_or_stale(
+        PIVOT_CURRENCY,
+        lambda: _load_matrix(PIVOT_CURRENCY),
+        ttl_for=_rate_ttl,
+    )
+    return matrix, (-1 if age is None else int(age))
+
+@tracing.traced("fx.get_exchange_rates")
+def get_exchange_rates(base_currency: str) -> Dict[str, Any]:
+    """
+    Get exchange rates for a given currency against USD, INR, GBP, EUR.
+
+    Rates are derived from the shared USD cross-rate matrix, so any base
+    currency is served without an extra upstream request. If the provider
+    quota is spent or the request fails, the last good rates are returned
+    with "stale": True and their age in "stale_seconds".
     
     Args:
         base_currency: Currency code (e.g., 'JPY')
         
     Returns:
-        Dictionary with exchange rates
+        RateSnapshot (read like the rates dict), or {"error": ...}
     """
     try:
-        url = f"{EXCHANGE_RATE_API_URL}/{EXCHANGE_RATE_API_KEY}/latest/{base_currency}"
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        data = response.json()
-        
-        if data.get("result") == "success":
-            rates = data.get("conversion_rates", {})
-            return {
-                "base": base_currency,
-                "USD": rates.get("USD", "N/A"),
-                "INR": rates.get("INR", "N/A"),
-                "GBP": rates.get("GBP", "N/A"),
-                "EUR": rates.get("EUR", "N/A"),
-                "timestamp": data.get("time_last_updated", ""),
-            }
-        else:
+        matrix, stale_seconds = _get_matrix_or_stale()
+        code = base_currency.upper()
+        if code not in matrix:
             return {"error": f"Failed to fetch rates for {base_currency}"}
+
+        values = matrix.quote_block([code], DISPLAY_QUOTES)[0]
+        return RateSnapshot(base_currency, DISPLAY_QUOTES, values, matrix.timestamp, stale_seconds)
     except Exception as e:
         return {"error": str(e)}
 
+@tracing.traced("fx.get_comparison_rates")
+def get_comparison_rates(base_currencies: List[str], quotes: List[str] = DISPLAY_QUOTES) -> Dict[str, Any]:
+    """
+    Get rates for several base currencies at once from a single snapshot.
+
+    Args:
+        base_currencies: Currency codes to compare (e.g., ['JPY', 'INR'], any case)
+        quotes: Quote currency codes (any case)
+
+    Returns:
+        Dictionary mapping each upper-cased base code to its RateSnapshot
+        (marked stale as in get_exchange_rates), or {"error": ...}
+    """
+    base_currencies = [code.upper() for code in base_currencies]
+    quotes = [code.upper() for code in quotes]
+    try:
+        matrix, stale_seconds = _get_matrix_or_stale()
+        known = [code for code in base_currencies if code in matrix]
+        # One block for all bases; each snapshot is a row view into it
+        block = matrix.quote_block(known, quotes)
+
+        result = {}
+        for row, code in zip(block, known):
+            result[code] = RateSnapshot(code, quotes, row, matrix.timestamp, stale_seconds)
+        for code in base_currencies:
+            if code not in result:
+                result[code] = {"error": f"Failed to fetch rates for {code}"}
+        return result
+    except Exception as e:
+        return {"error": str(e)}
+
+def _download_fx_history(symbols: List[str], start: date, end: date) -> pd.DataFrame:
+    """Download units-per-USD history from Yahoo FX pairs (e.g. 'JPY=X')."""
+    from stock_utils import download_closes
+
+    codes = [symbol.split(":", 1)[1] for symbol in symbols]
+    frame = download_closes([f"{code}=X" for code in codes], start=start, end=end)
+    frame.columns = symbols
+    return frame
+
+def get_rate_history(
+    codes: List[str], start: date, end: Optional[date] = None, revise_from: Optional[date] = None
+) -> pd.DataFrame:
+    """
+    Get daily units-per-USD rates for currencies, served from the local history store.
+
+    Only the date range missing from the store is downloaded.
+
+    Args:
+        codes: Currency codes (e.g., ['JPY', 'INR'])
+        start: First date
+        end: Last date (defaults to today)
+        revise_from: Stored bars from this date on are downloaded again (late or partial bars)
+
+    Returns:
+        DataFrame indexed by date with one column per currency code
+    """
+    end = end or date.today()
+    store = get_history_store()
+    symbols = [fx_history_symbol(code) for code in codes if code != PIVOT_CURRENCY]
+    store.backfill(symbols, start, end, _download_fx_history, revise_from)
+    frame = store.read_frame(symbols, start, end)
+    frame.columns = [symbol.split(":", 1)[1] for symbol in frame.columns]
+    if PIVOT_CURRENCY in codes:
+        frame[PIVOT_CURRENCY] = 1.0
+    return frame.reindex(columns=codes)
+
+def get_rates_version() -> str:
+    """
+    Identify the currently cached rates snapshot without fetching.
+
+    Returns:
+        Provider timestamp of the cached snapshot, or "" if none is cached
+    """
+    entry = _rate_cache.peek(PIVOT_CURRENCY)
+    return str(entry.value.timestamp) if entry is not None else ""
+
+def get_rate_cache_stats() -> Dict[str, Any]:
+    """
+    Get hit/miss/stale counters for the exchange rate cache.
+
+    Returns:
+        Dictionary of cache statistics
+    """
+    return _rate_cache.stats()
+
 def get_currency_info(country: str) -> Dict[str, Any]:
     """
     Get currency information for a country.
@@ -46,13 +232,14 @@ def get_currency_info(country: str) -> Dict[str, Any]:
     """
     try:
         # Alternative approach using CurrencyAPI
+        rate_limiter.acquire(rate_limiter.CURRENCY_API)
         url = f"{CURRENCY_API_URL}/latest"
         params = {
             "apikey": CURRENCY_API_KEY,
             "base_currency": "USD",
             "currencies": "JPY,INR,GBP,EUR,KRW,CNY"
         }
-        response = requests.get(url, params=params, timeout=10)
+        response = http_client.get(url, params=params, timeout=10)
         response.raise_for_status()
         return response.json()
     except Exception as e:
@@ -77,5 +264,7 @@ def format_exchange_rates(rates: Dict[str, Any]) -> str:
     result += f"- INR: {rates.get('INR', 'N/A')}\n"
     result += f"- GBP: {rates.get('GBP', 'N/A')}\n"
     result += f"- EUR: {rates.get('EUR', 'N/A')}\n"
+    if rates.get("stale"):
+        result += f"(Stale: provider unavailable, rates are {rates['stale_seconds'] // 60} minutes old)\n"
     
     return result
@@ -0,0 +1,70 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeout
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from config import COUNTRY_CONFIG, FANOUT_MAX_WORKERS, FANOUT_DEADLINE_SECONDS
+from currency_utils import get_comparison_rates
+from stock_utils import get_stock_indices
+from prefetch import get_prefetched_rates, get_prefetched_indices
+import tracing
+
+# Shared, bounded pool so concurrent sessions cannot spawn unbounded threads
+_executor = ThreadPoolExecutor(max_workers=FANOUT_MAX_WORKERS, thread_name_prefix="fanout")
+
+def gather_country_data(
+    countries: List[str],
+    deadline: Optional[float] = None,
+) -> Iterator[Tuple[str, Optional[str], Dict[str, Any]]]:
+    """
+    Fetch exchange rates and stock indices for several countries concurrently.
+
+    All requests are issued at once and results are yielded as soon as each
+    one completes, so callers can render partial results. Fresh prefetched
+    snapshots are yielded first without a request. The deadline is one
+    overall limit for the whole batch, counted from the first wait: requests
+    not finished by then are reported as timed out. Queued requests are
+    cancelled, but ones already running keep their pool thread until their
+    own HTTP timeouts end them. Worker threads run in the caller's tracing
+    context, so their spans join the caller's trace.
+
+    Args:
+        countries: Country names from COUNTRY_CONFIG
+        deadline: Seconds to wait for all requests together (defaults to FANOUT_DEADLINE_SECONDS)
+
+    Yields:
+        Tuples of (kind, country, result) where kind is "rates" (country is
+        None, result maps currency code to rates) or "indices"
+    """
+    deadline = FANOUT_DEADLINE_SECONDS if deadline is None else deadline
+    configs = {country: COUNTRY_CONFIG[country] for country in countries if country in COUNTRY_CONFIG}
+
+    # Submit only what has no fresh prefetched snapshot, then serve the
+    # snapshots while the requests are in flight
+    codes = [config["code"] for config in configs.values()]
+    prefetched_rates = {code: get_prefetched_rates(code) for code in codes}
+    prefetched_indices = {country: get_prefetched_indices(country) for country in configs}
+
+    futures = {}
+    if not all(prefetched_rates.values()):
+        futures[_executor.submit(tracing.propagate(get_comparison_rates), codes)] = ("rates", None)
+    for country, config in configs.items():
+        if prefetched_indices[country] is None:
+            futures[_executor.submit(tracing.propagate(get_stock_indices), config["major_indices"])] = ("indices", country)
+
+    if all(prefetched_rates.values()):
+        yield "rates", None, prefetched_rates
+    for country, indices in prefetched_indices.items():
+        if indices is not None:
+            yield "indices", country, indices
+
+    pending = dict(futures)
+    try:
+        for future in as_completed(futures, timeout=deadline):
+            kind, country = pending.pop(future)
+            try:
+                yield kind, country, future.result()
+            except Exception as e:
+                yield kind, country, {"error": str(e)}
+    except FuturesTimeout:
+        for future, (kind, country) in pending.items():
+            # Only stops requests still queued; running ones finish in the background
+            future.cancel()
+            yield kind, country, {"error": f"Timed out after {deadline:g}s"}
@@ -0,0 +1,76 @@
+import numpy as np
+from typing import Dict, List, Optional
+
+
+class CrossRateMatrix:
+    """
+    Currency x currency conversion matrix derived from a single snapshot.
+
+    Given one response quoted against a pivot currency (e.g. USD), every
+    base/quote pair is available as an O(1) lookup:
+
+        matrix[i, j] = units of currency j per 1 unit of currency i
+    """
+
+    def __init__(
+        self,
+        pivot_rates: Dict[str, float],
+        pivot: str = "USD",
+        timestamp: int = 0,
+        next_update: Optional[float] = None,
+        source: str = "",
+    ):
+        """
+        Build the matrix from pivot-based rates.
+
+        Args:
+            pivot_rates: Mapping of currency code to units per 1 pivot unit
+            pivot: Pivot currency code the rates are quoted against
+            timestamp: Provider's last update as epoch seconds (0 if unknown)
+            next_update: Provider's next update as a unix timestamp, if known
+            source: Name of the provider the rates came from
+        """
+        rates = {code: float(rate) for code, rate in pivot_rates.items() if rate}
+        rates.setdefault(pivot, 1.0)
+
+        self.pivot = pivot
+        self.timestamp = int(timestamp or 0)
+        self.next_update = next_update
+        self.source = source
+        self.codes: List[str] = sorted(rates)
+        self.index: Dict[str, int] = {code: i for i, code in enumerate(self.codes)}
+        self.pivot_rates = np.array([rates[code] for code in self.codes], dtype=np.float64)
+        self.matrix = np.outer(1.0 / self.pivot_rates, self.pivot_rates)
+
+    def __contains__(self, code: str) -> bool:
+        return code in self.index
+
+    def rate(self, base: str, quote: str) -> float:
+        """
+        Get the conversion rate for one pair.
+
+        Args:
+            base: Base currency code
+            quote: Quote currency code
+
+        Returns:
+            Units of quote per 1 unit of base (KeyError if either is unknown)
+        """
+        return float(self.matrix[self.index[base], self.index[quote]])
+
+    def quote_block(self, bases: List[str], quotes: List[str]) -> np.ndarray:
+        """
+        Get a bases x quotes block where unknown quotes are NaN columns.
+
+        Args:
+            bases: Base currency codes (must all be known)
+            quotes: Quote currency codes (unknown ones allowed)
+
+        Returns:
+            2-D float64 array of rates
+        """
+        cols = np.array([self.index.get(q, -1) for q in quotes], dtype=np.intp)
+        rows = np.array([self.index[b] for b in bases], dtype=np.intp)
+        block = self.matrix[np.ix_(rows, np.maximum(cols, 0))]
+        block[:, cols < 0] = np.nan
+        return block
@@ -0,0 +1,267 @@
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from contextvars import copy_context
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+import numpy as np
+from config import (
+    EXCHANGE_RATE_API_URL,
+    EXCHANGE_RATE_API_KEY,
+    CURRENCY_API_URL,
+    CURRENCY_API_KEY,
+    FX_PROVIDERS,
+    FX_HEDGE_MAX_DELAY,
+    FX_HEDGE_MIN_DELAY,
+    FX_HEDGE_MIN_SAMPLES,
+    FX_HEDGE_DEADLINE,
+    FX_PROVIDER_FAILURE_THRESHOLD,
+    FX_PROVIDER_COOLDOWN,
+)
+from fx_matrix import CrossRateMatrix
+import http_client
+import rate_limiter
+import tracing
+
+# Recent request latencies kept per provider for ranking and hedge timing
+LATENCY_WINDOW = 100
+
+
+class FXProvider(ABC):
+    """
+    One source of exchange rates.
+
+    Subclasses implement _fetch (one upstream request) and _normalize (its
+    response as a CrossRateMatrix); fetch wraps them with the provider's
+    request quota, latency measurement and health tracking. A provider that
+    fails FX_PROVIDER_FAILURE_THRESHOLD times in a row is unhealthy for
+    FX_PROVIDER_COOLDOWN seconds, then gets another chance.
+    """
+
+    name = ""
+    limiter = ""
+
+    def __init__(self):
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self._consecutive_failures = 0
+        self._unhealthy_until = 0.0
+        self._lock = threading.Lock()
+        self._stats = {"requests": 0, "failures": 0, "wins": 0, "hedges": 0}
+
+    @abstractmethod
+    def _fetch(self, pivot: str) -> Dict[str, Any]:
+        """Request the latest rates from the provider."""
+
+    @abstractmethod
+    def _normalize(self, data: Dict[str, Any], pivot: str) -> CrossRateMatrix:
+        """Build a cross-rate matrix from the provider's response."""
+
+    def fetch(self, pivot: str) -> CrossRateMatrix:
+        """
+        Fetch rates quoted against pivot.
+
+        Raises:
+            QuotaExceeded: if the provider's request budget is spent (not counted as a failure)
+            Exception: on transport errors or unusable responses
+        """
+        rate_limiter.acquire(self.limiter)
+        started = time.monotonic()
+        try:
+            with tracing.span("fx.provider", provider=self.name):
+                matrix = self._normalize(self._fetch(pivot), pivot)
+        except Exception:
+            self._record(time.monotonic() - started, ok=False)
+            raise
+        self._record(time.monotonic() - started, ok=True)
+        return matrix
+
+    def _record(self, latency: float, ok: bool):
+        with self._lock:
+            self._stats["requests"] += 1
+            if ok:
+                self._latencies.append(latency)
+                self._consecutive_failures = 0
+                return
+            self._stats["failures"] += 1
+            self._consecutive_failures += 1
+            if self._consecutive_failures >= FX_PROVIDER_FAILURE_THRESHOLD:
+                self._unhealthy_until = time.monotonic() + FX_PROVIDER_COOLDOWN
+
+    def _count(self, key: str):
+        with self._lock:
+            self._stats[key] += 1
+
+    @property
+    def healthy(self) -> bool:
+        return time.monotonic() >= self._unhealthy_until
+
+    def latency(self, q: float) -> Optional[float]:
+        """Quantile q (0-100) of recent successful request latencies, None if unmeasured."""
+        with self._lock:
+            samples = list(self._latencies)
+        return float(np.percentile(samples, q)) if samples else None
+
+    def hedge_delay(self) -> float:
+        """Seconds to wait on this provider before asking another one (its recent p95, clamped)."""
+        with self._lock:
+            measured = len(self._latencies) >= FX_HEDGE_MIN_SAMPLES
+        delay = self.latency(95) if measured else FX_HEDGE_MAX_DELAY
+        return min(FX_HEDGE_MAX_DELAY, max(FX_HEDGE_MIN_DELAY, delay))
+
+    def stats(self) -> Dict[str, Any]:
+        p50, p95 = self.latency(50), self.latency(95)
+        with self._lock:
+            return {
+                "provider": self.name,
+                "healthy": self.healthy,
+                "samples": len(self._latencies),
+                "p50_ms": None if p50 is None else round(p50 * 1000, 1),
+                "p95_ms": None if p95 is None else round(p95 * 1000, 1),
+                **self._stats,
+            }
+
+
+class ExchangeRateAPIProvider(FXProvider):
+    """ExchangeRate-API v6 (/<key>/latest/<BASE>)."""
+
+    name = rate_limiter.EXCHANGE_RATE_API
+    limiter = rate_limiter.EXCHANGE_RATE_API
+
+    def _fetch(self, pivot: str) -> Dict[str, Any]:
+        response = http_client.get(f"{EXCHANGE_RATE_API_URL}/{EXCHANGE_RATE_API_KEY}/latest/{pivot}", timeout=10)
+        response.raise_for_status()
+        data = response.json()
+        if data.get("result") != "success":
+            raise ValueError(f"Failed to fetch rates for {pivot}")
+        return data
+
+    def _normalize(self, data: Dict[str, Any], pivot: str) -> CrossRateMatrix:
+        return CrossRateMatrix(
+            data.get("conversion_rates", {}),
+            pivot=pivot,
+            timestamp=data.get("time_last_update_unix") or 0,
+            next_update=data.get("time_next_update_unix"),
+            source=self.name,
+        )
+
+
+class CurrencyAPIProvider(FXProvider):
+    """CurrencyAPI v3 (/latest?base_currency=<BASE>)."""
+
+    name = rate_limiter.CURRENCY_API
+    limiter = rate_limiter.CURRENCY_API
+
+    def _fetch(self, pivot: str) -> Dict[str, Any]:
+        params = {"apikey": CURRENCY_API_KEY, "base_currency": pivot}
+        response = http_client.get(f"{CURRENCY_API_URL}/latest", params=params, timeout=10)
+        response.raise_for_status()
+        data = response.json()
+        if not data.get("data"):
+            raise ValueError(f"Failed to fetch rates for {pivot}")
+        return data
+
+    def _normalize(self, data: Dict[str, Any], pivot: str) -> CrossRateMatrix:
+        updated = data.get("meta", {}).get("last_updated_at")
+        timestamp = int(datetime.fromisoformat(updated.replace("Z", "+00:00")).timestamp()) if updated else 0
+        return CrossRateMatrix(
+            {code: quote.get("value") for code, quote in data["data"].items()},
+            pivot=pivot,
+            timestamp=timestamp,
+            source=self.name,
+        )
+
+
+_provider_classes = {cls.name: cls for cls in (ExchangeRateAPIProvider, CurrencyAPIProvider)}
+_providers: List[FXProvider] = [_provider_classes[name]() for name in FX_PROVIDERS if name in _provider_classes]
+
+# Small pool: at most one request per provider is in flight per fetch
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="fx-provider")
+
+
+def register_provider(provider: FXProvider):
+    """Add a provider after the configured ones."""
+    _providers.append(provider)
+
+
+def ranked_providers() -> List[FXProvider]:
+    """
+    Providers in the order they should be tried.
+
+    Healthy providers come first, fastest median latency first; providers
+    not yet measured keep their configured order after the measured ones.
+    Unhealthy providers are kept last as a last resort.
+    """
+    def key(item):
+        position, provider = item
+        p50 = provider.latency(50)
+        return (not provider.healthy, p50 is None, p50 or 0.0, position)
+    return [provider for _, provider in sorted(enumerate(_providers), key=key)]
+
+
+@tracing.traced("fx.fetch_matrix")
+def fetch_matrix(pivot: str, deadline: float = FX_HEDGE_DEADLINE) -> CrossRateMatrix:
+    """
+    Fetch rates from the best available provider, hedging slow requests.
+
+    The fastest healthy provider is asked first. If it has not answered
+    within its recent p95 latency, the next provider is asked as well and
+    the first good response wins; if it fails, the next provider is asked
+    right away. Requests left running finish in the background so their
+    latency is still measured.
+
+    Args:
+        pivot: Currency the rates are quoted against
+        deadline: Longest time to wait for any provider, in seconds
+
+    Returns:
+        CrossRateMatrix tagged with the provider in its source attribute
+
+    Raises:
+        RuntimeError: if every provider failed or none answered before the deadline
+    """
+    queue = ranked_providers()
+    if not queue:
+        raise RuntimeError("No FX providers configured")
+    give_up = time.monotonic() + deadline
+    pending = {}
+    errors = []
+
+    def launch():
+        provider = queue.pop(0)
+        # Run in a copy of this context so the request keeps the caller's
+        # quota priority and trace
+        pending[_executor.submit(copy_context().run, provider.fetch, pivot)] = provider
+        return time.monotonic() + provider.hedge_delay()
+
+    hedge_at = launch()
+    while pending:
+        now = time.monotonic()
+        until = min(hedge_at, give_up) if queue else give_up
+        done, _ = wait(pending, timeout=max(0.0, until - now), return_when=FIRST_COMPLETED)
+        for future in done:
+            provider = pending.pop(future)
+            try:
+                matrix = future.result()
+            except Exception as e:
+                errors.append(f"{provider.name}: {e}")
+                continue
+            provider._count("wins")
+            return matrix
+        if time.monotonic() >= give_up:
+            break
+        if queue and (not pending or time.monotonic() >= hedge_at):
+            if pending:
+                for provider in pending.values():
+                    provider._count("hedges")
+            hedge_at = launch()
+
+    if pending:
+        errors.append(f"{', '.join(p.name for p in pending.values())}: no response within {deadline:g}s")
+    raise RuntimeError(f"All FX providers failed ({'; '.join(errors)})")
+
+
+def get_provider_stats() -> List[Dict[str, Any]]:
+    """Latency, health and win/hedge counters for every provider, in ranked order."""
+    return [provider.stats() for provider in ranked_providers()]
@@ -0,0 +1,272 @@
+import logging
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from datetime import date, timedelta
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+from urllib.parse import quote
+import numpy as np
+import pandas as pd
+from config import HISTORY_DIR
+
+try:
+    import fcntl
+except ImportError:  # Windows: writes are only serialized within one process
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# One fixed-size record per daily bar: UTC-midnight epoch seconds and value
+RECORD_DTYPE = np.dtype([("ts", "<i8"), ("value", "<f8")])
+
+# A series whose first bar is within this many days of the requested start
+# counts as covered (the start may fall on a weekend or holiday)
+HEAD_SLACK_DAYS = 7
+
+
+def _to_epoch_days(index: pd.Index) -> np.ndarray:
+    """Convert a date-like index to UTC-midnight epoch seconds."""
+    index = pd.DatetimeIndex(index)
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    return index.normalize().as_unit("s").asi8.astype(np.int64)
+
+
+class HistoryStore:
+    """
+    On-disk daily time series, one memory-mapped record file per symbol.
+
+    Files hold sorted RECORD_DTYPE records. New bars are appended; a bar for
+    the latest stored day replaces it in place (intraday updates); bars for
+    older days are dropped when they match what is stored, and otherwise
+    trigger a rewrite that merges them in. Writes hold an exclusive lock on
+    the symbol's .lock file, so processes sharing the directory (dashboard
+    and API server) never interleave. Reads slice the memory map with a
+    binary search, so they never parse or load the whole file.
+    """
+
+    def __init__(self, root: str = HISTORY_DIR):
+        self.root = root
+        self._lock = threading.Lock()
+
+    def _path(self, symbol: str) -> str:
+        return os.path.join(self.root, quote(symbol, safe="") + ".bin")
+
+    @contextmanager
+    def _write_lock(self, path: str) -> Iterator[None]:
+        """Hold this process's lock and an exclusive flock on path's lock file."""
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            # A separate lock file, because rewrites replace the data file's inode
+            with open(path + ".lock", "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _load(self, symbol: str) -> np.ndarray:
+        path = self._path(symbol)
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            return np.empty(0, dtype=RECORD_DTYPE)
+        return np.memmap(path, dtype=RECORD_DTYPE, mode="r")
+
+    def first_timestamp(self, symbol: str) -> Optional[int]:
+        """Epoch seconds of the oldest stored bar, or None if the symbol has no history."""
+        records = self._load(symbol)
+        return int(records["ts"][0]) if len(records) else None
+
+    def last_timestamp(self, symbol: str) -> Optional[int]:
+        """Epoch seconds of the newest stored bar, or None if the symbol has no history."""
+        records = self._load(symbol)
+        return int(records["ts"][-1]) if len(records) else None
+
+    def write(self, symbol: str, timestamps: np.ndarray, values: np.ndarray) -> int:
+        """
+        Store bars for a symbol.
+
+        Args:
+            symbol: Series identifier (e.g. '^N225' or 'FX:JPY')
+            timestamps: UTC-midnight epoch seconds
+            values: Bar values; NaN entries are skipped
+
+        Returns:
+            Number of bars written
+        """
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        values = np.asarray(values, dtype=np.float64)
+        keep = ~np.isnan(values)
+        if not keep.any():
+            return 0
+        new = np.empty(int(keep.sum()), dtype=RECORD_DTYPE)
+        new["ts"] = timestamps[keep]
+        new["value"] = values[keep]
+        new = new[np.argsort(new["ts"], kind="stable")]
+
+        os.makedirs(self.root, exist_ok=True)
+        path = self._path(symbol)
+        with self._write_lock(path):
+            # Loaded under the lock, so the file cannot change while it is used
+            existing = self._load(symbol)
+            last = int(existing["ts"][-1]) if len(existing) else None
+
+            if last is not None and new["ts"][0] < last:
+                # Live fetches repeat recent days; drop older bars already stored unchanged
+                older = new["ts"] < last
+                pos = np.minimum(np.searchsorted(existing["ts"], new["ts"][older]), len(existing) - 1)
+                unchanged = (existing["ts"][pos] == new["ts"][older]) & (existing["value"][pos] == new["value"][older])
+                drop = np.zeros(len(new), dtype=bool)
+                drop[np.flatnonzero(older)[unchanged]] = True
+                new = new[~drop]
+                if not len(new):
+                    return 0
+
+            if last is None or new["ts"][0] > last:
+                with open(path, "ab") as f:
+                    f.write(new.tobytes())
+            elif new["ts"][0] == last and (len(new) == 1 or new["ts"][1] > last):
+                # Replace the latest bar in place, then append anything newer
+                with open(path, "r+b") as f:
+                    f.seek((len(existing) - 1) * RECORD_DTYPE.itemsize)
+                    f.write(new.tobytes())
+            else:
+                merged = np.concatenate([np.array(existing), new])
+                # Keep the newest value for duplicate days
+                order = np.lexsort((np.arange(len(merged)), merged["ts"]))
+                merged = merged[order]
+                last_of_day = np.append(merged["ts"][1:] != merged["ts"][:-1], True)
+                merged = merged[last_of_day]
+                # Unique temporary file, so concurrent rewrites never share one
+                with tempfile.NamedTemporaryFile("wb", dir=self.root, suffix=".tmp", delete=False) as f:
+                    f.write(merged.tobytes())
+                try:
+                    os.replace(f.name, path)
+                except OSError:
+                    os.unlink(f.name)
+                    raise
+        return len(new)
+
+    def write_frame(self, frame: pd.DataFrame) -> int:
+        """
+        Store every column of a date-indexed frame as its own symbol.
+
+        Args:
+            frame: DataFrame indexed by date, one column per symbol
+
+        Returns:
+            Total number of bars written
+        """
+        if frame.empty:
+            return 0
+        timestamps = _to_epoch_days(frame.index)
+        return sum(self.write(str(symbol), timestamps, frame[symbol].to_numpy(dtype=np.float64)) for symbol in frame.columns)
+
+    def read(self, symbol: str, start: Optional[date] = None, end: Optional[date] = None) -> pd.Series:
+        """
+        Read a symbol's bars between start and end (inclusive).
+
+        Args:
+            symbol: Series identifier
+            start: First date to include (default: earliest stored)
+            end: Last date to include (default: latest stored)
+
+        Returns:
+            Float series indexed by date (empty if nothing stored)
+        """
+        records = self._load(symbol)
+        ts = records["ts"]
+        lo = np.searchsorted(ts, _date_to_epoch(start), "left") if start else 0
+        hi = np.searchsorted(ts, _date_to_epoch(end), "right") if end else len(ts)
+        chunk = records[lo:hi]
+        index = pd.to_datetime(np.asarray(chunk["ts"]), unit="s")
+        return pd.Series(np.asarray(chunk["value"]), index=index, name=symbol, dtype=np.float64)
+
+    def read_frame(self, symbols: Iterable[str], start: Optional[date] = None, end: Optional[date] = None) -> pd.DataFrame:
+        """
+        Read several symbols into one date-aligned frame.
+
+        Returns:
+            DataFrame indexed by date with one column per symbol (NaN where a
+            symbol has no bar for a date)
+        """
+        symbols = list(symbols)
+        series = [self.read(symbol, start, end) for symbol in symbols]
+        if not series:
+            return pd.DataFrame()
+        return pd.concat(series, axis=1).reindex(columns=symbols)
+
+    def backfill(
+        self,
+        symbols: List[str],
+        start: date,
+        end: date,
+        fetch: Callable[[List[str], date, date], pd.DataFrame],
+        revise_from: Optional[date] = None,
+    ) -> int:
+        """
+        Fetch and store only the date range missing from the store.
+
+        Symbols with no history, or whose history starts well after start,
+        are fetched from start; others from the day after their latest bar,
+        or from their latest bar itself when it is on or after revise_from
+        (a partial intraday bar is then replaced by its final value). A
+        single fetch covers all symbols from the earliest missing day.
+        Ranges with no weekdays are skipped.
+
+        Args:
+            symbols: Series identifiers
+            start: First date that should be present
+            end: Last date that should be present
+            fetch: Callable(symbols, start, end) returning a date-indexed frame
+            revise_from: Recent bars from this date on are fetched again (default: never)
+
+        Returns:
+            Number of bars written
+        """
+        missing_from: Dict[str, date] = {}
+        for symbol in symbols:
+            first, last = self.first_timestamp(symbol), self.last_timestamp(symbol)
+            if first is None or _epoch_to_date(first) > start + timedelta(days=HEAD_SLACK_DAYS):
+                first_needed = start
+            else:
+                last_day = _epoch_to_date(last)
+                revise = revise_from is not None and last_day >= revise_from
+                first_needed = max(start, last_day if revise else last_day + timedelta(days=1))
+            if first_needed <= end and np.busday_count(first_needed, end + timedelta(days=1)) > 0:
+                missing_from[symbol] = first_needed
+
+        if not missing_from:
+            return 0
+
+        try:
+            frame = fetch(list(missing_from), min(missing_from.values()), end)
+        except Exception as e:
+            logger.warning("History backfill failed for %s: %s", list(missing_from), e)
+            return 0
+        return self.write_frame(frame)
+
+
+def _date_to_epoch(day: date) -> int:
+    return int(pd.Timestamp(day).normalize().value // 10**9)
+
+def _epoch_to_date(epoch: int) -> date:
+    return (pd.Timestamp(epoch, unit="s")).date()
+
+_store: Optional[HistoryStore] = None
+
+def get_history_store() -> HistoryStore:
+    """Return the process-wide history store."""
+    global _store
+    if _store is None:
+        _store = HistoryStore()
+    return _store
+
+def record_frame(frame: pd.DataFrame):
+    """Write fetched bars to the shared store, logging instead of raising on failure."""
+    try:
+        get_history_store().write_frame(frame)
+    except Exception as e:
+        logger.warning("Could not record history: %s", e)
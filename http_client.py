@@ -0,0 +1,163 @@
+import random
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from config import (
+    HTTP_POOL_CONNECTIONS,
+    HTTP_POOL_MAXSIZE,
+    HTTP_MAX_RETRIES,
+    HTTP_BACKOFF_BASE,
+    HTTP_BACKOFF_MAX,
+    HTTP_RETRY_BUDGET_RATIO,
+    HTTP_RETRY_BUDGET_MIN,
+    HTTP_PER_HOST_CONCURRENCY,
+)
+import tracing
+
+# Status codes worth retrying; everything else is returned to the caller
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class RetryBudget:
+    """
+    Caps retries to a fraction of recent traffic.
+
+    Every request deposits `ratio` tokens and every retry withdraws one, so
+    during an outage retries stay bounded instead of multiplying load.
+    A small reserve allows retries while traffic is low.
+    """
+
+    def __init__(self, ratio: float = 0.2, minimum: float = 10.0):
+        self.ratio = ratio
+        self.minimum = minimum
+        self._tokens = minimum
+        self._lock = threading.Lock()
+
+    def record_request(self):
+        with self._lock:
+            self._tokens = min(self._tokens + self.ratio, self.minimum * 10)
+
+    def try_spend(self) -> bool:
+        with self._lock:
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+    @property
+    def remaining(self) -> float:
+        return self._tokens
+
+
+class HTTPClient:
+    """
+    Shared HTTP client with keep-alive connection pooling, bounded retries
+    with exponential backoff, and a per-host concurrency limit.
+    """
+
+    def __init__(self):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=HTTP_POOL_CONNECTIONS, pool_maxsize=HTTP_POOL_MAXSIZE, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.retry_budget = RetryBudget(HTTP_RETRY_BUDGET_RATIO, HTTP_RETRY_BUDGET_MIN)
+        self._host_limits: Dict[str, threading.BoundedSemaphore] = defaultdict(
+            lambda: threading.BoundedSemaphore(HTTP_PER_HOST_CONCURRENCY)
+        )
+        self._host_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {"requests": 0, "retries": 0, "retries_denied": 0, "failures": 0}
+
+    def _count(self, *keys: str):
+        # Requests run on many threads at once; += on a dict entry is not atomic
+        with self._stats_lock:
+            for key in keys:
+                self._stats[key] += 1
+
+    def _host_limit(self, url: str) -> threading.BoundedSemaphore:
+        host = urlsplit(url).netloc
+        with self._host_lock:
+            return self._host_limits[host]
+
+    def request(self, method: str, url: str, **kwargs: Any) -> requests.Response:
+        """
+        Send a request through the shared session.
+
+        Connection errors, timeouts and retryable statuses are retried up to
+        HTTP_MAX_RETRIES times while the retry budget allows it.
+
+        Args:
+            method: HTTP method
+            url: Request URL
+            **kwargs: Passed to requests.Session.request (params, timeout, ...)
+
+        Returns:
+            The final response (raises the last exception if no response was received)
+        """
+        kwargs.setdefault("timeout", 10)
+        with tracing.span("http.request", **{"http.method": method, "server.address": urlsplit(url).netloc}) as span:
+            response = self._request_with_retries(method, url, span, **kwargs)
+            span.set(**{"http.status_code": response.status_code})
+            return response
+
+    def _request_with_retries(self, method: str, url: str, span: Any, **kwargs: Any) -> requests.Response:
+        self.retry_budget.record_request()
+        attempt = 0
+        while True:
+            self._count("requests")
+            try:
+                with self._host_limit(url):
+                    response = self.session.request(method, url, **kwargs)
+                if response.status_code not in RETRY_STATUSES:
+                    return response
+                error: Optional[Exception] = None
+            except (requests.ConnectionError, requests.Timeout) as e:
+                response = None
+                error = e
+
+            if attempt >= HTTP_MAX_RETRIES or not self.retry_budget.try_spend():
+                if attempt < HTTP_MAX_RETRIES:
+                    self._count("retries_denied")
+                self._count("failures")
+                if response is not None:
+                    return response
+                raise error
+
+            self._count("retries")
+            span.set(retries=attempt + 1)
+            backoff = min(HTTP_BACKOFF_MAX, HTTP_BACKOFF_BASE * 2 ** attempt)
+            time.sleep(backoff * random.uniform(0.5, 1.0))
+            attempt += 1
+
+    def get(self, url: str, **kwargs: Any) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["retry_budget"] = round(self.retry_budget.remaining, 2)
+        return stats
+
+
+_client: Optional[HTTPClient] = None
+_client_lock = threading.Lock()
+
+def get_client() -> HTTPClient:
+    """Return the process-wide HTTP client."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = HTTPClient()
+        return _client
+
+def get(url: str, **kwargs: Any) -> requests.Response:
+    """GET through the shared client (see HTTPClient.request)."""
+    return get_client().get(url, **kwargs)
+
+def get_session() -> requests.Session:
+    """Return the pooled session for libraries that accept one (e.g. yfinance)."""
+    return get_client().session
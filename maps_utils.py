@@ -1,7 +1,12 @@
-from typing import Dict, Tuple
-import folium
-import streamlit as st
-from streamlit_folium import st_folium
+from functools import lru_cache
+from typing import Dict, List, Tuple, TYPE_CHECKING
+from config import MAP_CACHE_MAX_ENTRIES
+from registry import get_registry
+import tracing
+
+# folium is imported on first use to keep app startup fast
+if TYPE_CHECKING:
+    import folium
 
 def get_exchange_location(country: str) -> Tuple[float, float]:
     """
@@ -13,18 +18,10 @@ def get_exchange_location(country: str) -> Tuple[float, float]:
     Returns:
         Tuple of (latitude, longitude)
     """
-    locations = {
-        "Japan": (35.6762, 139.7674),
-        "India": (19.0760, 72.5762),
-        "United States": (40.7074, -74.0113),
-        "South Korea": (37.5665, 126.9780),
-        "China": (31.2304, 121.4737),
-        "United Kingdom": (51.5128, -0.0843),
-    }
-    
-    return locations.get(country, (0, 0))
+    exchange = get_registry().primary_exchange(country)
+    return (exchange["lat"], exchange["lng"]) if exchange is not None else (0, 0)
 
-def create_map(country: str, exchange_name: str, latitude: float, longitude: float) -> folium.Map:
+def create_map(country: str, exchange_name: str, latitude: float, longitude: float, zoom: int = 13) -> "folium.Map":
     """
     Create an interactive map showing the stock exchange location.
     
@@ -33,14 +30,17 @@ def create_map(country: str, exchange_name: str, latitude: float, longitude: flo
         exchange_name: Name of the stock exchange
         latitude: Latitude of the exchange
         longitude: Longitude of the exchange
+        zoom: Initial zoom level
         
     Returns:
         Folium map object
     """
+    import folium
+
     # Create map centered on the exchange
     map_obj = folium.Map(
         location=[latitude, longitude],
-        zoom_start=13,
+        zoom_start=zoom,
         tiles="OpenStreetMap"
     )
     
@@ -54,21 +54,96 @@ def create_map(country: str, exchange_name: str, latitude: float, longitude: flo
     
     return map_obj
 
-def display_map(country: str, latitude: float, longitude: float):
+def create_world_map(countries: Tuple[str, ...]) -> "folium.Map":
+    """
+    Create one map with a marker for each country's stock exchange.
+    
+    Args:
+        countries: Country names
+        
+    Returns:
+        Folium map object zoomed to fit all markers
+    """
+    import folium
+    from config import COUNTRY_CONFIG
+
+    map_obj = folium.Map(location=[20, 0], zoom_start=2, tiles="OpenStreetMap")
+    points = []
+    for country in countries:
+        latitude, longitude = get_exchange_location(country)
+        exchange_name = COUNTRY_CONFIG.get(country, {}).get("stock_exchange", "Stock Exchange")
+        folium.Marker(
+            location=[latitude, longitude],
+            popup=f"{exchange_name}\n{country}",
+            tooltip=f"{country}: {exchange_name}",
+            icon=folium.Icon(color="blue", icon="info-sign")
+        ).add_to(map_obj)
+        points.append([latitude, longitude])
+    
+    if len(points) > 1:
+        map_obj.fit_bounds(points, padding=(30, 30))
+    elif points:
+        map_obj.location = points[0]
+        map_obj.options["zoom"] = 5
+    
+    return map_obj
+
+@lru_cache(maxsize=MAP_CACHE_MAX_ENTRIES)
+@tracing.traced("map.render")
+def render_map_html(country: str, exchange_name: str, latitude: float, longitude: float, zoom: int = 13) -> str:
+    """
+    Render a single-exchange map to standalone HTML, cached per process.
+    
+    Returns:
+        HTML document for the map
+    """
+    return create_map(country, exchange_name, latitude, longitude, zoom).get_root().render()
+
+@lru_cache(maxsize=MAP_CACHE_MAX_ENTRIES)
+@tracing.traced("map.render_world")
+def render_world_map_html(countries: Tuple[str, ...]) -> str:
+    """
+    Render the combined exchange map to standalone HTML, cached per process.
+    
+    Args:
+        countries: Country names (order-insensitive callers should sort them)
+        
+    Returns:
+        HTML document for the map
+    """
+    return create_world_map(countries).get_root().render()
+
+@tracing.traced("map.display")
+def display_map(country: str, latitude: float, longitude: float, zoom: int = 13):
     """
     Display map in Streamlit.
     
+    The map is rendered to HTML once and reused on every rerun.
+    
     Args:
         country: Country name
         latitude: Latitude of the exchange
         longitude: Longitude of the exchange
+        zoom: Initial zoom level
     """
     from config import COUNTRY_CONFIG
+    import streamlit.components.v1 as components
     
     exchange_name = COUNTRY_CONFIG.get(country, {}).get("stock_exchange", "Stock Exchange")
     
-    m = create_map(country, exchange_name, latitude, longitude)
-    st_folium(m, width=700, height=500)
+    components.html(render_map_html(country, exchange_name, latitude, longitude, zoom), width=700, height=500)
+
+@tracing.traced("map.display_world")
+def display_world_map(countries: List[str]):
+    """
+    Display all selected exchanges on a single map in Streamlit.
+    
+    Args:
+        countries: Country names
+    """
+    import streamlit.components.v1 as components
+    
+    components.html(render_world_map_html(tuple(sorted(countries))), height=500)
 
 def format_location(country: str, latitude: float, longitude: float) -> str:
     """
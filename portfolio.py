@@ -0,0 +1,228 @@
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Union
+import numpy as np
+import pandas as pd
+from config import PORTFOLIO_CHUNK_ROWS
+from currency_utils import get_cross_rate_matrix
+from fx_matrix import CrossRateMatrix
+import tracing
+
+AMOUNT_COLUMN = "amount"
+CURRENCY_COLUMN = "currency"
+
+
+def rate_vector(currencies: Sequence[str], target: str, matrix: Optional[CrossRateMatrix] = None) -> np.ndarray:
+    """
+    Units of target per 1 unit of each currency, from one matrix snapshot.
+
+    Args:
+        currencies: Currency codes (case-insensitive)
+        target: Target currency code
+        matrix: Cross-rate matrix to use (defaults to the cached one)
+
+    Returns:
+        float64 array aligned with currencies (NaN for unknown codes)
+    """
+    matrix = matrix or get_cross_rate_matrix()
+    if target.upper() not in matrix:
+        raise ValueError(f"Unknown target currency {target}")
+    rows = np.array([matrix.index.get(str(code).upper(), -1) for code in currencies], dtype=np.intp)
+    rates = matrix.matrix[np.maximum(rows, 0), matrix.index[target.upper()]]
+    rates[rows < 0] = np.nan
+    return rates
+
+
+def _codes(currencies: Any):
+    """Integer codes and unique values for a currency column (reusing categorical codes)."""
+    if isinstance(currencies, pd.Series) and isinstance(currencies.dtype, pd.CategoricalDtype):
+        currencies = currencies.array
+    if isinstance(currencies, pd.Categorical):
+        return np.asarray(currencies.codes, dtype=np.intp), list(currencies.categories)
+    # Series are factorized as-is: converting string columns to object arrays first is several times slower
+    if not isinstance(currencies, (pd.Series, pd.Index)):
+        currencies = np.asarray(currencies)
+    codes, uniques = pd.factorize(currencies, use_na_sentinel=True)
+    return np.asarray(codes, dtype=np.intp), list(uniques)
+
+
+def convert_amounts(
+    amounts: Any,
+    currencies: Any,
+    target: str,
+    matrix: Optional[CrossRateMatrix] = None,
+) -> np.ndarray:
+    """
+    Convert many (amount, currency) positions to one currency in a single vectorized pass.
+
+    The currency column is reduced to integer codes once (free for
+    categoricals), rates are looked up per distinct currency, and every
+    amount is converted with one gather and multiply.
+
+    Args:
+        amounts: Position amounts (array-like of numbers)
+        currencies: Currency code per position (array-like of str or a Categorical)
+        target: Currency to convert to
+        matrix: Cross-rate matrix to use (defaults to the cached one)
+
+    Returns:
+        float64 array of converted amounts (NaN for unknown or missing currencies)
+    """
+    codes, uniques = _codes(currencies)
+    # A trailing NaN makes the -1 code of missing values convert to NaN
+    rates = np.append(rate_vector(uniques, target, matrix), np.nan)
+    return np.asarray(amounts, dtype=np.float64) * rates[codes]
+
+
+def _read_chunks(path: str, columns: List[str], currency_column: str, chunk_rows: int) -> Iterator[pd.DataFrame]:
+    """Read a CSV or Parquet file in chunks, with the currency column as a categorical."""
+    if path.lower().endswith((".parquet", ".pq")):
+        try:
+            import pyarrow.compute as pc
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Reading Parquet files requires pyarrow (pip install pyarrow)")
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows, columns=columns):
+            # Dictionary-encoded strings arrive in pandas as a categorical
+            batch = batch.set_column(
+                batch.schema.get_field_index(currency_column), currency_column,
+                pc.dictionary_encode(batch.column(currency_column)),
+            )
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, usecols=columns, dtype={currency_column: "category"}, chunksize=chunk_rows)
+
+
+def iter_converted(
+    path: str,
+    target: str,
+    amount_column: str = AMOUNT_COLUMN,
+    currency_column: str = CURRENCY_COLUMN,
+    chunk_rows: int = PORTFOLIO_CHUNK_ROWS,
+) -> Iterator[pd.DataFrame]:
+    """
+    Stream a position file in chunks, adding the converted value to each.
+
+    Files larger than memory are processed chunk by chunk; every chunk is
+    converted with the same rate snapshot.
+
+    Args:
+        path: CSV or Parquet file (Parquet requires pyarrow)
+        target: Currency to convert to
+        amount_column: Column holding amounts
+        currency_column: Column holding currency codes
+        chunk_rows: Rows per chunk
+
+    Yields:
+        DataFrames with the amount and currency columns plus value_<target>
+    """
+    matrix = get_cross_rate_matrix()
+    value_column = f"value_{target.upper()}"
+    for chunk in _read_chunks(path, [amount_column, currency_column], currency_column, chunk_rows):
+        chunk[value_column] = convert_amounts(chunk[amount_column], chunk[currency_column], target, matrix)
+        yield chunk
+
+
+@tracing.traced("portfolio.value")
+def value_portfolio(
+    positions: Union[str, pd.DataFrame],
+    target: str,
+    amount_column: str = AMOUNT_COLUMN,
+    currency_column: str = CURRENCY_COLUMN,
+    chunk_rows: int = PORTFOLIO_CHUNK_ROWS,
+) -> Dict[str, Any]:
+    """
+    Value a portfolio in one currency.
+
+    Args:
+        positions: DataFrame of positions, or path to a CSV/Parquet file (streamed in chunks)
+        target: Currency to value the portfolio in
+        amount_column: Column holding amounts
+        currency_column: Column holding currency codes
+        chunk_rows: Rows per chunk when reading a file
+
+    Returns:
+        Dictionary with the total value, row counts, per-currency amount and
+        value (None for currencies without a rate), and the rate snapshot
+        time, or {"error": ...}
+    """
+    try:
+        matrix = get_cross_rate_matrix()
+        if isinstance(positions, pd.DataFrame):
+            chunks = [positions]
+        else:
+            chunks = _read_chunks(positions, [amount_column, currency_column], currency_column, chunk_rows)
+
+        by_currency: Dict[str, np.ndarray] = {}
+        priced = set()
+        rows = unconverted = 0
+        for chunk in chunks:
+            codes, uniques = _codes(chunk[currency_column])
+            amounts = chunk[amount_column].to_numpy(dtype=np.float64)
+            rates = np.append(rate_vector(uniques, target, matrix), np.nan)
+            priced.update(str(code).upper() for code, rate in zip(uniques, rates) if rate == rate)
+            values = amounts * rates[codes]
+            # Per-currency sums for the chunk in one pass each (bucket 0 collects missing currencies)
+            amount_sums = np.bincount(codes + 1, weights=np.nan_to_num(amounts), minlength=len(uniques) + 1)[1:]
+            value_sums = np.bincount(codes + 1, weights=np.nan_to_num(values), minlength=len(uniques) + 1)[1:]
+            for code, amount, value in zip(uniques, amount_sums, value_sums):
+                totals = by_currency.setdefault(str(code).upper(), np.zeros(2))
+                totals += amount, value
+            rows += len(chunk)
+            unconverted += int(np.isnan(values).sum())
+
+        return {
+            "target": target.upper(),
+            "total": round(float(sum(totals[1] for totals in by_currency.values())), 2),
+            "rows": rows,
+            "unconverted_rows": unconverted,
+            "by_currency": {
+                code: {"amount": round(float(amount), 2), "value": round(float(value), 2) if code in priced else None}
+                for code, (amount, value) in sorted(by_currency.items())
+            },
+            "rates_timestamp": matrix.timestamp,
+        }
+    except Exception as e:
+        return {"error": str(e)}
+
+
+def write_converted(
+    source: str,
+    destination: str,
+    target: str,
+    amount_column: str = AMOUNT_COLUMN,
+    currency_column: str = CURRENCY_COLUMN,
+    chunk_rows: int = PORTFOLIO_CHUNK_ROWS,
+) -> int:
+    """
+    Convert a position file chunk by chunk into a new CSV or Parquet file.
+
+    Args:
+        source: Input CSV or Parquet file
+        destination: Output path; .parquet/.pq writes Parquet (requires pyarrow), anything else CSV
+        target: Currency to convert to
+        amount_column: Column holding amounts
+        currency_column: Column holding currency codes
+        chunk_rows: Rows per chunk
+
+    Returns:
+        Number of rows written
+    """
+    rows = 0
+    writer = None
+    parquet = destination.lower().endswith((".parquet", ".pq"))
+    try:
+        for chunk in iter_converted(source, target, amount_column, currency_column, chunk_rows):
+            chunk[currency_column] = chunk[currency_column].astype(str)
+            if parquet:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                writer = writer or pq.ParquetWriter(destination, table.schema)
+                writer.write_table(table)
+            else:
+                chunk.to_csv(destination, mode="a" if rows else "w", header=not rows, index=False)
+            rows += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
@@ -0,0 +1,354 @@
+import heapq
+import logging
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+from config import (
+    COUNTRY_CONFIG,
+    PREFETCH_RATES_INTERVAL,
+    PREFETCH_INDICES_INTERVAL,
+    PREFETCH_CLOSED_MARKET_INTERVAL,
+    PREFETCH_JITTER,
+    PREFETCH_MAX_BACKOFF,
+    SNAPSHOT_MAX_AGE_SECONDS,
+    SNAPSHOT_REFRESH_SLACK,
+    LIVE_INDICES_INTERVAL,
+)
+from cache import TTLCache
+from currency_utils import get_comparison_rates
+from stock_utils import get_stock_indices, is_market_open
+from snapshots import RateSnapshot, QuoteSnapshot
+import rate_limiter
+import tracing
+
+logger = logging.getLogger(__name__)
+
+RATES_KEY = "rates"
+INDICES_KEY = "indices"
+
+# Latest job results, shared between worker processes when a CACHE_BACKEND is
+# configured so each refresh reaches the upstream once for the whole fleet
+_job_results = TTLCache(max_entries=1024, name="prefetch", shared=True)
+
+# Indices fetched for live views when no snapshot exists, one fetch per
+# LIVE_INDICES_INTERVAL however many sessions are polling
+_live_indices = TTLCache(max_entries=256, default_ttl=LIVE_INDICES_INTERVAL, name="live_indices", shared=True)
+
+
+class Snapshot:
+    """A published value, when it was fetched and how old it may get before it is ignored."""
+
+    __slots__ = ("value", "fetched_at", "max_age")
+
+    def __init__(self, value: Any, fetched_at: float, max_age: float = SNAPSHOT_MAX_AGE_SECONDS):
+        self.value = value
+        self.fetched_at = fetched_at
+        self.max_age = max_age
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.fetched_at
+
+
+class SnapshotStore:
+    """Thread-safe map of the latest successfully fetched values."""
+
+    def __init__(self):
+        self._snapshots: Dict[Hashable, Snapshot] = {}
+        self._lock = threading.Lock()
+
+    def publish(
+        self,
+        key: Hashable,
+        value: Any,
+        fetched_at: Optional[float] = None,
+        max_age: float = SNAPSHOT_MAX_AGE_SECONDS,
+    ):
+        with self._lock:
+            self._snapshots[key] = Snapshot(value, time.time() if fetched_at is None else fetched_at, max_age)
+
+    def get(self, key: Hashable, max_age: Optional[float] = None) -> Optional[Snapshot]:
+        """
+        Return the snapshot for key, or None if missing or too old.
+
+        Args:
+            key: Snapshot key
+            max_age: Oldest acceptable age in seconds (defaults to the snapshot's own max_age)
+        """
+        with self._lock:
+            snapshot = self._snapshots.get(key)
+        if snapshot is None or snapshot.age > (snapshot.max_age if max_age is None else max_age):
+            return None
+        return snapshot
+
+    def items(self) -> List:
+        with self._lock:
+            return list(self._snapshots.items())
+
+
+class _Job:
+    """A periodic fetch with its own schedule and failure count."""
+
+    __slots__ = ("key", "fetch", "interval", "next_run", "failures", "last_error")
+
+    def __init__(self, key: str, fetch: Callable[[], Any], interval: Callable[[], float]):
+        self.key = key
+        self.fetch = fetch
+        self.interval = interval
+        self.next_run = 0.0
+        self.failures = 0
+        self.last_error = ""
+
+
+class PrefetchScheduler:
+    """
+    Daemon thread that refreshes hot data outside the request path.
+
+    Each job runs on its own interval with random jitter so refreshes do not
+    line up; failed jobs back off exponentially up to PREFETCH_MAX_BACKOFF.
+    With a shared CACHE_BACKEND, a job whose result another worker process
+    fetched since this one last ran publishes that result instead of fetching.
+    """
+
+    def __init__(self, store: Optional[SnapshotStore] = None):
+        self.store = store or SnapshotStore()
+        self._jobs: Dict[str, _Job] = {}
+        self._queue: List = []
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def add_job(self, key: str, fetch: Callable[[], Any], interval: Callable[[], float]):
+        """
+        Register a periodic fetch.
+
+        Args:
+            key: Snapshot key the result is published under
+            fetch: Callable returning the value; raise (or return a dict with
+                an "error" key) to signal failure
+            interval: Callable returning the refresh interval in seconds
+        """
+        job = _Job(key, fetch, interval)
+        with self._lock:
+            if key in self._jobs:
+                # Replace the job rather than scheduling the key twice
+                self._queue = [item for item in self._queue if item[1] != key]
+                heapq.heapify(self._queue)
+            self._jobs[key] = job
+            heapq.heappush(self._queue, (job.next_run, key))
+        self._wakeup.set()
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name="prefetch", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._wakeup.set()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            with self._lock:
+                next_run, key = self._queue[0] if self._queue else (time.time() + 60, None)
+            delay = next_run - time.time()
+            if delay > 0:
+                self._wakeup.wait(delay)
+                self._wakeup.clear()
+                continue
+
+            with self._lock:
+                heapq.heappop(self._queue)
+                job = self._jobs[key]
+            self._run_job(job)
+            with self._lock:
+                # A job replaced while it ran is already queued under its key
+                if self._jobs.get(key) is job:
+                    heapq.heappush(self._queue, (job.next_run, key))
+
+    def _run_job(self, job: _Job):
+        try:
+            with tracing.span("prefetch.job", key=job.key), rate_limiter.background_priority():
+                # Results stay fresh until just before the earliest jittered next run,
+                # so a process only reuses a result another process fetched meanwhile
+                value = _job_results.get_or_load(
+                    job.key,
+                    job.fetch,
+                    ttl_for=lambda v: 0 if isinstance(v, dict) and "error" in v else job.interval() * (1 - PREFETCH_JITTER),
+                )
+            if isinstance(value, dict) and "error" in value:
+                raise RuntimeError(value["error"])
+            entry = _job_results.peek(job.key)
+            delay = job.interval()
+            # Valid until the latest the next refresh can land, so long intervals
+            # (closed markets) do not leave callers without a snapshot
+            max_age = max(SNAPSHOT_MAX_AGE_SECONDS, delay * (1 + PREFETCH_JITTER) + SNAPSHOT_REFRESH_SLACK)
+            self.store.publish(job.key, value, entry.stored_at if entry is not None else None, max_age)
+            job.failures = 0
+            job.last_error = ""
+        except Exception as e:
+            job.failures += 1
+            job.last_error = str(e)
+            delay = min(PREFETCH_MAX_BACKOFF, job.interval() * 2 ** (job.failures - 1))
+            logger.warning("Prefetch %s failed (%d in a row): %s", job.key, job.failures, e)
+        job.next_run = time.time() + delay * (1 + random.uniform(-PREFETCH_JITTER, PREFETCH_JITTER))
+
+    def status(self) -> List[Dict[str, Any]]:
+        """
+        Describe every job's snapshot freshness and schedule.
+
+        Returns:
+            List of dicts with key, age_seconds, failures, last_error and next_run_in
+        """
+        now = time.time()
+        rows = []
+        with self._lock:
+            jobs = list(self._jobs.values())
+        for job in jobs:
+            snapshot = self.store.get(job.key, max_age=float("inf"))
+            rows.append({
+                "key": job.key,
+                "age_seconds": round(now - snapshot.fetched_at, 1) if snapshot else None,
+                "failures": job.failures,
+                "last_error": job.last_error,
+                "next_run_in": round(max(0.0, job.next_run - now), 1),
+            })
+        return rows
+
+
+def _fetch_rates(codes: List[str]) -> Dict[str, Any]:
+    rates = get_comparison_rates(codes)
+    # Last-good rates served while the quota is spent are not a fresh snapshot
+    if any(isinstance(r, RateSnapshot) and r.stale for r in rates.values()):
+        return {"error": "Exchange rates unavailable (serving stale rates)"}
+    return rates
+
+def _fetch_indices(previous: Optional[Snapshot]) -> Dict[str, Any]:
+    """
+    Refresh the indices of every due market in one batched Yahoo request.
+
+    Open markets are due on every run, closed ones once their quotes are
+    PREFETCH_CLOSED_MARKET_INTERVAL old (so closing values still land);
+    markets that are not due keep their previous quotes.
+
+    Returns:
+        {"quotes": {country: QuoteSnapshot}, "fetched_at": {country: epoch}}, or {"error": ...}
+    """
+    now = time.time()
+    quotes = dict(previous.value["quotes"]) if previous else {}
+    fetched_at = dict(previous.value["fetched_at"]) if previous else {}
+    due = [
+        country for country, config in COUNTRY_CONFIG.items()
+        if is_market_open(config) or now - fetched_at.get(country, 0.0) >= PREFETCH_CLOSED_MARKET_INTERVAL
+    ]
+    symbols = list(dict.fromkeys(symbol for country in due for symbol in COUNTRY_CONFIG[country]["major_indices"]))
+    if symbols:
+        indices = get_stock_indices(symbols)
+        if not isinstance(indices, QuoteSnapshot):
+            return indices if "error" in indices else {"error": "No index data"}
+        if not indices.is_live:
+            return {"error": "No live index data"}
+        for country in due:
+            snapshot = indices.select(COUNTRY_CONFIG[country]["major_indices"])
+            # Last known quotes served during an outage must not overwrite a fresher snapshot
+            if snapshot.is_live:
+                quotes[country] = snapshot
+                fetched_at[country] = now
+            elif country not in quotes:
+                quotes[country] = snapshot
+    return {"quotes": quotes, "fetched_at": fetched_at}
+
+def _indices_interval() -> float:
+    if any(is_market_open(config) for config in COUNTRY_CONFIG.values()):
+        return PREFETCH_INDICES_INTERVAL
+    return PREFETCH_CLOSED_MARKET_INTERVAL
+
+def build_scheduler() -> PrefetchScheduler:
+    """
+    Create a scheduler covering every COUNTRY_CONFIG currency and index.
+
+    Returns:
+        Unstarted PrefetchScheduler
+    """
+    scheduler = PrefetchScheduler()
+    codes = list(dict.fromkeys(config["code"] for config in COUNTRY_CONFIG.values()))
+    scheduler.add_job(RATES_KEY, lambda: _fetch_rates(codes), lambda: PREFETCH_RATES_INTERVAL)
+    # One job and one Yahoo request for all markets, however many countries are configured
+    scheduler.add_job(
+        INDICES_KEY,
+        lambda: _fetch_indices(scheduler.store.get(INDICES_KEY, max_age=float("inf"))),
+        _indices_interval,
+    )
+    return scheduler
+
+_scheduler: Optional[PrefetchScheduler] = None
+_scheduler_lock = threading.Lock()
+
+def start_prefetcher() -> PrefetchScheduler:
+    """Start the process-wide prefetch scheduler (idempotent)."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = build_scheduler()
+        _scheduler.start()
+        return _scheduler
+
+def get_prefetcher() -> Optional[PrefetchScheduler]:
+    """Return the running scheduler, or None if prefetching is not started."""
+    return _scheduler
+
+def get_snapshot(key: str, max_age: Optional[float] = None) -> Optional[Snapshot]:
+    """
+    Read a prefetched snapshot without touching the network.
+
+    Args:
+        key: RATES_KEY or INDICES_KEY
+        max_age: Ignore snapshots older than this many seconds (defaults to
+            the snapshot's own limit: its job's interval plus jitter and slack,
+            and at least SNAPSHOT_MAX_AGE_SECONDS)
+
+    Returns:
+        Snapshot or None if prefetching is off or the snapshot is missing/too old
+    """
+    if _scheduler is None:
+        return None
+    return _scheduler.store.get(key, max_age=max_age)
+
+def get_prefetched_rates(code: str) -> Optional[Dict[str, Any]]:
+    """Return prefetched rates for a currency code, or None."""
+    snapshot = get_snapshot(RATES_KEY)
+    if snapshot is None:
+        return None
+    rates = snapshot.value.get(code)
+    return rates if rates and "error" not in rates else None
+
+def get_prefetched_indices(country: str) -> Optional[Dict[str, Any]]:
+    """Return prefetched indices for a country, or None."""
+    snapshot = get_snapshot(INDICES_KEY)
+    return snapshot.value["quotes"].get(country) if snapshot else None
+
+def get_live_indices(country: str) -> Tuple[Dict[str, Any], Optional[float]]:
+    """
+    Indices for views that refresh on a timer, without fetching per session.
+
+    The last published snapshot is served even when it is past its max age
+    (flagged by its age); only when no snapshot exists yet is Yahoo read,
+    through a cache shared by every session.
+
+    Returns:
+        Tuple of (indices, age) where age is None for a current snapshot or
+        cached fetch, and the snapshot's age in seconds when it is stale
+    """
+    snapshot = _scheduler.store.get(INDICES_KEY, max_age=float("inf")) if _scheduler else None
+    if snapshot is not None and country in snapshot.value["quotes"]:
+        return snapshot.value["quotes"][country], (None if snapshot.age <= snapshot.max_age else snapshot.age)
+    symbols = COUNTRY_CONFIG[country]["major_indices"]
+    indices = _live_indices.get_or_load(
+        country,
+        lambda: get_stock_indices(symbols),
+        ttl_for=lambda result: 0 if "error" in result else LIVE_INDICES_INTERVAL,
+    )
+    return indices, None
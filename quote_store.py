@@ -0,0 +1,104 @@
+import json
+import logging
+import os
+import tempfile
+import threading
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from config import QUOTE_STORE_PATH
+
+logger = logging.getLogger(__name__)
+
+
+class LastQuoteStore:
+    """
+    Last real quote per symbol, persisted to a small JSON file.
+
+    Every live quote is saved with the time it was fetched, so that during
+    an upstream outage (or after a restart) the last real value can be
+    served with its true age instead of made-up data. The file is replaced
+    atomically whenever a save brings a new value or change for a symbol;
+    fetch times alone only update the copy in memory.
+    """
+
+    def __init__(self, path: str = QUOTE_STORE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._quotes: Optional[Dict[str, List[float]]] = None
+
+    def _load(self) -> Dict[str, List[float]]:
+        if self._quotes is None:
+            try:
+                with open(self.path) as f:
+                    self._quotes = json.load(f)
+            except FileNotFoundError:
+                self._quotes = {}
+            except Exception as e:
+                logger.warning("Could not read last quotes from %s: %s", self.path, e)
+                self._quotes = {}
+        return self._quotes
+
+    def save(self, symbols: List[str], values: np.ndarray, updated: np.ndarray):
+        """
+        Record live quotes, skipping symbols without data.
+
+        Args:
+            symbols: Index symbols
+            values: (n, 2) array of current value and change percent
+            updated: Epoch seconds of each quote
+        """
+        with self._lock:
+            quotes = self._load()
+            changed = False
+            for symbol, (current, change), ts in zip(symbols, values, updated):
+                if current != current:
+                    continue
+                previous = quotes.get(symbol)
+                quote = [float(current), float(change), int(ts)]
+                if previous is None or previous[:2] != quote[:2]:
+                    changed = True
+                quotes[symbol] = quote
+            if not changed:
+                return
+            try:
+                directory = os.path.dirname(self.path) or "."
+                os.makedirs(directory, exist_ok=True)
+                # Unique temporary file, so processes sharing the path never write to the same one
+                with tempfile.NamedTemporaryFile("w", dir=directory, suffix=".tmp", delete=False) as f:
+                    json.dump(quotes, f)
+                try:
+                    os.replace(f.name, self.path)
+                except OSError:
+                    os.unlink(f.name)
+                    raise
+            except Exception as e:
+                logger.warning("Could not save last quotes to %s: %s", self.path, e)
+
+    def lookup(self, symbols: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Get the last known quotes for symbols.
+
+        Returns:
+            Tuple of an (n, 2) array of current value and change percent
+            (NaN for symbols never seen) and their epoch seconds (0 if unknown)
+        """
+        with self._lock:
+            quotes = self._load()
+            values = np.full((len(symbols), 2), np.nan)
+            updated = np.zeros(len(symbols), dtype=np.int64)
+            for i, symbol in enumerate(symbols):
+                if symbol in quotes:
+                    current, change, ts = quotes[symbol]
+                    values[i] = current, change
+                    updated[i] = ts
+            return values, updated
+
+
+_store: Optional[LastQuoteStore] = None
+
+def get_quote_store() -> LastQuoteStore:
+    """Return the process-wide last quote store."""
+    global _store
+    if _store is None:
+        _store = LastQuoteStore()
+    return _store
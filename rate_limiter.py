@@ -0,0 +1,261 @@
+import copy
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+from cache_backend import get_backend
+from config import (
+    EXCHANGE_RATE_API_QUOTA,
+    EXCHANGE_RATE_API_QUOTA_WINDOW,
+    EXCHANGE_RATE_API_BURST,
+    CURRENCY_API_QUOTA,
+    CURRENCY_API_QUOTA_WINDOW,
+    CURRENCY_API_BURST,
+    GEMINI_QUOTA,
+    GEMINI_QUOTA_WINDOW,
+    GEMINI_BURST,
+    RATE_LIMIT_BACKGROUND_RESERVE,
+    RATE_LIMIT_MAX_WAIT,
+)
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+
+EXCHANGE_RATE_API = "exchangerate-api"
+CURRENCY_API = "currencyapi"
+GEMINI = "gemini"
+
+_priority: ContextVar[str] = ContextVar("request_priority", default=INTERACTIVE)
+
+
+class QuotaExceeded(Exception):
+    """Raised when a provider's request budget is spent."""
+
+    def __init__(self, provider: str, retry_after: float):
+        super().__init__(f"{provider} request quota exhausted; next request allowed in {retry_after:.0f}s")
+        self.provider = provider
+        self.retry_after = retry_after
+
+
+class _Bucket:
+    """Tokens left, when they were last refilled (wall clock) and the log of granted requests."""
+
+    __slots__ = ("tokens", "updated", "granted")
+
+    def __init__(self, tokens: float, updated: float):
+        self.tokens = tokens
+        self.updated = updated
+        self.granted = deque()
+
+    def __getstate__(self):
+        return self.tokens, self.updated, self.granted
+
+    def __setstate__(self, state):
+        self.tokens, self.updated, self.granted = state
+
+
+class QuotaLimiter:
+    """
+    Token bucket bounded by a provider's quota window.
+
+    Tokens refill continuously at quota / window per second up to burst, and
+    a sliding log of granted requests enforces the hard quota for the window.
+    Background requests never wait and may not dip into the last
+    background_reserve fraction of the bucket, which is kept for
+    interactive requests; interactive requests wait up to max_wait for a
+    token when one is due soon.
+
+    With shared=True and a shared cache backend configured (CACHE_BACKEND),
+    the bucket lives in the backend and every replica spends from the same
+    quota; if the backend fails, this process falls back to its own bucket.
+    Grant/deny counters are always per process.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        quota: int,
+        window: float,
+        burst: Optional[int] = None,
+        background_reserve: float = 0.2,
+        max_wait: float = 2.0,
+        shared: bool = False,
+    ):
+        self.name = name
+        self.quota = quota
+        self.window = window
+        self.capacity = float(max(1, min(burst or quota, quota)))
+        self.refill_rate = quota / window
+        self.background_reserve = background_reserve
+        self.max_wait = max_wait
+        self.shared = shared
+        # Wall-clock times, so buckets kept in a shared backend mean the same to every process
+        self._bucket = _Bucket(self.capacity, time.time())
+        self._lock = threading.Lock()
+        self._stats = {"granted": 0, "denied": 0, "granted_background": 0, "denied_background": 0}
+
+    def _refill(self, bucket: _Bucket, now: float):
+        bucket.tokens = min(self.capacity, bucket.tokens + max(0.0, now - bucket.updated) * self.refill_rate)
+        bucket.updated = max(bucket.updated, now)
+        while bucket.granted and bucket.granted[0] <= now - self.window:
+            bucket.granted.popleft()
+
+    def _wait_time(self, bucket: _Bucket, now: float, priority: str) -> float:
+        """Seconds until a request of this priority could be granted (0 if now)."""
+        floor = self.capacity * self.background_reserve if priority == BACKGROUND else 0.0
+        wait = max(0.0, (floor + 1 - bucket.tokens) / self.refill_rate)
+        if len(bucket.granted) >= self.quota:
+            wait = max(wait, bucket.granted[0] + self.window - now)
+        return wait
+
+    def _with_bucket(self, func: Callable[[_Bucket], Any]) -> Any:
+        """Apply func to the bucket atomically (across replicas when shared) and return its result."""
+        backend = get_backend() if self.shared else None
+        if backend is not None:
+            def update(bucket: Optional[_Bucket]) -> Tuple[_Bucket, Any]:
+                bucket = bucket if bucket is not None else _Bucket(self.capacity, time.time())
+                return bucket, func(bucket)
+
+            try:
+                return backend.update(f"quota:{self.name}", update)
+            except Exception as e:
+                logger.warning("Shared quota for %s unavailable, using this process's bucket: %s", self.name, e)
+        with self._lock:
+            return func(self._bucket)
+
+    def _peek_bucket(self) -> _Bucket:
+        """Copy of the current bucket, read without taking the shared write lock."""
+        backend = get_backend() if self.shared else None
+        if backend is not None:
+            try:
+                bucket = backend.get_state(f"quota:{self.name}")
+                return bucket if bucket is not None else _Bucket(self.capacity, time.time())
+            except Exception as e:
+                logger.warning("Shared quota for %s unavailable, using this process's bucket: %s", self.name, e)
+        with self._lock:
+            return copy.deepcopy(self._bucket)
+
+    def try_acquire(self, priority: Optional[str] = None) -> float:
+        """
+        Take one token if available.
+
+        Args:
+            priority: INTERACTIVE or BACKGROUND (defaults to the current context's priority)
+
+        Returns:
+            0 when granted, otherwise seconds until a token is due
+        """
+        priority = priority or _priority.get()
+
+        def take(bucket: _Bucket) -> float:
+            now = time.time()
+            self._refill(bucket, now)
+            wait = self._wait_time(bucket, now, priority)
+            if wait == 0:
+                bucket.tokens -= 1
+                bucket.granted.append(now)
+            return wait
+
+        wait = self._with_bucket(take)
+        if wait == 0:
+            with self._lock:
+                self._stats["granted"] += 1
+                if priority == BACKGROUND:
+                    self._stats["granted_background"] += 1
+        return wait
+
+    def acquire(self, priority: Optional[str] = None):
+        """
+        Take one token, waiting briefly for interactive requests.
+
+        Raises:
+            QuotaExceeded: if no token is available within the allowed wait
+        """
+        priority = priority or _priority.get()
+        deadline = time.monotonic() + (self.max_wait if priority == INTERACTIVE else 0.0)
+        while True:
+            wait = self.try_acquire(priority)
+            if wait == 0:
+                return
+            if time.monotonic() + wait > deadline:
+                with self._lock:
+                    self._stats["denied"] += 1
+                    if priority == BACKGROUND:
+                        self._stats["denied_background"] += 1
+                raise QuotaExceeded(self.name, wait)
+            time.sleep(wait)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get remaining budget and grant counters.
+
+        Returns:
+            Dictionary with tokens available now, requests left in the quota
+            window, seconds until the next token, and granted/denied counts
+        """
+        # Refilled on a private copy: rendering stats never writes or locks the shared bucket
+        bucket = self._peek_bucket()
+        now = time.time()
+        self._refill(bucket, now)
+        budget = {
+            "tokens": round(bucket.tokens, 2),
+            "remaining_in_window": self.quota - len(bucket.granted),
+            "next_token_in": round(self._wait_time(bucket, now, INTERACTIVE), 1),
+        }
+        with self._lock:
+            return {
+                "provider": self.name,
+                "capacity": self.capacity,
+                "quota": self.quota,
+                "window_seconds": self.window,
+                "shared": self.shared and get_backend() is not None,
+                **budget,
+                **self._stats,
+            }
+
+
+# Shared by every replica when CACHE_BACKEND is sqlite or redis
+_limiters = {
+    EXCHANGE_RATE_API: QuotaLimiter(
+        EXCHANGE_RATE_API, EXCHANGE_RATE_API_QUOTA, EXCHANGE_RATE_API_QUOTA_WINDOW, EXCHANGE_RATE_API_BURST,
+        RATE_LIMIT_BACKGROUND_RESERVE, RATE_LIMIT_MAX_WAIT, shared=True,
+    ),
+    CURRENCY_API: QuotaLimiter(
+        CURRENCY_API, CURRENCY_API_QUOTA, CURRENCY_API_QUOTA_WINDOW, CURRENCY_API_BURST,
+        RATE_LIMIT_BACKGROUND_RESERVE, RATE_LIMIT_MAX_WAIT, shared=True,
+    ),
+    GEMINI: QuotaLimiter(
+        GEMINI, GEMINI_QUOTA, GEMINI_QUOTA_WINDOW, GEMINI_BURST,
+        RATE_LIMIT_BACKGROUND_RESERVE, RATE_LIMIT_MAX_WAIT, shared=True,
+    ),
+}
+
+
+def get_limiter(provider: str) -> QuotaLimiter:
+    """Return the process-wide limiter for a provider."""
+    return _limiters[provider]
+
+
+def acquire(provider: str):
+    """Take one request from a provider's budget at the current context's priority."""
+    _limiters[provider].acquire()
+
+
+@contextmanager
+def background_priority() -> Iterator[None]:
+    """Run the enclosed requests at background priority (e.g. prefetch refreshes)."""
+    token = _priority.set(BACKGROUND)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def get_limiter_stats() -> Dict[str, Dict[str, Any]]:
+    """Remaining budget and counters for every provider."""
+    return {name: limiter.stats() for name, limiter in _limiters.items()}
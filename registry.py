@@ -0,0 +1,143 @@
+import json
+import threading
+from types import MappingProxyType
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+
+def _freeze(record: Dict[str, Any]) -> Mapping[str, Any]:
+    """Read-only view of a record, with lists turned into tuples."""
+    return MappingProxyType({
+        key: tuple(_freeze(v) if isinstance(v, dict) else v for v in value) if isinstance(value, list) else value
+        for key, value in record.items()
+    })
+
+
+class Registry:
+    """
+    Countries, currencies, exchanges and index symbols with precomputed indexes.
+
+    Built once from the bundled data file (data/registry.json: every active
+    ISO 4217 currency, countries and their major exchanges). Every index is
+    a read-only mapping, so lookups are a single dictionary access however
+    many countries the file covers, and one instance is safely shared by
+    all sessions and threads.
+    """
+
+    def __init__(self, data: Dict[str, Any]):
+        self.version = data.get("version", 1)
+        currencies = [_freeze(c) for c in data.get("currencies", [])]
+        countries = [_freeze(c) for c in data.get("countries", [])]
+        exchanges = [_freeze(e) for e in data.get("exchanges", [])]
+
+        self.currencies: Mapping[str, Mapping[str, Any]] = MappingProxyType({c["code"]: c for c in currencies})
+        self.countries: Mapping[str, Mapping[str, Any]] = MappingProxyType({c["name"]: c for c in countries})
+        self.exchanges: Mapping[str, Mapping[str, Any]] = MappingProxyType({e["id"]: e for e in exchanges})
+
+        by_currency: Dict[str, List[str]] = {}
+        for country in countries:
+            by_currency.setdefault(country["currency"], []).append(country["name"])
+        exchanges_by_country: Dict[str, List[str]] = {}
+        for exchange in exchanges:
+            if exchange["country"] not in self.countries:
+                raise ValueError(f"Exchange {exchange['id']} refers to unknown country {exchange['country']}")
+            exchanges_by_country.setdefault(exchange["country"], []).append(exchange["id"])
+
+        # Secondary indexes
+        self.by_iso2: Mapping[str, str] = MappingProxyType({c["iso2"]: c["name"] for c in countries})
+        self.by_currency: Mapping[str, Tuple[str, ...]] = MappingProxyType({k: tuple(v) for k, v in by_currency.items()})
+        self.by_country_exchanges: Mapping[str, Tuple[str, ...]] = MappingProxyType(
+            {k: tuple(v) for k, v in exchanges_by_country.items()}
+        )
+        self.by_symbol: Mapping[str, Mapping[str, Any]] = MappingProxyType({
+            index["symbol"]: MappingProxyType({"name": index["name"], "exchange": exchange["id"], "country": exchange["country"]})
+            for exchange in exchanges
+            for index in exchange["indices"]
+        })
+        self._by_lower_name: Mapping[str, str] = MappingProxyType({name.lower(): name for name in self.countries})
+
+        # Countries with a listed exchange, in file order (the dashboard's country list)
+        self.market_countries: Tuple[str, ...] = tuple(dict.fromkeys(e["country"] for e in exchanges))
+
+    def country(self, name: str) -> Optional[Mapping[str, Any]]:
+        return self.countries.get(name)
+
+    def currency(self, code: str) -> Optional[Mapping[str, Any]]:
+        return self.currencies.get(code.upper())
+
+    def exchange(self, exchange_id: str) -> Optional[Mapping[str, Any]]:
+        return self.exchanges.get(exchange_id)
+
+    def match_country(self, text: str) -> Optional[str]:
+        """Canonical country name for a case-insensitive name or ISO 3166 alpha-2 code."""
+        return self._by_lower_name.get(text.lower()) or self.by_iso2.get(text.upper())
+
+    def countries_using(self, code: str) -> Tuple[str, ...]:
+        """Countries whose currency is code."""
+        return self.by_currency.get(code.upper(), ())
+
+    def primary_exchange(self, country: str) -> Optional[Mapping[str, Any]]:
+        """First listed exchange of a country, None if it has none."""
+        ids = self.by_country_exchanges.get(country)
+        return self.exchanges[ids[0]] if ids else None
+
+    def index_name(self, symbol: str) -> str:
+        """Display name of an index symbol (the symbol itself if unknown)."""
+        entry = self.by_symbol.get(symbol)
+        return entry["name"] if entry is not None else symbol
+
+    def market_config(self, country: str) -> Dict[str, Any]:
+        """
+        Dashboard configuration of a country, from its primary exchange.
+
+        Returns:
+            Dictionary with code, stock_exchange, major_indices, exchange_lat,
+            exchange_lng, market_timezone, market_open and market_close
+        """
+        exchange = self.primary_exchange(country)
+        if exchange is None:
+            raise KeyError(f"No exchange listed for {country}")
+        return {
+            "code": self.countries[country]["currency"],
+            "stock_exchange": exchange["name"],
+            "major_indices": [index["symbol"] for index in exchange["indices"]],
+            "exchange_lat": exchange["lat"],
+            "exchange_lng": exchange["lng"],
+            "market_timezone": exchange["timezone"],
+            "market_open": exchange["open"],
+            "market_close": exchange["close"],
+        }
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "currencies": len(self.currencies),
+            "countries": len(self.countries),
+            "exchanges": len(self.exchanges),
+            "indices": len(self.by_symbol),
+        }
+
+
+def load_registry(path: str) -> Registry:
+    """Build a registry from a JSON data file."""
+    with open(path, encoding="utf-8") as f:
+        return Registry(json.load(f))
+
+
+_registry: Optional[Registry] = None
+_registry_lock = threading.Lock()
+
+def get_registry(path: Optional[str] = None) -> Registry:
+    """
+    Return the process-wide registry, loading it on first use.
+
+    Args:
+        path: Data file to load (defaults to REGISTRY_PATH); ignored once loaded
+    """
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                if path is None:
+                    # Imported here: config itself builds COUNTRY_CONFIG through this function
+                    from config import REGISTRY_PATH as path
+                _registry = load_registry(path)
+    return _registry
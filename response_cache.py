@@ -0,0 +1,168 @@
+import math
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Dict, FrozenSet, Hashable, Iterable, List, Optional
+from cache_backend import get_backend
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Filler words that do not change what a dashboard question asks for
+_STOPWORDS = frozenset(
+    "a an the me my please show give get tell what whats is are of for to in on about "
+    "and with can you i want need some latest current".split()
+)
+
+
+def normalize_query(query: str) -> str:
+    """Lower-case, strip punctuation and collapse whitespace."""
+    return " ".join(_TOKEN_RE.findall(query.lower()))
+
+
+def _terms(normalized: str) -> List[str]:
+    words = [w for w in normalized.split() if w not in _STOPWORDS]
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+class _CachedResponse:
+    __slots__ = ("response", "terms", "entities")
+
+    def __init__(self, response: str, terms: Counter, entities: FrozenSet[str]):
+        self.response = response
+        self.terms = terms
+        self.entities = entities
+
+
+class ResponseCache:
+    """
+    LRU cache of agent answers keyed by normalized query and data fingerprint.
+
+    Lookups first try an exact match on the normalized query; otherwise the
+    most similar cached query (TF-IDF cosine over word unigrams and bigrams)
+    is reused if it clears the similarity threshold and mentions exactly the
+    same entities (countries, currency codes). Entries recorded under a
+    different data fingerprint never match, so answers expire as soon as the
+    underlying data changes.
+
+    With shared=True and a CACHE_BACKEND configured, answers are also stored
+    in the backend for shared_ttl seconds, and exact matches are looked up
+    there after this process's entries, so one worker's answer is reused by
+    all the others.
+    """
+
+    def __init__(
+        self,
+        entities: Iterable[str],
+        max_entries: int = 256,
+        similarity: float = 0.9,
+        shared: bool = False,
+        shared_ttl: float = 900.0,
+    ):
+        self.entities = [normalize_query(e) for e in entities]
+        self.max_entries = max_entries
+        self.similarity = similarity
+        self.shared = shared
+        self.shared_ttl = shared_ttl
+        self._entries: "OrderedDict[tuple[Hashable, str], _CachedResponse]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"exact_hits": 0, "similar_hits": 0, "shared_hits": 0, "misses": 0}
+
+    @staticmethod
+    def _shared_key(fingerprint: Hashable, normalized: str) -> str:
+        return f"responses:{fingerprint}:{normalized}"
+
+    def _entities_in(self, normalized: str) -> FrozenSet[str]:
+        padded = f" {normalized} "
+        return frozenset(e for e in self.entities if f" {e} " in padded)
+
+    def _idf(self, fingerprint: Hashable) -> Dict[str, float]:
+        docs = [entry.terms for (fp, _), entry in self._entries.items() if fp == fingerprint]
+        df = Counter(term for terms in docs for term in terms)
+        n = len(docs) + 1
+        return {term: math.log(n / (1 + count)) + 1 for term, count in df.items()}
+
+    @staticmethod
+    def _cosine(a: Counter, b: Counter, idf: Dict[str, float]) -> float:
+        weight = lambda terms, t: terms[t] * idf.get(t, 1.0)
+        dot = sum(weight(a, t) * weight(b, t) for t in a if t in b)
+        norm_a = math.sqrt(sum(weight(a, t) ** 2 for t in a))
+        norm_b = math.sqrt(sum(weight(b, t) ** 2 for t in b))
+        return dot / (norm_a * norm_b) if norm_a and norm_b else 0.0
+
+    def get(self, query: str, fingerprint: Hashable) -> Optional[str]:
+        """
+        Look up a cached answer.
+
+        Args:
+            query: Raw user query
+            fingerprint: Identifier of the data snapshot answers depend on
+
+        Returns:
+            Cached response or None
+        """
+        normalized = normalize_query(query)
+        with self._lock:
+            entry = self._entries.get((fingerprint, normalized))
+            if entry is not None:
+                self._entries.move_to_end((fingerprint, normalized))
+                self._stats["exact_hits"] += 1
+                return entry.response
+
+            terms = Counter(_terms(normalized))
+            entities = self._entities_in(normalized)
+            idf = self._idf(fingerprint)
+            best_key, best_score = None, 0.0
+            for key, candidate in self._entries.items():
+                if key[0] != fingerprint or candidate.entities != entities:
+                    continue
+                score = self._cosine(terms, candidate.terms, idf)
+                if score > best_score:
+                    best_key, best_score = key, score
+
+            if best_key is not None and best_score >= self.similarity:
+                self._entries.move_to_end(best_key)
+                self._stats["similar_hits"] += 1
+                return self._entries[best_key].response
+
+        backend = get_backend() if self.shared else None
+        shared = backend.get(self._shared_key(fingerprint, normalized)) if backend is not None else None
+        if shared is not None and shared[2] > time.time():
+            self._remember(fingerprint, normalized, shared[0])
+            with self._lock:
+                self._stats["shared_hits"] += 1
+            return shared[0]
+        with self._lock:
+            self._stats["misses"] += 1
+        return None
+
+    def put(self, query: str, fingerprint: Hashable, response: str):
+        """Store an answer for a query under the given data fingerprint."""
+        normalized = normalize_query(query)
+        self._remember(fingerprint, normalized, response)
+        backend = get_backend() if self.shared else None
+        if backend is not None:
+            now = time.time()
+            backend.set(self._shared_key(fingerprint, normalized), response, now, now + self.shared_ttl)
+
+    def _remember(self, fingerprint: Hashable, normalized: str, response: str):
+        entry = _CachedResponse(response, Counter(_terms(normalized)), self._entities_in(normalized))
+        with self._lock:
+            # Answers for older data can never match again
+            for key in [k for k in self._entries if k[0] != fingerprint]:
+                del self._entries[key]
+            self._entries[(fingerprint, normalized)] = entry
+            self._entries.move_to_end((fingerprint, normalized))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        backend = get_backend() if self.shared else None
+        if backend is not None:
+            backend.delete("responses:", prefix=True)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self._stats, "size": len(self._entries)}
@@ -0,0 +1,216 @@
+import time
+from collections.abc import Mapping
+from functools import lru_cache
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+import numpy as np
+import pandas as pd
+
+
+@lru_cache(maxsize=1024)
+def _position_index(keys: tuple) -> Dict[str, int]:
+    """Key -> row lookup, shared by every snapshot over the same keys."""
+    return {key: i for i, key in enumerate(keys)}
+
+
+def _epoch_to_iso(epoch: int) -> str:
+    return datetime.fromtimestamp(int(epoch), tz=timezone.utc).isoformat() if epoch > 0 else ""
+
+
+def _rounded(value: float, digits: Optional[int] = None) -> Any:
+    """Plain float for display ("N/A" for NaN); 6 significant digits unless digits is given."""
+    if value != value:
+        return "N/A"
+    return round(float(value), digits) if digits is not None else float(f"{value:.6g}")
+
+
+class RateSnapshot(Mapping):
+    """
+    Exchange rates from one base currency, backed by a float64 array.
+
+    Missing rates are NaN and the provider timestamp is int64 epoch seconds.
+    For existing callers the snapshot also reads like the old rates dict:
+    snapshot["USD"], snapshot.get("timestamp"), "error" in snapshot, with
+    rates rounded and "N/A" for missing ones; to_dict() materializes it.
+    """
+
+    __slots__ = ("base", "quotes", "values", "timestamp", "stale_seconds", "_index")
+
+    def __init__(self, base: str, quotes: Sequence[str], values: np.ndarray, timestamp: int = 0, stale_seconds: int = -1):
+        """
+        Args:
+            base: Base currency code
+            quotes: Quote currency codes, aligned with values
+            values: Units of each quote per 1 base (NaN if unknown)
+            timestamp: Provider last-update time as epoch seconds (0 if unknown)
+            stale_seconds: Age of the data when served as a stale fallback, -1 if fresh
+        """
+        self.base = base
+        self.quotes = tuple(quotes)
+        self.values = np.asarray(values, dtype=np.float64)
+        self.timestamp = int(timestamp)
+        self.stale_seconds = int(stale_seconds)
+        self._index = _position_index(self.quotes)
+
+    @property
+    def stale(self) -> bool:
+        return self.stale_seconds >= 0
+
+    def rate(self, quote: str) -> float:
+        """Raw rate for a quote (NaN if unknown)."""
+        i = self._index.get(quote)
+        return float(self.values[i]) if i is not None else float("nan")
+
+    def _keys(self) -> List[str]:
+        keys = ["base", *self.quotes, "timestamp"]
+        if self.stale:
+            keys += ["stale", "stale_seconds"]
+        return keys
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self._index:
+            return _rounded(self.values[self._index[key]])
+        if key == "base":
+            return self.base
+        if key == "timestamp":
+            return _epoch_to_iso(self.timestamp)
+        if self.stale and key == "stale":
+            return True
+        if self.stale and key == "stale_seconds":
+            return self.stale_seconds
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._keys())
+
+    def __len__(self) -> int:
+        return len(self._keys())
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {key: self[key] for key in self._keys()}
+
+    def to_series(self) -> pd.Series:
+        """Rates as a float Series indexed by quote code (shares memory with the snapshot)."""
+        return pd.Series(self.values, index=pd.Index(self.quotes, name="quote"), name=self.base, copy=False)
+
+    def __repr__(self) -> str:
+        return f"RateSnapshot({self.to_dict()!r})"
+
+
+class QuoteSnapshot(Mapping):
+    """
+    Index quotes for several symbols, backed by NumPy arrays.
+
+    values is an (n, 2) float64 array of [current, change_percent] (NaN when
+    a symbol has no data), updated holds int64 epoch seconds, and sources
+    marks symbols served from the last known quote store (None for live
+    quotes). Reading
+    snapshot[symbol] gives the old per-symbol dict, so existing callers keep
+    working; to_frame() exposes the arrays to pandas without copying.
+    """
+
+    __slots__ = ("symbols", "values", "updated", "sources", "_index")
+
+    COLUMNS = ("current", "change_percent")
+
+    def __init__(
+        self,
+        symbols: Sequence[str],
+        values: np.ndarray,
+        updated: np.ndarray,
+        sources: Optional[Sequence[Optional[str]]] = None,
+    ):
+        """
+        Args:
+            symbols: Index symbols, aligned with the rows of values
+            values: (n, 2) array of current value and change percent
+            updated: Epoch seconds of each quote
+            sources: Data source label per symbol served from stored quotes (None for live data)
+        """
+        self.symbols = tuple(symbols)
+        self.values = np.asarray(values, dtype=np.float64).reshape(len(self.symbols), 2)
+        self.updated = np.asarray(updated, dtype=np.int64)
+        self.sources = tuple(sources) if sources is not None else (None,) * len(self.symbols)
+        self._index = _position_index(self.symbols)
+
+    @classmethod
+    def from_frame(cls, quotes: pd.DataFrame, updated: Optional[int] = None) -> "QuoteSnapshot":
+        """
+        Build from a frame indexed by symbol with current and change_percent columns.
+
+        Args:
+            quotes: Quote frame (e.g. from stock_utils._quotes_from_closes)
+            updated: Epoch seconds for every quote (defaults to now)
+        """
+        updated = int(time.time()) if updated is None else updated
+        values = quotes[list(cls.COLUMNS)].to_numpy(dtype=np.float64)
+        return cls(list(quotes.index), values, np.full(len(quotes), updated, dtype=np.int64))
+
+    @classmethod
+    def concat(cls, snapshots: Sequence["QuoteSnapshot"]) -> "QuoteSnapshot":
+        """Join snapshots for different symbols into one."""
+        return cls(
+            [symbol for snapshot in snapshots for symbol in snapshot.symbols],
+            np.concatenate([snapshot.values for snapshot in snapshots]) if snapshots else np.empty((0, 2)),
+            np.concatenate([snapshot.updated for snapshot in snapshots]) if snapshots else np.empty(0, dtype=np.int64),
+            [source for snapshot in snapshots for source in snapshot.sources],
+        )
+
+    def select(self, symbols: Sequence[str]) -> "QuoteSnapshot":
+        """Snapshot of the given symbols (those this snapshot has), in the given order."""
+        rows = [self._index[symbol] for symbol in symbols if symbol in self._index]
+        return QuoteSnapshot(
+            [self.symbols[i] for i in rows],
+            self.values[rows],
+            self.updated[rows],
+            [self.sources[i] for i in rows],
+        )
+
+    @property
+    def is_live(self) -> bool:
+        """True if at least one quote was fetched live rather than served from stored quotes."""
+        return any(source is None for source in self.sources)
+
+    def __getitem__(self, symbol: str) -> Dict[str, Any]:
+        i = self._index[symbol]
+        current, change = self.values[i]
+        if current != current:
+            return {"error": self.sources[i] or "No data"}
+        quote = {
+            "current": _rounded(current, 2),
+            "change_percent": _rounded(change, 2),
+            "last_update": _epoch_to_iso(self.updated[i]),
+        }
+        if self.sources[i] is not None:
+            quote["data_source"] = self.sources[i]
+        return quote
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.symbols)
+
+    def __len__(self) -> int:
+        return len(self.symbols)
+
+    def to_dict(self) -> Dict[str, Dict[str, Any]]:
+        return {symbol: self[symbol] for symbol in self.symbols}
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        Quotes as a DataFrame indexed by symbol.
+
+        The current/change_percent columns share memory with the snapshot;
+        'updated' is added as a datetime column.
+        """
+        frame = pd.DataFrame(self.values, index=pd.Index(self.symbols, name="symbol"), columns=list(self.COLUMNS), copy=False)
+        frame["updated"] = pd.to_datetime(self.updated, unit="s", utc=True)
+        return frame
+
+    def __repr__(self) -> str:
+        return f"QuoteSnapshot({self.to_dict()!r})"
+
+
+def to_jsonable(value: Any) -> Any:
+    """json.dumps default= hook: materialize snapshots as their dict views."""
+    if isinstance(value, (RateSnapshot, QuoteSnapshot)):
+        return value.to_dict()
+    return str(value)
@@ -1,9 +1,18 @@
-import yfinance as yf
-from typing import Dict, List, Any
-from datetime import datetime, timedelta
+from config import YAHOO_BREAKER_FAILURES, YAHOO_BREAKER_RESET_SECONDS, YAHOO_BREAKER_MAX_RESET_SECONDS
+import http_client
+import tracing
+from history_store import get_history_store, record_frame
+from snapshots import QuoteSnapshot
+from quote_store import get_quote_store
+from circuit_breaker import CircuitBreaker
+from registry import get_registry
+from typing import Dict, List, Any, Mapping, Optional
+from datetime import date, datetime, timedelta, time as dt_time
+from zoneinfo import ZoneInfo
+import numpy as np
 import pandas as pd
 import warnings
-import random
+import time
 import logging
 import sys
 from io import StringIO
@@ -17,89 +26,251 @@ warnings.filterwarnings('ignore')
 logging.getLogger('yfinance').setLevel(logging.CRITICAL)
 logging.getLogger('yfinance.utils').setLevel(logging.CRITICAL)
 
-# Demo/fallback data for when APIs fail
-FALLBACK_DATA = {
-    "^N225": {"current": 32456.78, "change_percent": 2.15},
-    "^TOPIX": {"current": 2245.34, "change_percent": 1.87},
-    "^BSESN": {"current": 86543.21, "change_percent": 1.92},
-    "^NSEI": {"current": 26789.50, "change_percent": 2.34},
-    "^GSPC": {"current": 5876.45, "change_percent": 1.56},
-    "^DJI": {"current": 45678.90, "change_percent": 1.23},
-    "^IXIC": {"current": 18234.67, "change_percent": 2.45},
-    "^KS11": {"current": 3125.89, "change_percent": 1.34},
-    "000001.SS": {"current": 3678.45, "change_percent": 0.87},
-    "^FTSE": {"current": 8567.23, "change_percent": 1.02},
-}
-
-def get_stock_indices(symbols: List[str]) -> Dict[str, Any]:
+logger = logging.getLogger(__name__)
+
+# Source label for quotes served from the last known quote store
+LAST_KNOWN_SOURCE = "Last known quote (Yahoo Finance unavailable)"
+
+# Stops calling Yahoo for a symbol after repeated failures; while its circuit
+# is open the symbol is served from the last known quote store
+_breaker = CircuitBreaker("yahoo", YAHOO_BREAKER_FAILURES, YAHOO_BREAKER_RESET_SECONDS, YAHOO_BREAKER_MAX_RESET_SECONDS)
+
+def _record_outcomes(symbols: List[str], values: np.ndarray):
+    """Report each fetched symbol to its circuit and save the live quotes."""
+    live = ~np.isnan(values[:, 0])
+    for symbol, ok in zip(symbols, live):
+        if ok:
+            _breaker.record_success(symbol)
+        else:
+            _breaker.record_failure(symbol)
+    if live.any():
+        get_quote_store().save(symbols, values, np.full(len(symbols), int(time.time()), dtype=np.int64))
+
+def _snapshot_with_last_known(symbols: List[str], values: np.ndarray) -> QuoteSnapshot:
+    """
+    Build a quote snapshot, filling symbols without live data from the last known quote store.
+
+    Filled-in quotes keep the time they were fetched; symbols never seen
+    stay NaN (reported as errors).
+
+    Args:
+        symbols: Index symbols
+        values: (n, 2) array of current and change percent, NaN where missing
+    """
+    updated = np.full(len(symbols), int(time.time()), dtype=np.int64)
+    sources: List[Optional[str]] = [None] * len(symbols)
+    missing = np.flatnonzero(np.isnan(values[:, 0]))
+    if len(missing):
+        known_values, known_updated = get_quote_store().lookup([symbols[i] for i in missing])
+        values[missing] = known_values
+        updated[missing] = known_updated
+        for i, known in zip(missing, ~np.isnan(known_values[:, 0])):
+            sources[i] = LAST_KNOWN_SOURCE if known else "No data available"
+    return QuoteSnapshot(symbols, values, updated, sources)
+
+def get_breaker_stats() -> Dict[str, Any]:
+    """
+    Get Yahoo circuit breaker counters.
+
+    Returns:
+        Dictionary of breaker statistics, including symbols currently tripped
+    """
+    return _breaker.stats()
+
+@tracing.traced("yahoo.download")
+def download_closes(
+    symbols: List[str],
+    period: str = "5d",
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+) -> pd.DataFrame:
+    """
+    Download daily closes for all symbols in one multi-ticker request.
+
+    Args:
+        symbols: Yahoo symbols (indices, or FX pairs such as 'JPY=X')
+        period: Yahoo period string, used when start is not given
+        start: First date to download (inclusive)
+        end: Last date to download (inclusive, defaults to today)
+
+    Returns:
+        DataFrame of closes indexed by date with one column per symbol
+    """
+    if start is not None:
+        # Yahoo treats end as exclusive
+        end = (end or date.today()) + timedelta(days=1)
+        window = {"start": start.isoformat(), "end": end.isoformat()}
+    else:
+        window = {"period": period}
+
+    import yfinance as yf  # deferred: heavy import only needed when fetching
+
+    # Suppress yfinance stderr output
+    old_stderr = sys.stderr
+    sys.stderr = StringIO()
+    try:
+        frame = yf.download(
+            symbols,
+            interval="1d",
+            group_by="column",
+            auto_adjust=True,
+            progress=False,
+            threads=True,
+            timeout=5,
+            session=http_client.get_session(),
+            **window,
+        )
+    finally:
+        sys.stderr = old_stderr
+
+    if frame is None or frame.empty:
+        return pd.DataFrame(columns=symbols, dtype=float)
+
+    closes = frame["Close"]
+    if isinstance(closes, pd.Series):
+        closes = closes.to_frame(name=symbols[0])
+    return closes.reindex(columns=symbols)
+
+def _quotes_from_closes(closes: pd.DataFrame) -> pd.DataFrame:
+    """
+    Compute current price and change percent for every column at once.
+
+    Exchanges trade on different calendars, so each symbol's latest and
+    previous closes are its last two non-missing values rather than the
+    last two rows of the frame.
+
+    Args:
+        closes: DataFrame of closes indexed by date, one column per symbol
+
+    Returns:
+        DataFrame indexed by symbol with 'current' and 'change_percent' columns
+    """
+    # Position of each row counted back from the symbol's latest valid close
+    rank_from_end = closes.notna()[::-1].cumsum()[::-1]
+    current = closes.where(rank_from_end == 1).max()
+    previous = closes.where(rank_from_end == 2).max()
+    change = ((current - previous) / previous * 100).fillna(0.0)
+    return pd.DataFrame({"current": current, "change_percent": change})
+
+def _get_stock_indices_batch(symbols: List[str]) -> QuoteSnapshot:
+    """Fetch all symbols whose circuit allows it with a single download and vectorized quote math."""
+    values = np.full((len(symbols), 2), np.nan)
+    allowed = [i for i, symbol in enumerate(symbols) if _breaker.allow(symbol)]
+    if allowed:
+        fetch = [symbols[i] for i in allowed]
+        try:
+            closes = download_closes(fetch)
+            record_frame(closes)
+            quotes = _quotes_from_closes(closes).reindex(fetch)
+            values[allowed] = quotes[list(QuoteSnapshot.COLUMNS)].to_numpy(dtype=np.float64)
+        except Exception as e:
+            logger.warning("Yahoo batch fetch failed for %s: %s", fetch, e)
+        _record_outcomes(fetch, values[allowed])
+    return _snapshot_with_last_known(symbols, values)
+
+@tracing.traced("yahoo.history")
+def _get_stock_index(symbol: str) -> QuoteSnapshot:
+    """Fetch one symbol with a single 5-day history request, unless its circuit is open."""
+    values = np.full((1, 2), np.nan)
+    if not _breaker.allow(symbol):
+        return _snapshot_with_last_known([symbol], values)
+
+    try:
+        # Inside the try: a failed import must still count as a failure, or a
+        # half-open circuit would never get its probe result
+        import yfinance as yf  # deferred: heavy import only needed when fetching
+
+        # Suppress yfinance stderr output
+        old_stderr = sys.stderr
+        sys.stderr = StringIO()
+        try:
+            ticker = yf.Ticker(symbol, session=http_client.get_session())
+            hist = ticker.history(period='5d', timeout=5)
+        finally:
+            sys.stderr = old_stderr
+        if not hist.empty:
+            closes = hist[['Close']].rename(columns={'Close': symbol})
+            record_frame(closes)
+            values = _quotes_from_closes(closes)[list(QuoteSnapshot.COLUMNS)].to_numpy(dtype=np.float64, copy=True)
+    except Exception as e:
+        logger.warning("Yahoo fetch failed for %s: %s", symbol, e)
+    _record_outcomes([symbol], values)
+    return _snapshot_with_last_known([symbol], values)
+
+@tracing.traced("stocks.get_indices")
+def get_stock_indices(symbols: List[str], batch: bool = True) -> Mapping[str, Any]:
     """
     Get current stock index values using Yahoo Finance.
-    Falls back to demo data if API fails.
+    Symbols Yahoo cannot serve (or whose circuit is open after repeated
+    failures) get their last known real quote, marked with data_source
+    and carrying the time it was fetched.
     
     Args:
         symbols: List of stock index symbols (e.g., ['^N225', '^NSEI'])
+        batch: Fetch all symbols in one multi-ticker request (default);
+            when False, fetch each symbol separately
         
     Returns:
-        Dictionary with index data
+        QuoteSnapshot (read like a dict of per-symbol quote dicts), or {"error": ...}
     """
     try:
-        indices_data = {}
-        
-        for symbol in symbols:
-            try:
-                # Suppress yfinance stderr output
-                old_stderr = sys.stderr
-                sys.stderr = StringIO()
-                
-                try:
-                    ticker = yf.Ticker(symbol, session=None)
-                    # Get current price
-                    data = ticker.history(period='1d', timeout=5)
-                    
-                    if not data.empty and len(data) > 0:
-                        current_price = data['Close'].iloc[-1]
-                        # Try to get previous close for change calculation
-                        hist = ticker.history(period='5d', timeout=5)
-                        if len(hist) > 1:
-                            prev_close = hist['Close'].iloc[-2]
-                            change = ((current_price - prev_close) / prev_close) * 100
-                        else:
-                            change = 0
-                        
-                        indices_data[symbol] = {
-                            "current": round(float(current_price), 2),
-                            "change_percent": round(change, 2),
-                            "last_update": datetime.now().isoformat(),
-                        }
-                    else:
-                        # Use fallback demo data
-                        fallback = FALLBACK_DATA.get(symbol, {"current": 0, "change_percent": 0})
-                        # Add slight variation to demo data
-                        variation = random.uniform(-0.5, 0.5)
-                        indices_data[symbol] = {
-                            "current": fallback["current"],
-                            "change_percent": round(fallback["change_percent"] + variation, 2),
-                            "last_update": datetime.now().isoformat(),
-                            "data_source": "Demo (API unavailable)"
-                        }
-                finally:
-                    sys.stderr = old_stderr
-                    
-            except Exception as e:
-                # Use fallback demo data on error
-                fallback = FALLBACK_DATA.get(symbol, {"current": 0, "change_percent": 0})
-                variation = random.uniform(-0.5, 0.5)
-                indices_data[symbol] = {
-                    "current": fallback["current"],
-                    "change_percent": round(fallback["change_percent"] + variation, 2),
-                    "last_update": datetime.now().isoformat(),
-                    "data_source": "Demo (API error)"
-                }
-        
-        return indices_data
+        if not symbols:
+            return {}
+        if batch:
+            return _get_stock_indices_batch(list(symbols))
+        return QuoteSnapshot.concat([_get_stock_index(symbol) for symbol in symbols])
     except Exception as e:
         return {"error": str(e)}
 
+def get_index_history(
+    symbols: List[str], start: date, end: Optional[date] = None, revise_from: Optional[date] = None
+) -> pd.DataFrame:
+    """
+    Get daily closes for stock indices, served from the local history store.
+
+    Only the date range missing from the store is downloaded (in one
+    multi-ticker request); everything else is read from disk.
+
+    Args:
+        symbols: List of stock index symbols
+        start: First date
+        end: Last date (defaults to today)
+        revise_from: Stored bars from this date on are downloaded again (late or partial bars)
+
+    Returns:
+        DataFrame indexed by date with one column per symbol
+    """
+    end = end or date.today()
+    store = get_history_store()
+    store.backfill(
+        list(symbols), start, end, lambda missing, s, e: download_closes(missing, start=s, end=e), revise_from
+    )
+    return store.read_frame(symbols, start, end)
+
+def is_market_open(market: Dict[str, Any], now: Optional[datetime] = None) -> bool:
+    """
+    Check whether an exchange is in its regular trading session.
+
+    Holidays are not modelled; weekends and out-of-session hours are.
+
+    Args:
+        market: Country config with market_timezone, market_open and market_close
+        now: Timezone-aware time to check (defaults to current time)
+
+    Returns:
+        True if the market is open; True when trading hours are unknown
+    """
+    tz_name = market.get("market_timezone")
+    if not tz_name:
+        return True
+
+    local = (now or datetime.now(ZoneInfo("UTC"))).astimezone(ZoneInfo(tz_name))
+    if local.weekday() >= 5:
+        return False
+    open_time = dt_time.fromisoformat(market.get("market_open", "00:00"))
+    close_time = dt_time.fromisoformat(market.get("market_close", "23:59"))
+    return open_time <= local.time() <= close_time
+
 def get_index_names(symbols: List[str]) -> Dict[str, str]:
     """
     Get display names for stock indices.
@@ -110,20 +281,8 @@ def get_index_names(symbols: List[str]) -> Dict[str, str]:
     Returns:
         Dictionary mapping symbols to names
     """
-    index_names = {
-        "^N225": "Nikkei 225",
-        "^TOPIX": "TOPIX (Tokyo Stock Price Index)",
-        "^BSESN": "BSE SENSEX",
-        "^NSEI": "NIFTY 50",
-        "^GSPC": "S&P 500",
-        "^DJI": "Dow Jones Industrial Average",
-        "^IXIC": "NASDAQ Composite",
-        "^KS11": "KOSPI",
-        "000001.SS": "Shanghai Composite",
-        "^FTSE": "FTSE 100",
-    }
-    
-    return {symbol: index_names.get(symbol, symbol) for symbol in symbols}
+    registry = get_registry()
+    return {symbol: registry.index_name(symbol) for symbol in symbols}
 
 def format_indices_data(indices: Dict[str, Any], index_names: Dict[str, str]) -> str:
     """
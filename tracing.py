@@ -0,0 +1,273 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar, copy_context
+from functools import wraps
+from typing import Any, Callable, Dict, List, Optional
+from config import TRACING_ENABLED, TRACING_EXPORT_PATH, TRACING_MAX_TRACES
+
+logger = logging.getLogger(__name__)
+
+SERVICE_NAME = "currency-dashboard"
+
+_enabled = TRACING_ENABLED
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+# Finished root spans, one ring of TRACING_MAX_TRACES per root name, so frequent
+# background traces (prefetch refreshes) cannot evict rerun traces
+_finished: Dict[str, deque] = {}
+_finished_lock = threading.Lock()
+_export_lock = threading.Lock()
+
+
+class Span:
+    """One timed operation; spans sharing a trace_id form one trace."""
+
+    __slots__ = ("name", "trace_id", "span_id", "parent", "start_ns", "end_ns", "attributes", "error", "spans", "_token")
+
+    def __init__(self, name: str, parent: Optional["Span"], attributes: Dict[str, Any]):
+        self.name = name
+        self.parent = parent
+        self.trace_id = parent.trace_id if parent else os.urandom(16).hex()
+        self.span_id = os.urandom(8).hex()
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes = attributes
+        self.error: Optional[str] = None
+        # Every span of the trace, collected on the root (appends are thread-safe)
+        self.spans: List["Span"] = parent.spans if parent else []
+        self.spans.append(self)
+        self._token = None
+
+    def set(self, **attributes: Any):
+        self.attributes.update(attributes)
+
+    def end(self):
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+            if self.parent is None:
+                _finish_trace(self)
+
+    def __enter__(self) -> "Span":
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc is not None:
+            self.error = f"{exc_type.__name__}: {exc}"
+        _current_span.reset(self._token)
+        self.end()
+        return False
+
+
+class _NoopSpan:
+    """Returned when tracing is off, so instrumented code pays one flag check."""
+
+    def set(self, **attributes: Any):
+        pass
+
+    def end(self):
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def set_enabled(enabled: bool):
+    """Turn span recording on or off at runtime."""
+    global _enabled
+    _enabled = enabled
+
+
+def span(name: str, **attributes: Any):
+    """
+    Context manager timing a block as a child of the current span.
+
+    Outside any span a new trace is started. With tracing disabled this
+    returns a shared no-op object.
+
+    Args:
+        name: Operation name (e.g. 'fx.fetch_latest')
+        **attributes: Span attributes; more can be added with .set()
+
+    Returns:
+        Span (or no-op) usable as a context manager
+    """
+    if not _enabled:
+        return _NOOP
+    return Span(name, _current_span.get(), attributes)
+
+
+def start_span(name: str, **attributes: Any):
+    """
+    Start a span without making it current; call .end() to finish it.
+
+    Used where start and end happen in separate callbacks (e.g. LLM calls).
+    """
+    if not _enabled:
+        return _NOOP
+    return Span(name, _current_span.get(), attributes)
+
+
+def start_trace(name: str, **attributes: Any):
+    """
+    Start a new trace whose root span stays current until end_trace().
+
+    For code that cannot wrap its body in a with block, such as a Streamlit
+    script rerun. Any span left current by an interrupted run is ignored.
+    """
+    if not _enabled:
+        return _NOOP
+    root = Span(name, None, attributes)
+    _current_span.set(root)
+    return root
+
+
+def end_trace(root: Any):
+    """Finish a trace started with start_trace()."""
+    if isinstance(root, Span):
+        _current_span.set(None)
+        root.end()
+
+
+def traced(name: str) -> Callable:
+    """Decorator recording each call of the wrapped function as a span."""
+    def decorator(func: Callable) -> Callable:
+        @wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            if not _enabled:
+                return func(*args, **kwargs)
+            with Span(name, _current_span.get(), {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def propagate(func: Callable) -> Callable:
+    """
+    Bind func to a copy of the caller's context so spans it opens on another
+    thread (executor or worker thread) join the caller's trace.
+    """
+    if not _enabled:
+        return func
+    context = copy_context()
+
+    @wraps(func)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        # A context can only be entered by one thread at a time
+        return context.copy().run(func, *args, **kwargs)
+    return wrapper
+
+
+def _finish_trace(root: Span):
+    with _finished_lock:
+        _finished.setdefault(root.name, deque(maxlen=TRACING_MAX_TRACES)).append(root)
+    if TRACING_EXPORT_PATH:
+        try:
+            line = json.dumps(to_otlp([root]))
+            with _export_lock, open(TRACING_EXPORT_PATH, "a") as f:
+                f.write(line + "\n")
+        except Exception as e:
+            logger.warning("Could not export trace: %s", e)
+
+
+def recent_traces(name: Optional[str] = None, **attributes: Any) -> List[Span]:
+    """
+    Finished root spans, newest last.
+
+    Args:
+        name: Only traces with this root name (default: all)
+        **attributes: Only traces whose root has these attribute values
+            (e.g. session=... for one Streamlit session's reruns)
+    """
+    with _finished_lock:
+        if name is not None:
+            roots = list(_finished.get(name, ()))
+        else:
+            roots = sorted((root for ring in _finished.values() for root in ring), key=lambda root: root.end_ns)
+    return [
+        root for root in roots
+        if all(root.attributes.get(key) == value for key, value in attributes.items())
+    ]
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def to_otlp(roots: List[Span]) -> Dict[str, Any]:
+    """
+    Serialize traces in the OTLP/JSON trace format.
+
+    Args:
+        roots: Root spans of finished traces
+
+    Returns:
+        Dictionary accepted by OpenTelemetry collectors' /v1/traces endpoint
+    """
+    spans = []
+    for root in roots:
+        for item in root.spans:
+            record = {
+                "traceId": item.trace_id,
+                "spanId": item.span_id,
+                "name": item.name,
+                "kind": 1,
+                "startTimeUnixNano": str(item.start_ns),
+                "endTimeUnixNano": str(item.end_ns or item.start_ns),
+                "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in item.attributes.items()],
+                "status": {"code": 2, "message": item.error} if item.error else {"code": 1},
+            }
+            if item.parent is not None:
+                record["parentSpanId"] = item.parent.span_id
+            spans.append(record)
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+            "scopeSpans": [{"scope": {"name": SERVICE_NAME}, "spans": spans}],
+        }]
+    }
+
+
+def waterfall(root: Span) -> List[Dict[str, Any]]:
+    """
+    Flatten a trace into rows for a waterfall chart.
+
+    Returns:
+        One dict per span in start order with name, depth, start_ms and
+        duration_ms relative to the root, and error (if any)
+    """
+    depth = {root.span_id: 0}
+    rows = []
+    for item in sorted(root.spans, key=lambda s: s.start_ns):
+        if item.parent is not None:
+            depth[item.span_id] = depth.get(item.parent.span_id, 0) + 1
+        end_ns = item.end_ns or time.time_ns()
+        rows.append({
+            "name": item.name,
+            "depth": depth[item.span_id],
+            "start_ms": round((item.start_ns - root.start_ns) / 1e6, 2),
+            "duration_ms": round((end_ns - item.start_ns) / 1e6, 2),
+            "error": item.error,
+            "attributes": dict(item.attributes),
+        })
+    return rows